@@ -1,4 +1,8 @@
-from flask import Flask, render_template, request, send_file, redirect, url_for
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify
+from markupsafe import escape
+from urllib.parse import urlencode
+import datetime as dt
+import hmac
 import pandas as pd
 import os
 import sys
@@ -6,42 +10,240 @@ import sys
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from ml_models import QuizGenerator
-from dl_models import Summarizer, FeedbackGenerator
-from nlp_utils import generate_study_tips
-from data_utils import load_data
+# Heavy modules (scikit-learn, TensorFlow, NLTK) are imported by the loaders below,
+# on first use or in the warmup thread, so importing the app stays cheap.
+from lazy_loader import LazyResource, start_warmup, pin_resources, unpin_resources, pinned_resources
+from model_registry import ModelRegistry, file_version
+from batching import MicroBatcher
+from nlp_utils import extract_keywords_many, tips_from_keywords, keyword_engine
+import metrics
+from planner import build_schedule, MAX_PLAN_DAYS
+from api import create_api
+from result_cache import ResultCache, FileBackend, normalize_text
 
 app = Flask(__name__)
+metrics.install(app) # Per-route/per-stage latency, served at /metrics
 
-# Global variables
-quiz_gen = QuizGenerator()
-summarizer = Summarizer()
-feedback_gen = FeedbackGenerator()
-dataset = None
+DATA_PATH = "data/dataset.csv"
+QUIZ_MODEL_PATH = "models/quiz_generator" # Artifact directory (a legacy .pkl is converted on load)
+SUMMARIZER_MODEL_PATH = "models/summarizer.h5"
+SUMMARIZER_TOKENIZERS_PATH = "models/summarizer_tokenizers.json"
+SUMMARIZER_RUNTIME_PATH = "models/summarizer.npz" # Exported weights: seq2seq decodes without TensorFlow
 
-def init_app():
-    global dataset, quiz_gen, summarizer
-    print("Initializing App...")
-    data_path = "data/dataset.csv"
-    if os.path.exists(data_path):
-        dataset = load_data(data_path)
-        
-        # Quiz Generator
-        if not os.path.exists("models/quiz_generator.pkl"):
-             quiz_gen.train(dataset)
-             quiz_gen.save_model()
+# The web process only loads artifacts; train.py trains and publishes them
+def _load_quiz_gen():
+    from ml_models import QuizGenerator
+    if not (os.path.exists(QUIZ_MODEL_PATH) or os.path.exists(QUIZ_MODEL_PATH + ".pkl")):
+        raise FileNotFoundError(f"No quiz model at {QUIZ_MODEL_PATH}; run python train.py first")
+    return QuizGenerator.load_model(QUIZ_MODEL_PATH)
+
+def _load_summarizer():
+    from dl_models import Summarizer
+    if not os.path.exists(SUMMARIZER_MODEL_PATH):
+        # Extractive summaries need no model; only seq2seq does
+        print(f"No summarizer model at {SUMMARIZER_MODEL_PATH}; seq2seq summaries need python train.py")
+    return Summarizer.load_model(SUMMARIZER_MODEL_PATH)
+
+def _load_feedback_gen():
+    from dl_models import FeedbackGenerator
+    return FeedbackGenerator()
+
+# Global variables (loaded lazily, used like the model objects themselves)
+quiz_gen = LazyResource("quiz_gen", _load_quiz_gen,
+                        version=lambda: file_version(QUIZ_MODEL_PATH, QUIZ_MODEL_PATH + ".pkl"))
+summarizer = LazyResource("summarizer", _load_summarizer,
+                          version=lambda: file_version(SUMMARIZER_MODEL_PATH, SUMMARIZER_TOKENIZERS_PATH,
+                                                       SUMMARIZER_RUNTIME_PATH))
+feedback_gen = LazyResource("feedback_gen", _load_feedback_gen)
+
+RESOURCES = [quiz_gen, summarizer, feedback_gen, keyword_engine]
+
+# New model versions are loaded in the background, warmed with a few canned
+# requests and swapped in; each request keeps the versions it started with.
+MODEL_WATCH_SECONDS = 2.0
+MODEL_ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN")
+WARMUP_TEXT = ("Cells are the basic building blocks of life. They carry out metabolism. "
+               "They divide to grow.")
+
+def _warm_quiz_gen(model):
+    model.generate_quiz_batch([("Science", "Easy", 3), ("Math", "Medium", 3)])
+    model.related(WARMUP_TEXT, 3)
+
+def _warm_summarizer(model):
+    model.summarize_many([WARMUP_TEXT], method="textrank", budget_ms=SUMMARY_BUDGET_MS)
+    if model.can_decode():
+        model.summarize_many([WARMUP_TEXT], method="seq2seq") # Loads the model off the request path
+
+model_registry = ModelRegistry()
+model_registry.register(quiz_gen, _warm_quiz_gen)
+model_registry.register(summarizer, _warm_summarizer)
+reload_trigger = None # Set by serve.py: reloads go through the prefork master instead
+
+@app.before_request
+def _pin_models():
+    pin_resources()
+
+@app.after_request
+def _report_models(response):
+    # Versions of the models this request used, with their load and swap times
+    versions, load_ms, swap_ms = [], [], []
+    for name, (_, version) in pinned_resources().items():
+        if name not in model_registry.entries:
+            continue
+        resource = model_registry.entries[name][0]
+        versions.append(f"{name}={version}")
+        metrics.registry.inc("model_requests_total", (name, str(version)))
+        if version == resource.version:
+            if resource.load_seconds is not None:
+                load_ms.append(f"{name}={resource.load_seconds * 1000:.1f}")
+            if resource.swap_seconds is not None:
+                swap_ms.append(f"{name}={resource.swap_seconds * 1000:.3f}")
+    if versions:
+        response.headers["X-Model-Version"] = ", ".join(versions)
+    if load_ms:
+        response.headers["X-Model-Load-Ms"] = ", ".join(load_ms)
+    if swap_ms:
+        response.headers["X-Model-Swap-Ms"] = ", ".join(swap_ms)
+    return response
+
+@app.teardown_request
+def _unpin_models(exc):
+    unpin_resources()
+
+# Concurrent requests are coalesced into batches for the model batch APIs
+SUMMARY_METHOD = "textrank"
+SUMMARY_BUDGET_MS = 50
+BATCH_MAX_SIZE = 32
+BATCH_MAX_WAIT_MS = 5
+BATCH_TIMEOUT = 30 # Seconds a request waits for its batched result
+
+summary_batcher = MicroBatcher(
+    "summarize", lambda texts: summarizer.summarize_many(texts, method=SUMMARY_METHOD, budget_ms=SUMMARY_BUDGET_MS),
+    max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, resources=[summarizer])
+keyword_batcher = MicroBatcher(
+    "keywords", extract_keywords_many,
+    max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS)
+quiz_batcher = MicroBatcher(
+    "quiz", lambda requests: quiz_gen.generate_quiz_batch(requests),
+    max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, resources=[quiz_gen])
+
+BATCHERS = [summary_batcher, keyword_batcher, quiz_batcher]
+
+# Results of repeated inputs are cached, keyed on the normalized input and the model version
+RESULT_CACHE_BYTES = 32 * 2**20
+RESULT_CACHE_TTL = 3600
+
+def model_version():
+    # Swapping in a new model version (or changing the corpus behind the keyword IDF) changes every key
+    pins = pinned_resources()
+    version = []
+    for resource in (summarizer, quiz_gen):
+        if resource.name in pins:
+            version.append((resource.name, pins[resource.name][1]))
         else:
-             quiz_gen = QuizGenerator.load_model()
-             # Fix for the previous bug: do NOT overwrite data_clustered blindly if you want to be safe, 
-             # but here we ensure it has data to work with.
-             pass 
-        
-        # Summarizer
-        if not os.path.exists("models/summarizer.h5"):
-            summarizer.train(dataset)
-            summarizer.save_model()
-    else:
+            version.append((resource.name, resource.version if resource.loaded else resource.current_version()))
+    try:
+        st = os.stat(DATA_PATH)
+        version.append((DATA_PATH, st.st_mtime_ns, st.st_size))
+    except OSError:
+        version.append((DATA_PATH, None))
+    return tuple(version)
+
+text_cache = ResultCache("text", RESULT_CACHE_BYTES, RESULT_CACHE_TTL, version=model_version)
+plan_cache = ResultCache("plan", RESULT_CACHE_BYTES // 4, RESULT_CACHE_TTL)
+CACHES = [text_cache, plan_cache]
+
+def use_shared_cache(directory=None):
+    """
+    Shares cached results between processes (e.g. prefork workers) through a
+    private directory, a new one under /dev/shm by default. Create it before
+    forking: the workers must inherit its signing secret.
+    """
+    backend = FileBackend(directory)
+    for cache in CACHES:
+        cache.backend = backend
+    return backend
+
+def analyze_text(text):
+    """
+    Summary and keywords of a text, batched with concurrent requests on a cache miss.
+    """
+    # Whitespace variants share a cache entry, but the summarizer sees the text as
+    # written: extractive summaries split sentences at line breaks too
+    def compute():
+        # Summary and keywords are batched separately and computed concurrently
+        summary_future = summary_batcher.submit(text)
+        keywords = keyword_batcher(text, timeout=BATCH_TIMEOUT)
+        return {"summary": summary_future.result(BATCH_TIMEOUT), "keywords": keywords}
+    return text_cache.get_or_compute((normalize_text(text), SUMMARY_METHOD, SUMMARY_BUDGET_MS), compute)
+
+RELATED_QUESTIONS = 3
+
+def practice_questions(text):
+    """
+    Questions on the corpus passages most related to text. The passages are
+    cached; the questions get fresh distractors every time.
+    """
+    rows = text_cache.get_or_compute((normalize_text(text), "related", RELATED_QUESTIONS),
+                                     lambda: [r["row"] for r in quiz_gen.related(text, RELATED_QUESTIONS)])
+    return quiz_gen.render_questions(rows)
+
+MAX_PLAN_SUBJECTS = 500
+
+def _iso_date(value):
+    try:
+        return dt.date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+def plan_options(values):
+    """
+    Schedule options from the planner form, or from the download link's query string.
+    """
+    def number(key, default, low, high):
+        try:
+            return min(max(int(values.get(key, default)), low), high)
+        except (TypeError, ValueError):
+            return default
+
+    subjects = []
+    # Identify keys like 'subject_0', 'priority_0', 'deadline_0'
+    for key in values:
+        if key.startswith('subject_') and len(subjects) < MAX_PLAN_SUBJECTS:
+            idx = key.split('_')[1]
+            subjects.append({'name': values[key],
+                             'priority': values.get(f'priority_{idx}', 'Medium'),
+                             'deadline': _iso_date(values.get(f'deadline_{idx}'))})
+    return {
+        "subjects": subjects,
+        "days": number('days', 1, 1, MAX_PLAN_DAYS),
+        "hours_per_day": number('total_hours', 4, 1, 16),
+        "start_date": _iso_date(values.get('start_date')) or dt.date.today().isoformat(),
+    }
+
+def study_schedule(options):
+    """
+    The Schedule for plan_options(), cached by its inputs.
+    """
+    parts = (tuple((s['name'], s['priority'], s['deadline']) for s in options['subjects']),
+             options['days'], options['hours_per_day'], options['start_date'])
+    return plan_cache.get_or_compute(parts, lambda: build_schedule(**options))
+
+# JSON batch API under /api/v1 (NDJSON responses, see src/api.py)
+app.register_blueprint(create_api(quiz_gen, summarizer, extract_keywords_many, tips_from_keywords,
+                                  summary_method=SUMMARY_METHOD, summary_budget_ms=SUMMARY_BUDGET_MS))
+
+def init_app(warmup=True, watch_models=MODEL_WATCH_SECONDS):
+    print("Initializing App...")
+    if not os.path.exists(DATA_PATH):
         print("Dataset not found. Please run generate_data.py first.")
+    
+    # Models (published by train.py) load in the background; a request
+    # arriving earlier simply waits for the one it needs.
+    if warmup:
+        start_warmup(RESOURCES)
+    if watch_models:
+        model_registry.watch(watch_models)
 
 # --- Routes ---
 
@@ -69,89 +271,40 @@ def about():
 
 @app.route('/planner')
 def planner():
-    return render_template('planner_form.html')
+    return render_template('planner_form.html', max_plan_days=MAX_PLAN_DAYS)
 
 @app.route('/generate_plan', methods=['POST'])
 def generate_plan():
-    try:
-        total_hours = int(request.form.get('total_hours', 4))
-    except:
-        total_hours = 4
-        
     topic_text = request.form.get('topic_text', '')
-    
-    # Parse Subjects and Priorities from dynamic form
-    subjects = []
-    # Identify keys like 'subject_0', 'priority_0'
-    for key in request.form:
-        if key.startswith('subject_'):
-            idx = key.split('_')[1]
-            subj_name = request.form[key]
-            priority = request.form.get(f'priority_{idx}', 'Medium')
-            subjects.append({'name': subj_name, 'priority': priority})
+    options = plan_options(request.form)
             
-    # Algorithm: Allocate time based on priority
-    # High = 3 pts, Medium = 2 pts, Low = 1 pt
-    priority_map = {'High': 3, 'Medium': 2, 'Low': 1}
-    
-    total_score = sum(priority_map[s['priority']] for s in subjects)
-    if total_score == 0: total_score = 1 # Avoid div/0
-    
-    plan = []
-    
-    for s in subjects:
-        weight = priority_map[s['priority']]
-        # Hours for this subject
-        allocated = (weight / total_score) * total_hours
-        allocated = round(allocated, 1) # Round to 1 decimal
-        
-        if allocated > 0:
-            plan.append({
-                "subject": s['name'],
-                "priority": s['priority'],
-                "hours": allocated,
-                "activity": f"Study {s['name']} - Focus on key concepts."
-            })
+    # Algorithm: Allocate time based on priority (and deadlines, over several days)
+    schedule = study_schedule(options)
             
     # Generate tips/summary if text provided (Legacy support in Plan Result)
     summary = ""
     tips = []
     if topic_text:
-        summary = summarizer.summarize(topic_text)
-        tips = generate_study_tips(topic_text)
+        analysis = analyze_text(topic_text)
+        summary = analysis["summary"]
+        tips = tips_from_keywords(analysis["keywords"])
         
     feedback = feedback_gen.generate_feedback("General")
     
     # Reformatter for template compatibility
     formatted_plan = []
-    hour_counter = 1
-    
-    # Sort plan by priority if needed, or keep order. 
-    # Current logic just appends order of input which is fine.
-    
-    for p in plan:
-        # Round duration to nearest integer hour for simplicity in this version
-        duration = int(round(p['hours']))
-        if duration < 1 and p['hours'] > 0: duration = 1 # Ensure at least 1 hour if allocated
-        
-        for _ in range(duration):
-            if hour_counter > total_hours: break
-            
-            # Study Session (50 mins)
-            formatted_plan.append({
-                "hour": f"Hour {hour_counter} (00-50m)", 
-                "activity": f"<strong>[{p['subject']} - {p['priority']}]</strong> {p['activity']} <br><span class='text-muted'>Focus intently without distractions.</span>",
-                "is_break": False
-            })
-            
-            # Break Session (10 mins)
-            formatted_plan.append({
-                "hour": f"Hour {hour_counter} (50-60m)", 
-                "activity": "<strong>Break Time</strong> - Stretch, hydrate, and rest your eyes.",
-                "is_break": True
-            })
-            
-            hour_counter += 1
+    for session in schedule.sessions():
+        if session['is_break']:
+            activity = "<strong>Break Time</strong> - Stretch, hydrate, and rest your eyes."
+        else:
+            activity = (f"<strong>[{escape(session['subject'])} - {escape(session['priority'])}]</strong> "
+                        f"{escape(session['activity'])} "
+                        "<br><span class='text-muted'>Focus intently without distractions.</span>")
+        formatted_plan.append({"hour": session['label'], "activity": activity, "is_break": session['is_break']})
+
+    # The download link carries the plan inputs, so the export is rebuilt per request
+    download_query = urlencode([(k, v) for k, v in request.form.items(multi=True) if k not in ('topic_text', 'start_date')]
+                               + [('start_date', options['start_date'])])
             
     return render_template('result.html', 
                            plan=formatted_plan, 
@@ -160,15 +313,18 @@ def generate_plan():
                            tips=tips, 
                            feedback=feedback,
                            resources=[],
+                           download_query=download_query,
                            subject="Multi-Subject Plan")
 
 # --- Quiz Feature ---
 
 @app.route('/quiz_setup')
 def quiz_setup():
-    subjects = []
-    if dataset is not None and 'subject' in dataset.columns:
-        subjects = sorted(dataset['subject'].dropna().unique().tolist())
+    # From the quiz model's category table; the app keeps no copy of the dataset
+    try:
+        subjects = quiz_gen.subjects()
+    except FileNotFoundError: # No quiz model published yet
+        subjects = []
     return render_template('quiz_setup.html', subjects=subjects)
 
 @app.route('/generate_quiz_only', methods=['POST'])
@@ -176,9 +332,15 @@ def generate_quiz_only():
     subject = request.form.get('subject')
     difficulty = request.form.get('difficulty', 'Easy')
     
-    quiz = quiz_gen.generate_quiz(subject, difficulty)
+    quiz = quiz_batcher((subject, difficulty, 5), timeout=BATCH_TIMEOUT)
+
+    # Follow-ups: passages related to the quiz as a whole, other than the ones just asked
+    follow_ups = []
+    if quiz:
+        contexts = [q['context'] for q in quiz]
+        follow_ups = quiz_gen.related_questions(" ".join(contexts), RELATED_QUESTIONS, exclude=contexts)
     
-    return render_template('quiz_page.html', subject=subject, quiz=quiz)
+    return render_template('quiz_page.html', subject=subject, quiz=quiz, follow_ups=follow_ups)
 
 # --- Summarizer Feature (New) ---
 
@@ -192,21 +354,19 @@ def summarize_text():
     summary = ""
     keywords = []
     feedback = ""
+    practice = []
     
     if text:
-        summary = summarizer.summarize(text)
-        keywords = generate_study_tips(text) # Reusing extraction logic to get keywords
-        # In nlp_utils, generate_study_tips calls extract_keywords but returns tips. 
-        # Let's verify nlp_utils usage or update it? 
-        # Actually nlp_utils.generate_study_tips returns a list of strings (tips).
-        # We need keywords. app.py doesn't import extract_keywords directly yet.
-        # Let's fix imports or just use tips as keywords for now? 
-        # Better: Import extract_keywords
-        from nlp_utils import extract_keywords
-        keywords = extract_keywords(text)
+        analysis = analyze_text(text)
+        summary, keywords = analysis["summary"], analysis["keywords"]
         feedback = feedback_gen.generate_feedback("Summary")
+        try:
+            practice = practice_questions(text)
+        except Exception as e: # The summary doesn't depend on the quiz model
+            print(f"Practice questions unavailable: {e}")
         
-    return render_template('summarizer.html', summary=summary, keywords=keywords, feedback=feedback)
+    return render_template('summarizer.html', summary=summary, keywords=keywords, feedback=feedback,
+                           practice=practice)
 
 # --- Resources Feature ---
 
@@ -214,14 +374,59 @@ def summarize_text():
 def resources():
     return render_template('resources.html')
 
+# --- Readiness ---
+
+@app.route('/ready')
+def ready():
+    status = {r.name: r.status() for r in RESOURCES}
+    is_ready = all(r.loaded for r in RESOURCES)
+    return jsonify(ready=is_ready, resources=status), (200 if is_ready else 503)
+
+@app.route('/models')
+def models_status():
+    return jsonify(model_registry.status())
+
+@app.route('/admin/reload_models', methods=['POST'])
+def reload_models():
+    # ?model=quiz_gen (repeatable) limits the reload; ?force=1 reloads unchanged models too
+    if MODEL_ADMIN_TOKEN:
+        allowed = hmac.compare_digest(request.headers.get("X-Admin-Token", ""), MODEL_ADMIN_TOKEN)
+    else:
+        allowed = request.remote_addr in ("127.0.0.1", "::1")
+    if not allowed:
+        return jsonify(error="Forbidden"), 403
+    names = request.args.getlist('model') or None
+    if names and any(n not in model_registry.entries for n in names):
+        return jsonify(error=f"Unknown model; expected one of {sorted(model_registry.entries)}"), 400
+    if reload_trigger is not None:
+        reload_trigger()
+        return jsonify(started=True), 202
+    started = model_registry.reload_async(names, force=request.args.get('force') in ('1', 'true'))
+    return jsonify(started=started, models=model_registry.status()), (202 if started else 409)
+
+@app.route('/batch_stats')
+def batch_stats():
+    return jsonify({b.name: b.stats() for b in BATCHERS})
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify({c.name: c.stats() for c in CACHES})
+
 # --- Download ---
 
 @app.route('/download_plan')
 def download_plan():
-    path = "static/study_schedule.csv"
-    if not os.path.exists(path):
-        with open(path, 'w') as f: f.write("Time,Activity\n9:00,Study")
-    return send_file(path, as_attachment=True)
+    # Streamed from the plan inputs in the query string; nothing is written to disk
+    options = plan_options(request.args)
+    if not options['subjects']:
+        return redirect(url_for('planner'))
+    schedule = study_schedule(options)
+    if request.args.get('format') == 'ics':
+        body, mimetype, filename = schedule.to_ics(), "text/calendar", "study_schedule.ics"
+    else:
+        body, mimetype, filename = schedule.to_csv(), "text/csv", "study_schedule.csv"
+    return Response(body, mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 if __name__ == '__main__':
     init_app()
@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+from suite import ROOT, probe_script, rss_mb # suite puts src/ on the path
+from ml_models import QuizGenerator
+
+def load(path, mode):
+    # Runs in a fresh interpreter (see probe_script): RSS is measured around the load only
+    import model_store
+    before = rss_mb()
+    start = time.perf_counter()
+    if mode == 'pickle':
+        model = QuizGenerator.load_model(path)
+    else:
+        model = model_store.load_quiz_artifact(path, mmap=mode == 'mmap')
+    seconds = time.perf_counter() - start
+    model.generate_quiz("Science", "Easy")
+    return {"seconds": seconds, "rss_mb": rss_mb() - before}
+
+def main(pickle_path=os.path.join(ROOT, "models", "quiz_generator.pkl"), scales=(1, 100, 1000)):
+    """
+    Compares load time and RSS growth of the legacy pickle and the artifact
+    directory, with the stored corpus replicated to several sizes.
+    """
+    base = QuizGenerator.load_model(pickle_path)
+    corpus = base.data_clustered.to_frame()
+    print(f"{'rows':>9} {'format':>16} {'size (MB)':>10} {'load (s)':>9} {'RSS +MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            import pandas as pd
+            base.data_clustered = pd.concat([corpus] * scale, ignore_index=True)
+            pkl = os.path.join(tmp, f"quiz_{scale}.pkl")
+            art = os.path.join(tmp, f"quiz_{scale}")
+            base.index = base.bank = None # Compare the models, not the serving tables
+            base.save_model(pkl)
+            base.save_model(art)
+            sizes = {
+                "pickle": os.path.getsize(pkl),
+                "artifact": sum(os.path.getsize(os.path.join(art, f)) for f in os.listdir(art)),
+            }
+            for mode, path, size in (("pickle", pkl, sizes["pickle"]),
+                                     ("mmap", art, sizes["artifact"]),
+                                     ("copy", art, sizes["artifact"])):
+                result = probe_script(__file__, path, mode)
+                label = "pickle" if mode == "pickle" else f"artifact ({mode})"
+                print(f"{len(base.data_clustered):>9} {label:>16} {size / 1e6:>10.1f} "
+                      f"{result['seconds']:>9.3f} {result['rss_mb']:>8.1f}")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["probe"]:
+        print(json.dumps(load(*sys.argv[2:])))
+    else:
+        main()
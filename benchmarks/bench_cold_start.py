@@ -0,0 +1,55 @@
+import json
+import sys
+import time
+
+from suite import ROOT, probe_script, peak_rss_mb
+
+REQUESTS = [
+    ("GET", "/", None),
+    ("GET", "/quiz_setup", None),
+    ("POST", "/generate_quiz_only", {"subject": "Science", "difficulty": "Easy"}),
+    ("POST", "/summarize_text", {"text_input": "Photosynthesis converts light energy into chemical energy in plants."}),
+    ("POST", "/generate_plan", {"total_hours": "4", "subject_0": "Math", "priority_0": "High"}),
+    ("GET", "/ready", None),
+]
+
+def cold_start():
+    # Runs in a fresh interpreter (see probe_script), so nothing is already imported or loaded
+    sys.path.insert(0, ROOT)
+    start = time.perf_counter()
+    import app
+    report = {"import_seconds": time.perf_counter() - start, "import_peak_rss_mb": peak_rss_mb()}
+
+    app.init_app(warmup=False)
+    client = app.app.test_client()
+    report["first_requests"] = []
+    for method, path, data in REQUESTS:
+        start = time.perf_counter()
+        resp = client.open(path, method=method, data=data)
+        report["first_requests"].append({
+            "route": f"{method} {path}",
+            "status": resp.status_code,
+            "seconds": time.perf_counter() - start,
+            "peak_rss_mb": peak_rss_mb(),
+        })
+    return report
+
+def main():
+    """
+    Prints import time and first-request latency of a cold app process.
+    """
+    report = probe_script(__file__)
+
+    print(f"import app: {report['import_seconds']:.3f}s, peak RSS {report['import_peak_rss_mb']:.0f} MB")
+    print(f"{'route':<28} {'status':>6} {'first (s)':>10} {'peak RSS (MB)':>14}")
+    for r in report["first_requests"]:
+        print(f"{r['route']:<28} {r['status']:>6} {r['seconds']:>10.3f} {r['peak_rss_mb']:>14.0f}")
+
+    if "--json" in sys.argv:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["probe"]:
+        print(json.dumps(cold_start()))
+    else:
+        main()
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+from suite import ROOT, probe_script, rss_mb # suite puts src/ on the path
+import pandas as pd
+from data_utils import load_data, iter_data, cache_path
+
+def load(path, mode):
+    # Runs in a fresh interpreter (see probe_script), so every mode starts cold and RSS is its own
+    before = rss_mb()
+    start = time.perf_counter()
+    peak = 0
+    if mode == 'csv':
+        rows = len(load_data(path))
+    elif mode == 'csv-projected':
+        rows = len(load_data(path, columns=['subject', 'topic'], categorical=True))
+    elif mode == 'cache':
+        rows = len(load_data(path, cache=True))
+    elif mode == 'cache-projected':
+        rows = len(load_data(path, columns=['subject', 'topic'], categorical=True, cache=True))
+    else:
+        rows = 0
+        for chunk in iter_data(path, chunksize=100_000, categorical=True):
+            rows += len(chunk)
+            peak = max(peak, rss_mb() - before)
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds, "rss_mb": max(peak, rss_mb() - before)}
+
+def build_corpus(path, rows):
+    # The bundled dataset replicated (with unique text) up to the requested size
+    base = load_data(os.path.join(ROOT, "data", "dataset.csv"))
+    reps = -(-rows // len(base))
+    df = pd.concat([base] * reps, ignore_index=True).iloc[:rows]
+    df['text'] = df['text'] + " #" + df.index.astype(str)
+    df.to_csv(path, index=False)
+
+def main(rows=1_000_000):
+    """
+    Compares a cold CSV parse, a warm content-hash cache and chunked streaming.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.csv")
+        build_corpus(path, rows)
+        print(f"Corpus: {rows} rows, {os.path.getsize(path) / 1e6:.0f} MB CSV")
+        print(f"{'mode':>16} {'load (s)':>9} {'RSS +MB':>8}")
+        results = {}
+        for mode in ("csv", "csv-projected", "cache", "cache", "cache-projected", "chunked"):
+            # The first 'cache' run parses the CSV and writes the cache; the second is warm
+            label = mode if mode != "cache" or "cache (cold)" in results else "cache (cold)"
+            label = "cache (warm)" if label == "cache" else label
+            result = probe_script(__file__, path, mode)
+            results[label] = result
+            print(f"{label:>16} {result['seconds']:>9.3f} {result['rss_mb']:>8.1f}")
+        print(f"Cache file: {os.path.basename(cache_path(path))}")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["probe"]:
+        print(json.dumps(load(*sys.argv[2:])))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
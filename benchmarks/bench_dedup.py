@@ -0,0 +1,50 @@
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'src'))
+
+import numpy as np
+import pandas as pd
+from data_utils import load_data, iter_data, dedup_data
+from ml_models import QuizGenerator
+
+def train_seconds(df):
+    start = time.perf_counter()
+    QuizGenerator().train(df)
+    return time.perf_counter() - start
+
+def main(rows=1_000_000, copies=20):
+    """
+    Streams a corpus of repeated rows through the dedup stage, then compares
+    training on the copies with training on the weighted, collapsed rows.
+    """
+    base = load_data(os.path.join(ROOT, "data", "dataset.csv"))
+    with tempfile.TemporaryDirectory() as tmp:
+        # Distinct passages repeated `copies` times, like generate_data's 20x volume
+        distinct = -(-rows // copies)
+        unique = pd.concat([base] * (-(-distinct // len(base))), ignore_index=True).iloc[:distinct]
+        # Shuffled word order keeps the passages distinct at the bigram level
+        rng = np.random.default_rng(0)
+        unique['text'] = [" ".join(rng.permutation(t.split())) for t in unique['text']]
+        path = os.path.join(tmp, "corpus.csv")
+        pd.concat([unique] * copies, ignore_index=True).iloc[:rows].to_csv(path, index=False)
+
+        start = time.perf_counter()
+        collapsed = dedup_data(iter_data(path, chunksize=100_000))
+        seconds = time.perf_counter() - start
+        print(f"Streaming dedup: {rows} rows -> {len(collapsed)} in {seconds:.1f}s "
+              f"({rows / seconds:,.0f} rows/s)")
+
+    # Training comparison on the bundled dataset repeated `copies` times
+    repeated = pd.concat([base] * copies, ignore_index=True)
+    weighted = dedup_data(repeated)
+    print(f"{'corpus':>10} {'rows':>7} {'MB':>7} {'train (s)':>10}")
+    for label, df in (("copies", repeated), ("weighted", weighted)):
+        mb = df.memory_usage(deep=True).sum() / 1e6
+        print(f"{label:>10} {len(df):>7} {mb:>7.1f} {train_seconds(df):>10.2f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,100 @@
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PORT = 8799
+
+ROUTES = {
+    "quiz": ("/generate_quiz_only", {"subject": "Science", "difficulty": "Easy"}),
+    "summarize": ("/summarize_text", {"text_input": " ".join(
+        f"Sentence {i} explains how cells convert nutrients into usable energy." for i in range(12))}),
+}
+
+def wait_ready(timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=2)
+            conn.request("GET", "/quiz_setup")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def load(path, form, clients, seconds):
+    body = urlencode(form)
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    counts = [0] * clients
+    errors = [0] * clients
+    stop = time.time() + seconds
+
+    def client(i):
+        conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+        while time.time() < stop:
+            try:
+                conn.request("POST", path, body, headers)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status == 200:
+                    counts[i] += 1
+                else:
+                    errors[i] += 1
+            except OSError:
+                errors[i] += 1
+                conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds, sum(errors)
+
+def pss_mb(pid):
+    # Proportional set size: shared pages are split between the processes sharing them
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def process_tree(pid):
+    out = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout.split()
+    return [pid] + [int(p) for p in out]
+
+def main(worker_counts=(1, 2, 4), clients_per_worker=8, seconds=5):
+    """
+    Requests per second on the quiz and summarizer routes, and total PSS of
+    master + workers, for several worker counts.
+    """
+    print(f"{'workers':>7} {'route':>10} {'req/s':>9} {'errors':>7} {'total PSS MB':>13}")
+    for workers in worker_counts:
+        server = subprocess.Popen(
+            [sys.executable, "serve.py", "--workers", str(workers), "--bind", f"127.0.0.1:{PORT}"],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_ready():
+                print("Server did not start")
+                return
+            time.sleep(1) # All workers warmed up
+            for name, (path, form) in ROUTES.items():
+                rps, errors = load(path, form, clients_per_worker * workers, seconds)
+                pss = sum(pss_mb(p) for p in process_tree(server.pid))
+                print(f"{workers:>7} {name:>10} {rps:>9.0f} {errors:>7} {pss:>13.0f}")
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+if __name__ == "__main__":
+    counts = tuple(int(a) for a in sys.argv[1:]) or (1, 2, 4)
+    main(counts)
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import numpy as np
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ml_models import QuizGenerator
+from generate_data import corpus_plan, generate_chunk
+
+def make_corpus(n_rows, seed=42):
+    """
+    A clustered-style frame of n_rows synthetic rows (generate_data, with
+    most rows repeating an earlier text) without training any model.
+    """
+    df = generate_chunk(corpus_plan(num_subjects=12, topics_per_subject=15), 0, n_rows, seed=seed,
+                        duplicate_ratio=0.95)
+    df['difficulty'] = np.where(np.random.default_rng(seed).random(n_rows) < 0.5, "Easy", "Medium")
+    return df
+
+def legacy_select(df, subject, difficulty, n):
+    mask = (
+        df['subject'].str.contains(subject, case=False, na=False) |
+        df['topic'].str.contains(subject, case=False, na=False)
+    )
+    subset = df[mask]
+    if subset.empty:
+        subset = df
+    filtered = subset[subset['difficulty'] == difficulty]
+    if filtered.empty:
+        filtered = subset
+    filtered = filtered.drop_duplicates(subset=['text'])
+    return filtered.sample(min(len(filtered), n))
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main(sizes=(1_000, 10_000, 100_000, 1_000_000), repeat=200):
+    queries = ["Subject 3", "topic 4", "ubjec", "nothing here"]
+    print(f"{'rows':>10} {'build (s)':>10} {'indexed (ms)':>14} {'legacy (ms)':>12}")
+    for n_rows in sizes:
+        df = make_corpus(n_rows)
+        qg = QuizGenerator()
+        qg.data_clustered = df
+
+        start = time.perf_counter()
+        qg._prepare_serving()
+        build = time.perf_counter() - start
+
+        def indexed():
+            for q in queries:
+                qg.generate_quiz(q, "Easy")
+
+        def legacy():
+            for q in queries:
+                legacy_select(df, q, "Easy", 5)
+
+        indexed_ms = timeit(indexed, repeat) / len(queries)
+        legacy_ms = timeit(legacy, max(repeat // 100, 1)) / len(queries)
+        print(f"{n_rows:>10} {build:>10.2f} {indexed_ms:>14.3f} {legacy_ms:>12.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""
+Benchmark suite with stored baselines.
+
+    python benchmarks/suite.py run [--sizes 1000 10000] [--cases quiz.] [--out FILE]
+    python benchmarks/suite.py compare BASELINE [CURRENT] [--threshold 0.2]
+
+Every (case, corpus size) runs in a fresh interpreter and records median wall
+time per operation, peak traced allocations (tracemalloc) and peak RSS during
+the measured calls. `run` writes the results as JSON; `compare` reports
+regressions beyond the threshold and exits non-zero when there are any.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'src'))
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+METRICS = ("wall_ms", "alloc_peak_mb", "rss_peak_mb")
+
+_corpora = {}
+
+def corpus(rows):
+    # Synthetic corpus (see generate_data.generate_corpus), generated in-process
+    if rows not in _corpora:
+        from generate_data import corpus_plan, generate_chunk
+        _corpora[rows] = generate_chunk(corpus_plan(), 0, rows, duplicate_ratio=0.5)
+    return _corpora[rows]
+
+def trained_quiz_generator(rows):
+    from data_utils import dedup_data
+    from ml_models import QuizGenerator
+    model = QuizGenerator()
+    model.train(dedup_data(corpus(rows)))
+    return model
+
+# --- Cases: setup(size) returns (fn, ops); fn() performs ops operations ---
+
+def case_quiz_train(size):
+    from ml_models import QuizGenerator
+    df = corpus(size)
+    return (lambda: QuizGenerator().train(df)), 1
+
+def case_quiz_train_out_of_core(size):
+    from ml_models import QuizGenerator
+    df = corpus(size)
+    return (lambda: QuizGenerator().train(df, out_of_core=True)), 1
+
+def case_quiz_generate(size):
+    model = trained_quiz_generator(size)
+    subjects = model.subjects()
+    def fn():
+        for i in range(100):
+            model.generate_quiz(subjects[i % len(subjects)], "Easy" if i % 2 else "Medium")
+    return fn, 100
+
+def case_quiz_related(size):
+    model = trained_quiz_generator(size)
+    texts = corpus(size)['text'].sample(100, random_state=0).tolist()
+    def fn():
+        for t in texts:
+            model.related(t, k=5)
+    return fn, len(texts)
+
+def case_quiz_load(size):
+    from ml_models import QuizGenerator
+    path = os.path.join(tempfile.mkdtemp(), "quiz_generator")
+    trained_quiz_generator(size).save_model(path)
+    return (lambda: QuizGenerator.load_model(path)), 1
+
+def case_summarize(size):
+    from dl_models import Summarizer
+    summarizer = Summarizer()
+    # Documents of 8 corpus passages each, so there is something to extract
+    passages = corpus(size)['text'].head(400).tolist()
+    texts = [" ".join(passages[i:i + 8]) for i in range(0, len(passages), 8)]
+    return (lambda: summarizer.summarize_many(texts, method="textrank")), len(texts)
+
+def seq2seq_case(numpy_runtime):
+    # Greedy seq2seq decoding of 32 texts with the bundled model, through Keras or the exported NumPy runtime
+    def setup(size):
+        import shutil
+        from dl_models import Summarizer
+        model_path = os.path.join(ROOT, "models", "summarizer.h5")
+        if not os.path.exists(Summarizer._tokenizer_path(model_path)):
+            raise RuntimeError(f"{model_path} has no tokenizers; retrain it with python train.py")
+        # A copy, so an exported runtime does not land next to the served model
+        path = os.path.join(tempfile.mkdtemp(), "summarizer.h5")
+        shutil.copy(model_path, path)
+        shutil.copy(Summarizer._tokenizer_path(model_path), Summarizer._tokenizer_path(path))
+        if numpy_runtime:
+            if os.path.exists(Summarizer.runtime_path(model_path)):
+                shutil.copy(Summarizer.runtime_path(model_path), Summarizer.runtime_path(path))
+            else:
+                from summarizer_runtime import export_summarizer
+                export_summarizer(Summarizer.load_model(path, numpy_runtime=False), Summarizer.runtime_path(path))
+        summarizer = Summarizer.load_model(path, numpy_runtime=numpy_runtime)
+        texts = [f"Sentence {i} explains how cells convert nutrients into usable energy for growth." for i in range(32)]
+        return (lambda: summarizer.summarize_many(texts, method="seq2seq")), len(texts)
+    return setup
+
+def case_extract_keywords(size):
+    from nlp_utils import extract_keywords, keyword_engine
+    keyword_engine.get()
+    texts = corpus(size)['text'].head(200).tolist()
+    def fn():
+        for t in texts:
+            extract_keywords(t)
+    return fn, len(texts)
+
+def case_clean_text(size):
+    from data_utils import clean_text
+    texts = corpus(size)['text'].tolist()
+    def fn():
+        for t in texts:
+            clean_text(t)
+    return fn, len(texts)
+
+def case_corpus_store(size):
+    from corpus_store import CorpusStore
+    df = corpus(size).assign(cluster=lambda d: d.index % 8, difficulty="Easy")
+    return (lambda: CorpusStore.from_frame(df)), 1
+
+def case_corpus_store_decode(size):
+    from corpus_store import CorpusStore
+    store = CorpusStore.from_frame(corpus(size))
+    return (lambda: store.texts()), 1
+
+def case_quiz_load_and_quiz(size):
+    # What a serving worker does first: load the artifact (memory-mapped) and build the serving tables
+    from ml_models import QuizGenerator
+    path = os.path.join(tempfile.mkdtemp(), "quiz_generator")
+    trained_quiz_generator(size).save_model(path)
+    def fn():
+        model = QuizGenerator.load_model(path)
+        model.generate_quiz(model.subjects()[0], "Easy")
+    return fn, 1
+
+def case_load_data(size):
+    from data_utils import load_data
+    path = os.path.join(tempfile.mkdtemp(), "corpus.csv")
+    corpus(size).to_csv(path, index=False)
+    return (lambda: load_data(path)), 1
+
+ROUTES = [
+    ("GET", "/", None),
+    ("GET", "/loading", None),
+    ("GET", "/dashboard", None),
+    ("GET", "/about", None),
+    ("GET", "/planner", None),
+    ("POST", "/generate_plan", {"total_hours": "4", "subject_0": "Math", "priority_0": "High",
+                                "subject_1": "History", "priority_1": "Low"}),
+    ("GET", "/quiz_setup", None),
+    ("POST", "/generate_quiz_only", {"subject": "Science", "difficulty": "Easy"}),
+    ("GET", "/summarizer", None),
+    ("POST", "/summarize_text", {"text_input": "Photosynthesis converts light energy into chemical energy. "
+                                               "Plants use chlorophyll to absorb light. Oxygen is released. "
+                                               "Glucose stores the energy for later use."}),
+    ("GET", "/resources", None),
+    ("GET", "/ready", None),
+    ("GET", "/batch_stats", None),
+    ("GET", "/cache_stats", None),
+    ("GET", "/download_plan?days=28&total_hours=6&subject_0=Math&priority_0=High"
+            "&subject_1=History&priority_1=Low&deadline_1=2030-01-15&format=csv", None),
+    ("GET", "/metrics", None),
+]
+
+def route_case(method, path, data):
+    def setup(size):
+        os.chdir(ROOT)
+        sys.path.insert(0, ROOT)
+        import app
+        app.init_app(warmup=False)
+        for resource in app.RESOURCES:
+            try:
+                resource.get()
+            except Exception as e:
+                print(f"{resource.name} unavailable: {e}")
+        client = app.app.test_client()
+        def fn():
+            for _ in range(20):
+                resp = client.open(path, method=method, data=data)
+                resp.close()
+                if resp.status_code >= 500:
+                    raise RuntimeError(f"{method} {path} returned {resp.status_code}")
+        return fn, 20
+    return setup
+
+# Cases that use the corpus run once per size; routes use the bundled models
+CASES = {
+    "quiz.train": (case_quiz_train, True),
+    "quiz.train_out_of_core": (case_quiz_train_out_of_core, True),
+    "quiz.generate_quiz": (case_quiz_generate, True),
+    "quiz.related": (case_quiz_related, True),
+    "quiz.load_model": (case_quiz_load, True),
+    "summarizer.summarize": (case_summarize, True),
+    "summarizer.seq2seq_keras": (seq2seq_case(False), False),
+    "summarizer.seq2seq_numpy": (seq2seq_case(True), False),
+    "nlp.extract_keywords": (case_extract_keywords, True),
+    "data.clean_text": (case_clean_text, True),
+    "data.load_data": (case_load_data, True),
+    "data.corpus_store": (case_corpus_store, True),
+    "data.corpus_store_decode": (case_corpus_store_decode, True),
+    "quiz.load_and_quiz": (case_quiz_load_and_quiz, True),
+}
+for _method, _path, _data in ROUTES:
+    CASES[f"route.{_method} {_path}"] = (route_case(_method, _path, _data), False)
+
+# --- Measurement (in the probe process) ---
+
+def _status_mb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _reset_peak_rss():
+    # Linux: writing 5 to clear_refs resets VmHWM, so the peak covers the case only
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def rss_mb():
+    """
+    Resident set size of this process, in MB.
+    """
+    return _status_mb('VmRSS')
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process, in MB.
+    """
+    return _status_mb('VmHWM')
+
+def measure(name, size, repeats):
+    import tracemalloc
+    setup, _ = CASES[name]
+    start = time.perf_counter()
+    fn, ops = setup(size)
+    fn() # Warm caches and lazy imports
+    setup_seconds = time.perf_counter() - start
+
+    peak_reset = _reset_peak_rss()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    rss_peak = _status_mb('VmHWM')
+
+    tracemalloc.start()
+    fn()
+    alloc_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times.sort()
+    return {
+        "wall_ms": times[len(times) // 2] / ops * 1000,
+        "alloc_peak_mb": alloc_peak / 1e6,
+        "rss_peak_mb": rss_peak,
+        "rss_peak_scoped": peak_reset,
+        "setup_seconds": setup_seconds,
+        "ops": ops,
+        "repeats": repeats,
+    }
+
+def run_json(cmd):
+    """
+    Runs cmd in a fresh process (from the repo root) and returns the JSON
+    object it printed last, or {"error": ...} with its last error line.
+    """
+    out = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+    if out.returncode != 0 or not lines:
+        errors = [l for l in out.stderr.splitlines() if "Error" in l or "Exception" in l]
+        return {"error": (errors or out.stderr.strip().splitlines() or ["no output"])[-1].strip()}
+    return json.loads(lines[-1])
+
+def probe(name, size, repeats):
+    return run_json([sys.executable, os.path.abspath(__file__), "probe", name, str(size), "--repeats", str(repeats)])
+
+def probe_script(script, *args):
+    """
+    Runs `python script probe args...` in a fresh interpreter, as the
+    standalone benchmarks measure cold processes, and returns its JSON report.
+    """
+    result = run_json([sys.executable, os.path.abspath(script), "probe"] + [str(a) for a in args])
+    if "error" in result:
+        sys.exit(f"{os.path.basename(script)} probe {' '.join(map(str, args))} failed: {result['error']}")
+    return result
+
+def run(sizes, pattern, repeats, out_path):
+    results = {}
+    print(f"{'case':<34} {'size':>8} {'wall ms/op':>11} {'alloc MB':>9} {'RSS MB':>8}")
+    for name, (_, sized) in CASES.items():
+        if pattern and not any(p in name for p in pattern):
+            continue
+        for size in (sizes if sized else [0]):
+            key = f"{name}@{size}" if sized else name
+            result = probe(name, size, repeats)
+            results[key] = result
+            if "error" in result:
+                print(f"{name:<34} {size or '-':>8}  error: {result['error']}")
+            else:
+                print(f"{name:<34} {size or '-':>8} {result['wall_ms']:>11.3f} "
+                      f"{result['alloc_peak_mb']:>9.1f} {result['rss_peak_mb']:>8.0f}")
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out_path}")
+    return report
+
+def compare(baseline_path, current_path, threshold, pattern=None):
+    """
+    Returns the list of (case, metric, baseline, current) regressions. A case
+    that errors in the current run, or is missing from it, is a regression;
+    pattern limits the baseline to the cases run (as run() filters them).
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    with open(current_path) as f:
+        current = json.load(f)["results"]
+    if pattern:
+        baseline = {k: v for k, v in baseline.items() if any(p in k.split("@")[0] for p in pattern)}
+
+    regressions = []
+    print(f"{'case':<44} {'metric':>14} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key in sorted(set(baseline) & set(current)):
+        old, new = baseline[key], current[key]
+        if "error" in new:
+            regressions.append((key, "error", old.get("error"), new["error"]))
+            print(f"{key:<44} error: {new['error']} REGRESSION")
+            continue
+        if "error" in old: # Nothing to compare against
+            print(f"{key:<44} baseline error: {old['error']}")
+            continue
+        for metric in METRICS:
+            if not old.get(metric):
+                continue
+            change = new[metric] / old[metric] - 1
+            flag = " REGRESSION" if change > threshold else ""
+            if flag:
+                regressions.append((key, metric, old[metric], new[metric]))
+            print(f"{key:<44} {metric:>14} {old[metric]:>10.3f} {new[metric]:>10.3f} {change:>+8.1%}{flag}")
+    for key in sorted(set(baseline) - set(current)):
+        regressions.append((key, "missing", None, None))
+        print(f"{key:<44} missing from current run REGRESSION")
+    print(f"{len(regressions)} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite with stored baselines")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="run the suite and write a JSON report")
+    p_run.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    p_run.add_argument("--cases", nargs="+", help="only cases whose name contains one of these")
+    p_run.add_argument("--repeats", type=int, default=5)
+    p_run.add_argument("--out", default=os.path.join(RESULTS_DIR, "latest.json"))
+
+    p_cmp = sub.add_parser("compare", help="compare a report against a baseline")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current", nargs="?", help="report to check (default: run the suite now)")
+    p_cmp.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown/growth")
+    p_cmp.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    p_cmp.add_argument("--cases", nargs="+")
+    p_cmp.add_argument("--repeats", type=int, default=5)
+
+    p_probe = sub.add_parser("probe", help=argparse.SUPPRESS)
+    p_probe.add_argument("name")
+    p_probe.add_argument("size", type=int)
+    p_probe.add_argument("--repeats", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.command == "probe":
+        print(json.dumps(measure(args.name, args.size, args.repeats)))
+    elif args.command == "run":
+        run(args.sizes, args.cases, args.repeats, args.out)
+    else:
+        current = args.current
+        if current is None:
+            current = os.path.join(RESULTS_DIR, "latest.json")
+            run(args.sizes, args.cases, args.repeats, current)
+        sys.exit(1 if compare(args.baseline, current, args.threshold, args.cases) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Production launcher: loads the models once in a master process,
+then forks worker processes that share them copy-on-write.
+
+    python serve.py --workers 4 --bind 0.0.0.0:8000 --max-requests 10000
+
+Send SIGHUP to the master (or POST /admin/reload_models, or pass
+--watch-models) to reload the models and replace the workers one at a time;
+SIGTERM or Ctrl+C stops them gracefully.
+"""
+import argparse
+import atexit
+import os
+import random
+import signal
+import sys
+
+# One BLAS/OpenMP thread per worker; the workers themselves provide the parallelism
+for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, "1")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import app as study_app
+from prefork import PreforkServer
+
+# Requests each worker serves to itself before accepting traffic (templates, batcher threads)
+WARMUP_REQUESTS = [
+    ("GET", "/", None),
+    ("GET", "/quiz_setup", None),
+    ("POST", "/generate_quiz_only", {"subject": "Science", "difficulty": "Easy"}),
+    ("POST", "/summarize_text", {"text_input": "Cells are the basic building blocks of life. "
+                                               "They carry out metabolism. They divide to grow."}),
+]
+
+def preload():
+    # Runs in the master before forking (and again on SIGHUP)
+    study_app.init_app(warmup=False, watch_models=0) # The master watches the models instead
+    for resource in study_app.RESOURCES:
+        resource.reset()
+        try:
+            resource.get()
+        except Exception as e:
+            print(f"Preload failed for {resource.name}: {e}")
+    if "tensorflow" in sys.modules:
+        print("Warning: TensorFlow was imported before fork; it is not fork-safe")
+
+def post_fork():
+    # Forked workers inherit the master's random state; give each its own
+    random.seed() # FeedbackGenerator draws from the module-level generator
+    if study_app.quiz_gen.loaded:
+        study_app.quiz_gen.reseed()
+    # Admin reloads go to the master, which preloads once and replaces every worker
+    master = os.getppid()
+    study_app.reload_trigger = lambda: os.kill(master, signal.SIGHUP)
+
+def warmup(wsgi_app):
+    client = wsgi_app.test_client()
+    for method, path, data in WARMUP_REQUESTS:
+        try:
+            client.open(path, method=method, data=data).close()
+        except Exception as e:
+            print(f"Warmup request {method} {path} failed: {e}")
+    study_app.metrics.registry.reset() # Report real traffic only
+
+def parse_bind(value):
+    host, _, port = value.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork production server for the study assistant")
+    parser.add_argument("--bind", type=parse_bind, default=("127.0.0.1", 8000), help="HOST:PORT")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-requests", type=int, default=0, help="recycle a worker after this many requests")
+    parser.add_argument("--max-requests-jitter", type=int, default=0)
+    parser.add_argument("--graceful-timeout", type=float, default=30)
+    parser.add_argument("--no-warmup", action="store_true", help="skip the per-worker warmup requests")
+    parser.add_argument("--shared-cache", nargs="?", const="", metavar="DIR",
+                        help="share cached results between workers (default: a private new dir in /dev/shm)")
+    parser.add_argument("--watch-models", type=float, default=0, metavar="SECONDS",
+                        help="poll the model artifacts and reload when they change")
+    parser.add_argument("--no-result-cache", action="store_true", help="recompute repeated summaries and plans")
+    args = parser.parse_args()
+
+    if args.no_result_cache:
+        for cache in study_app.CACHES:
+            cache.max_bytes = 0
+    elif args.shared_cache is not None:
+        backend = study_app.use_shared_cache(args.shared_cache or None)
+        backend.clear() # Entries from an earlier run (they would fail the new secret's check anyway)
+        atexit.register(backend.remove) # Workers leave with os._exit, so only the master runs this
+        print(f"Sharing cached results through {backend.directory}")
+
+    code = PreforkServer(
+        study_app.app,
+        bind=args.bind,
+        workers=args.workers,
+        preload=preload,
+        post_fork=post_fork,
+        warmup=None if args.no_warmup else warmup,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        graceful_timeout=args.graceful_timeout,
+        watch=study_app.model_registry.settled if args.watch_models else None,
+        watch_seconds=args.watch_models or 2.0,
+    ).run()
+    sys.exit(code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import contextvars
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Blueprint, Response, jsonify, request
+import datetime as dt
+from planner import build_schedule, MAX_PLAN_DAYS
+from lazy_loader import LazyResource
+from nlp_utils import MAX_KEYWORDS
+
+API_PREFIX = "/api/v1"
+MAX_BATCH_ITEMS = 1000
+MAX_SUMMARY_SENTENCES = 50
+MAX_QUIZ_QUESTIONS = 50
+CHUNK_SIZE = 16   # Items per vectorized model call; chunks run concurrently
+API_WORKERS = 4
+NDJSON = "application/x-ndjson"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _pool():
+    # Created on first use, so no threads exist before a prefork server forks
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+    return _executor
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def _payload():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ApiError("Request body must be a JSON object")
+    return data
+
+def _items(data, key):
+    items = data.get(key)
+    if not isinstance(items, list) or not items:
+        raise ApiError(f"'{key}' must be a non-empty array")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ApiError(f"At most {MAX_BATCH_ITEMS} items per batch", status=413)
+    return items
+
+def _texts(data):
+    texts = _items(data, "texts")
+    if not all(isinstance(t, str) for t in texts):
+        raise ApiError("'texts' must contain strings")
+    return texts
+
+def _int(data, key, default, low, high):
+    # An integer request field, rejected (not clamped) outside low-high
+    try:
+        value = int(data.get(key, default))
+    except (TypeError, ValueError):
+        raise ApiError(f"'{key}' must be an integer")
+    if not low <= value <= high:
+        raise ApiError(f"'{key}' must be {low}-{high}")
+    return value
+
+def _pin(model):
+    # Fixes the model version for the request up front, so its response headers report it
+    if isinstance(model, LazyResource):
+        model.get()
+
+def stream_batch(items, run_chunk, chunk_size=CHUNK_SIZE):
+    """
+    Runs run_chunk (a list of items in, a list of result dicts out) over chunks
+    of items in the API thread pool and streams one NDJSON line per item, in
+    completion order, so a slow chunk does not hold back the others. Each line
+    carries the item's index in the request.
+    """
+    # Chunks run with the request's context, so they use the model versions it pinned
+    context = contextvars.copy_context()
+
+    def generate():
+        futures = {_pool().submit(context.copy().run, run_chunk, items[start:start + chunk_size]): start
+                   for start in range(0, len(items), chunk_size)}
+        try:
+            for future in as_completed(futures):
+                start = futures[future]
+                size = min(chunk_size, len(items) - start)
+                try:
+                    lines = [dict(result, index=start + i) for i, result in enumerate(future.result())]
+                except Exception as e:
+                    lines = [{"index": start + i, "error": str(e)} for i in range(size)]
+                yield "".join(json.dumps(line) + "\n" for line in lines)
+        finally:
+            for future in futures: # Client went away: drop chunks not started yet
+                future.cancel()
+    return Response(generate(), mimetype=NDJSON)
+
+def create_api(quiz_gen, summarizer, extract_keywords_many, tips_from_keywords,
+               summary_method="textrank", summary_budget_ms=None):
+    """
+    Versioned JSON API with batch endpoints that stream NDJSON. The model
+    arguments may be LazyResource proxies.
+    """
+    api = Blueprint("api_v1", __name__, url_prefix=API_PREFIX)
+
+    @api.errorhandler(ApiError)
+    def api_error(e):
+        return jsonify(error=str(e)), e.status
+
+    @api.route("/quiz:batch", methods=["POST"])
+    def quiz_batch():
+        # {"requests": [{"subject", "difficulty", "num_questions"}], "fuzzy": false}
+        data = _payload()
+        requests = []
+        for item in _items(data, "requests"):
+            if not isinstance(item, dict) or not isinstance(item.get("subject"), str):
+                raise ApiError("Each request needs a 'subject' string")
+            num = _int(item, "num_questions", 5, 1, MAX_QUIZ_QUESTIONS)
+            requests.append((item["subject"], str(item.get("difficulty", "Easy")), num))
+        fuzzy = bool(data.get("fuzzy", False))
+        _pin(quiz_gen)
+
+        def run(chunk):
+            return [{"quiz": quiz} for quiz in quiz_gen.generate_quiz_batch(chunk, fuzzy=fuzzy)]
+        return stream_batch(requests, run)
+
+    @api.route("/related:batch", methods=["POST"])
+    def related_batch():
+        # {"queries": ["text", 42, ...], "k": 5} (a number is a corpus row position)
+        data = _payload()
+        queries = _items(data, "queries")
+        if not all(isinstance(q, str) or (isinstance(q, int) and not isinstance(q, bool) and q >= 0) for q in queries):
+            raise ApiError("'queries' must contain texts or row numbers (0 or more)")
+        k = _int(data, "k", 5, 1, 100)
+        _pin(quiz_gen)
+
+        def run(chunk):
+            results = []
+            for q in chunk:
+                try:
+                    results.append({"related": quiz_gen.related(q, k)})
+                except IndexError as e: # Row past the end of the corpus: only this item fails
+                    results.append({"error": str(e)})
+            return results
+        return stream_batch(queries, run)
+
+    @api.route("/summarize:batch", methods=["POST"])
+    def summarize_batch():
+        # {"texts": [...], "method": "textrank", "num_sentences": 3, "budget_ms": 50}
+        data = _payload()
+        texts = _texts(data)
+        method = data.get("method", summary_method)
+        if method not in ("textrank", "seq2seq", "truncate"):
+            raise ApiError("'method' must be textrank, seq2seq or truncate")
+        options = {}
+        if method != "seq2seq":
+            options["num_sentences"] = _int(data, "num_sentences", 3, 1, MAX_SUMMARY_SENTENCES)
+            budget = data.get("budget_ms", summary_budget_ms)
+            if budget is not None and (isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget <= 0):
+                raise ApiError("'budget_ms' must be a positive number")
+            options["budget_ms"] = budget
+        _pin(summarizer)
+
+        def run(chunk):
+            return [{"summary": s} for s in summarizer.summarize_many(chunk, method=method, **options)]
+        # seq2seq decodes the whole request as one batch
+        return stream_batch(texts, run, chunk_size=len(texts) if method == "seq2seq" else CHUNK_SIZE)
+
+    @api.route("/keywords:batch", methods=["POST"])
+    def keywords_batch():
+        # {"texts": [...], "num": 5, "tips": false}; num is 1-MAX_KEYWORDS (the engine ranks no more)
+        data = _payload()
+        texts = _texts(data)
+        num = _int(data, "num", 5, 1, MAX_KEYWORDS)
+        with_tips = bool(data.get("tips", False))
+
+        def run(chunk):
+            results = []
+            for keywords in extract_keywords_many(chunk, num):
+                result = {"keywords": keywords}
+                if with_tips:
+                    result["tips"] = tips_from_keywords(keywords)
+                results.append(result)
+            return results
+        return stream_batch(texts, run)
+
+    @api.route("/plans:batch", methods=["POST"])
+    def plans_batch():
+        # {"plans": [{"days": 14, "hours_per_day": 4, "start_date": "2026-01-05", "breaks": true,
+        #             "subjects": [{"name", "priority", "deadline", "max_hours_per_day"}]}]}
+        plans = []
+        for item in _items(_payload(), "plans"):
+            subjects = item.get("subjects") if isinstance(item, dict) else None
+            if not isinstance(subjects, list) or not all(isinstance(s, dict) and "name" in s for s in subjects):
+                raise ApiError("Each plan needs a 'subjects' array of {name, priority}")
+            try:
+                days = int(item.get("days", 1))
+                hours = int(item.get("hours_per_day", item.get("total_hours", 4)))
+                start = dt.date.fromisoformat(item["start_date"]) if item.get("start_date") else None
+                subjects = [{"name": str(s["name"]), "priority": s.get("priority", "Medium"),
+                             "deadline": s.get("deadline"),
+                             "max_hours_per_day": int(s.get("max_hours_per_day") or 0)} for s in subjects]
+                for s in subjects:
+                    if isinstance(s["deadline"], str):
+                        dt.date.fromisoformat(s["deadline"])
+            except (TypeError, ValueError) as e:
+                raise ApiError(f"Invalid plan: {e}")
+            if not 1 <= days <= MAX_PLAN_DAYS or not 1 <= hours <= 16:
+                raise ApiError(f"'days' must be 1-{MAX_PLAN_DAYS} and 'hours_per_day' 1-16")
+            plans.append((subjects, days, hours, start, bool(item.get("breaks", True))))
+
+        def run(chunk):
+            results = []
+            for subjects, days, hours, start, breaks in chunk:
+                schedule = build_schedule(subjects, days=days, hours_per_day=hours, start_date=start)
+                results.append({"allocation": schedule.allocation(),
+                                "sessions": list(schedule.sessions(breaks=breaks)),
+                                "unscheduled_hours": int(schedule.unscheduled.sum())})
+            return results
+        return stream_batch(plans, run)
+
+    return api
@@ -0,0 +1,147 @@
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from lazy_loader import pinned_resources
+from metrics import span
+
+class MicroBatcher:
+    """
+    Coalesces concurrent inference calls into batches.
+
+    Items are queued and flushed through batch_fn (a list in, a list of results
+    out) once max_batch_size items are waiting or the oldest one has waited
+    max_wait_ms. Each caller gets its own result through a Future.
+
+    resources are the LazyResources batch_fn uses. submit() pins them in the
+    caller's context, and batch_fn runs in that context, once per group of
+    items pinned to the same objects, so a request keeps the model version it
+    pinned even if a newer one is swapped in while its item is queued.
+    """
+    def __init__(self, name, batch_fn, max_batch_size=32, max_wait_ms=5, resources=()):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.resources = list(resources)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._span = span(f"batch.{name}")
+        self._stats = {
+            "batches": 0,
+            "items": 0,
+            "errors": 0,
+            "max_batch_size_seen": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "total_run_seconds": 0.0,
+        }
+
+    def submit(self, item):
+        """
+        Queues one item and returns a Future for its result.
+        """
+        self._ensure_worker()
+        for resource in self.resources:
+            resource.get() # Pins it, if the caller pins
+        pins = pinned_resources()
+        group = tuple(id(pins[r.name][0]) if r.name in pins else None for r in self.resources)
+        future = Future()
+        self._queue.put((item, future, time.perf_counter(), group, contextvars.copy_context()))
+        return future
+
+    def __call__(self, item, timeout=None):
+        # Raises concurrent.futures.TimeoutError after timeout seconds
+        return self.submit(item).result(timeout)
+
+    def _ensure_worker(self):
+        # Started on first use so no thread exists before a prefork server forks
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0][2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait()) # Take what's already queued
+                except queue.Empty:
+                    break
+            try:
+                self._flush(batch)
+            except Exception as e: # Keep the worker alive; whoever is still waiting gets the error
+                print(f"Batcher {self.name} failed to flush {len(batch)} items: {e!r}")
+                for entry in batch:
+                    if not entry[1].done():
+                        entry[1].set_exception(e)
+
+    def _flush(self, batch):
+        groups = {}
+        for entry in batch:
+            groups.setdefault(entry[3], []).append(entry)
+        for group in groups.values():
+            self._flush_group(group)
+
+    def _flush_group(self, batch):
+        # Runs in the first caller's context: every item of the group pinned the same objects
+        start = time.perf_counter()
+        items = [entry[0] for entry in batch]
+        try:
+            with self._span:
+                results = list(batch[0][4].run(self.batch_fn, items))
+            error = None
+            if len(results) != len(items):
+                error = ValueError(f"Batcher {self.name}: batch_fn returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            error = e
+        run_seconds = time.perf_counter() - start
+
+        for i, (_, future, _, _, _) in enumerate(batch):
+            if future.done(): # Cancelled by its caller
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+
+        waits = [start - entry[2] for entry in batch]
+        with self._lock:
+            s = self._stats
+            s["batches"] += 1
+            s["items"] += len(batch)
+            s["errors"] += error is not None
+            s["max_batch_size_seen"] = max(s["max_batch_size_seen"], len(batch))
+            s["total_wait_seconds"] += sum(waits)
+            s["max_wait_seconds"] = max(s["max_wait_seconds"], max(waits))
+            s["total_run_seconds"] += run_seconds
+
+    def stats(self):
+        """
+        Queue depth, batch size and wait-time statistics for tuning.
+        """
+        with self._lock:
+            s = dict(self._stats)
+        batches, items = s["batches"], s["items"]
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": batches,
+            "items": items,
+            "errors": s["errors"],
+            "mean_batch_size": items / batches if batches else 0.0,
+            "max_batch_size_seen": s["max_batch_size_seen"],
+            "mean_wait_ms": s["total_wait_seconds"] / items * 1000 if items else 0.0,
+            "max_wait_ms_seen": s["max_wait_seconds"] * 1000,
+            "mean_batch_run_ms": s["total_run_seconds"] / batches * 1000 if batches else 0.0,
+        }
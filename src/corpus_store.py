@@ -0,0 +1,200 @@
+import sys
+import numpy as np
+import pandas as pd
+import model_store # Module import: model_store imports this module too
+
+TEXT_COLUMNS = ("text",)
+DROPPED_COLUMNS = ("summary", "cleaned_text", "cleaned_summary") # Not needed to serve quizzes
+
+def _narrow(array):
+    # Integer arrays in the narrowest type that holds their values
+    if array.dtype.kind not in "iu" or not len(array):
+        return array
+    return array.astype(np.result_type(np.min_scalar_type(array.min()), np.min_scalar_type(array.max())))
+
+def _small_codes(codes, categories):
+    # Narrowest signed integer type that holds every code (and -1 for missing)
+    return np.asarray(codes).astype(np.min_scalar_type(-max(len(categories), 1)))
+
+def _compact_column(name, values):
+    # (kind, payload) of a Series, as CorpusStore holds it
+    if name in TEXT_COLUMNS:
+        return ("text", model_store.encode_strings(values))
+    if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+        return ("numeric", _narrow(values.to_numpy()))
+    codes, categories = pd.factorize(values.astype(object))
+    return ("categorical", (_small_codes(codes, categories), np.asarray(categories, dtype=object)))
+
+class CorpusStore:
+    """
+    Column store of the clustered corpus kept for serving.
+
+    Texts are one contiguous UTF-8 buffer plus offsets and are decoded only
+    when read; other string columns (subject, topic, difficulty) are integer
+    codes into a category table, and numeric columns (cluster, the dedup
+    weight) are narrow numpy arrays. The columns serving does not read
+    (summary, cleaned_*) are dropped. Columns are read back as pandas Series
+    with store[name], so code written against the DataFrame keeps working.
+    """
+    def __init__(self, columns, n_rows, text_codes=None):
+        # columns: name -> ("text", (data, offsets, missing)) | ("categorical", (codes, categories)) | ("numeric", array)
+        # text_codes: name -> (codes, first_rows) already known for a text column (see text_codes())
+        self._columns = dict(columns)
+        self.n_rows = n_rows
+        self._text_codes = dict(text_codes or {})
+
+    @classmethod
+    def from_frame(cls, df, **extra):
+        """
+        Compacts the DataFrame df, plus the row-aligned extra columns.
+        """
+        columns = {}
+        for name, values in list(df.items()) + [(name, pd.Series(v)) for name, v in extra.items()]:
+            if name not in DROPPED_COLUMNS:
+                columns[name] = _compact_column(name, values)
+        return cls(columns, len(df))
+
+    def with_columns(self, **extra):
+        """
+        A new store with the row-aligned extra columns added (or replaced).
+        """
+        columns = dict(self._columns)
+        for name, values in extra.items():
+            columns[name] = _compact_column(name, pd.Series(values))
+        known = {name: codes for name, codes in getattr(self, '_text_codes', {}).items() if name not in extra}
+        return CorpusStore(columns, self.n_rows, known)
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def kind(self, name):
+        return self._columns[name][0]
+
+    def payload(self, name):
+        """
+        The arrays behind a column (see __init__).
+        """
+        return self._columns[name][1]
+
+    def categories(self, name):
+        """
+        Category table of a string column: each distinct value once.
+        """
+        kind, payload = self._columns[name]
+        if kind != "categorical":
+            raise ValueError(f"Column {name} is not categorical")
+        return payload[1]
+
+    def factorize(self, name):
+        """
+        (codes, uniques) of a column as pd.factorize returns them (-1 where
+        missing); categorical columns answer from their codes without
+        building a value per row.
+        """
+        kind, payload = self._columns[name]
+        if kind != "categorical":
+            codes, uniques = pd.factorize(self[name])
+            return codes.astype(np.int32), np.asarray(uniques, dtype=object)
+        codes, categories = payload
+        return codes.astype(np.int32), categories
+
+    def texts(self, name="text", rows=None):
+        """
+        Decoded values of a text column (NaN where missing), for rows or all rows.
+        """
+        data, offsets, missing = self.payload(name)
+        rows = np.arange(self.n_rows) if rows is None else np.asarray(rows)
+        starts, ends = offsets[rows].tolist(), offsets[rows + 1].tolist()
+        if rows.size == self.n_rows and (not len(data) or data.max() < 0x80):
+            # ASCII: byte offsets are character offsets, so the buffer is decoded once and sliced
+            text = bytes(data).decode('ascii')
+            values = np.array([text[a:b] for a, b in zip(starts, ends)] + [None], dtype=object)[:-1]
+        else:
+            buffer = memoryview(data)
+            values = np.array([str(buffer[a:b], 'utf-8') for a, b in zip(starts, ends)] + [None], dtype=object)[:-1]
+        if missing is not None:
+            values[missing[rows]] = np.nan
+        return values
+
+    def text_codes(self, name="text"):
+        """
+        (codes, first_rows) of a text column: each row's code among the distinct
+        texts (missing counts as one value), and the first row holding each
+        code. The decoded texts are dropped once compared, and the result is
+        kept for the next call.
+        """
+        known = self.__dict__.setdefault('_text_codes', {}) # Stores pickled before it existed
+        if name not in known:
+            codes, _ = pd.factorize(self.texts(name), use_na_sentinel=False)
+            _, first_rows = np.unique(codes, return_index=True) # Codes are numbered by first appearance
+            known[name] = (codes.astype(np.int32), first_rows)
+        return known[name]
+
+    def __getitem__(self, name):
+        kind, payload = self._columns[name]
+        if kind == "text":
+            values = self.texts(name)
+        elif kind == "categorical":
+            codes, categories = payload
+            values = np.append(categories, np.nan).astype(object)[codes] # Code -1 picks the trailing NaN
+        else:
+            values = payload
+        return pd.Series(values, name=name)
+
+    def to_frame(self, columns=None):
+        return pd.DataFrame({name: self[name] for name in (columns or self.columns)})
+
+    def append(self, df):
+        """
+        A new store with the rows of df (reindexed to these columns) added.
+        """
+        if not len(df):
+            return self
+        df = df.reindex(columns=self.columns)
+        columns = {}
+        for name, (kind, payload) in self._columns.items():
+            values = df[name]
+            if kind == "text":
+                data, offsets, missing = payload
+                new_data, new_offsets, new_missing = model_store.encode_strings(values)
+                if missing is not None or new_missing is not None:
+                    missing = np.concatenate([np.zeros(self.n_rows, dtype=bool) if missing is None else missing,
+                                              np.zeros(len(df), dtype=bool) if new_missing is None else new_missing])
+                columns[name] = (kind, (np.concatenate([data, new_data]),
+                                        np.concatenate([offsets, offsets[-1] + new_offsets[1:]]), missing))
+            elif kind == "categorical":
+                codes, categories = payload
+                lookup = {v: i for i, v in enumerate(categories)}
+                new_codes = []
+                for v in values:
+                    if pd.isna(v):
+                        new_codes.append(-1)
+                        continue
+                    if v not in lookup:
+                        lookup[v] = len(lookup)
+                    new_codes.append(lookup[v])
+                categories = np.array(list(lookup), dtype=object)
+                columns[name] = (kind, (_small_codes(np.concatenate([codes, np.asarray(new_codes, dtype=np.int64)]), categories), categories))
+            else:
+                columns[name] = (kind, _narrow(np.concatenate([payload, values.to_numpy()])))
+        return CorpusStore(columns, self.n_rows + len(df))
+
+    def memory_report(self):
+        """
+        Bytes held per column (arrays plus the category strings), and in total.
+        """
+        report = {}
+        for name, (kind, payload) in self._columns.items():
+            if kind == "text":
+                size = sum(a.nbytes for a in payload if a is not None)
+            elif kind == "categorical":
+                codes, categories = payload
+                size = codes.nbytes + categories.nbytes + sum(sys.getsizeof(c) for c in categories)
+            else:
+                size = payload.nbytes
+            report[name] = {"kind": kind, "bytes": int(size)}
+        return {"rows": self.n_rows, "columns": report, "total_bytes": sum(c["bytes"] for c in report.values())}
@@ -1,7 +1,14 @@
 import pandas as pd
+import numpy as np
+import hashlib
+import json
 import re
+import zlib
 import os
 
+CATEGORICAL_COLUMNS = ['subject', 'topic']
+CACHE_DIRNAME = ".cache"
+
 def clean_text(text):
     """
     Cleans text by lowercasing and removing special characters.
@@ -12,14 +19,155 @@ def clean_text(text):
     text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
     return text
 
-def load_data(filepath):
+def _parquet_available():
+    try:
+        import pyarrow # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def file_digest(filepath, block_size=1 << 20):
+    """
+    Content hash of a file, streamed in blocks.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _stamp(filepath):
+    st = os.stat(filepath)
+    return [st.st_size, st.st_mtime_ns]
+
+def _digest_path(filepath, cache_dir):
+    return os.path.join(cache_dir, os.path.basename(filepath) + ".digest.json")
+
+def _recorded_digest(filepath, cache_dir):
+    # The digest _cached_digest recorded, if size and mtime are unchanged since; hashes nothing
+    try:
+        with open(_digest_path(filepath, cache_dir)) as f:
+            recorded = json.load(f)
+        if recorded["stamp"] == _stamp(filepath):
+            return recorded["digest"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+def _cached_digest(filepath, cache_dir):
+    # Re-hash only when size or mtime changed since the digest was recorded
+    digest = _recorded_digest(filepath, cache_dir)
+    if digest is not None:
+        return digest
+    stamp = _stamp(filepath)
+    digest = file_digest(filepath)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(_digest_path(filepath, cache_dir), 'w') as f:
+        json.dump({"stamp": stamp, "digest": digest}, f)
+    return digest
+
+def _apply_dtypes(df, categorical):
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            if categorical and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+            elif not categorical and isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype(df[col].cat.categories.dtype)
+    return df
+
+def _read_csv(filepath, columns=None, categorical=False, **kwargs):
+    dtype = {c: 'category' for c in CATEGORICAL_COLUMNS if columns is None or c in columns} if categorical else None
+    return pd.read_csv(filepath, usecols=columns, dtype=dtype, **kwargs)
+
+def _cache_file(filepath, cache_dir, digest):
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    ext = ".parquet" if _parquet_available() else ".pkl"
+    return os.path.join(cache_dir, f"{stem}-{digest}{ext}")
+
+def cache_path(filepath, cache_dir=None):
+    """
+    Path of the columnar cache for a CSV, keyed by the CSV's content hash.
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(filepath), CACHE_DIRNAME)
+    return _cache_file(filepath, cache_dir, _cached_digest(filepath, cache_dir))
+
+def _write_cache(df, path):
+    # Written under a temporary name and renamed, so readers never see a partial file
+    tmp = f"{path}.tmp-{os.getpid()}"
+    if path.endswith(".parquet"):
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, path)
+    # Caches of older versions of the same file are stale now. Only exact
+    # <stem>-<digest>.<ext> names match: not other CSVs' caches, not temp files
+    stem = os.path.basename(path).rsplit("-", 1)[0]
+    stale = re.compile(re.escape(stem) + r"-[0-9a-f]{32}\.(parquet|pkl)")
+    cache_dir = os.path.dirname(path)
+    for name in os.listdir(cache_dir):
+        old = os.path.join(cache_dir, name)
+        if stale.fullmatch(name) and old != path:
+            try:
+                os.remove(old)
+            except FileNotFoundError: # Another process cleaned it up first
+                pass
+
+def _read_cache(path, columns=None):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    df = pd.read_pickle(path)
+    return df[columns] if columns is not None else df
+
+def load_data(filepath, columns=None, categorical=False, cache=False, cache_dir=None):
     """
     Loads data from a CSV file.
+
+    columns limits the result to the given columns; categorical=True stores
+    subject/topic as categories. With cache=True the parsed file is kept in a
+    Parquet cache (a pickle when pyarrow is missing) keyed by the CSV's content
+    hash, so later loads of an unchanged file skip CSV parsing.
     """
     if not os.path.exists(filepath):
         print(f"File not found: {filepath}")
         return None
-    return pd.read_csv(filepath)
+    if not cache:
+        return _read_csv(filepath, columns, categorical)
+
+    path = cache_path(filepath, cache_dir)
+    if os.path.exists(path):
+        try:
+            return _apply_dtypes(_read_cache(path, columns), categorical)
+        except Exception as e:
+            print(f"Ignoring unreadable cache {path}: {e}")
+    # Cache the whole file once, then project
+    df = _read_csv(filepath, categorical=True)
+    _write_cache(df, path)
+    if columns is not None:
+        df = df[columns]
+    return _apply_dtypes(df, categorical)
+
+def iter_data(filepath, columns=None, chunksize=100_000, categorical=False, cache_dir=None):
+    """
+    Yields the dataset in DataFrames of at most chunksize rows, so corpora larger
+    than memory can be streamed. Reads from the Parquet cache when
+    load_data(cache=True) wrote one for the file as it is now; streaming never
+    hashes the file or writes a cache itself.
+    """
+    if not os.path.exists(filepath):
+        print(f"File not found: {filepath}")
+        return
+    path = None
+    if _parquet_available():
+        cache_dir = cache_dir or os.path.join(os.path.dirname(filepath), CACHE_DIRNAME)
+        digest = _recorded_digest(filepath, cache_dir)
+        path = _cache_file(filepath, cache_dir, digest) if digest is not None else None
+    if path is not None and os.path.exists(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield _apply_dtypes(batch.to_pandas(), categorical)
+        return
+    for chunk in _read_csv(filepath, columns, categorical, chunksize=chunksize):
+        yield chunk
 
 def save_data(df, filepath):
     """
@@ -28,3 +176,166 @@ def save_data(df, filepath):
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
     df.to_csv(filepath, index=False)
     print(f"Data saved to {filepath}")
+
+WEIGHT_COLUMN = "weight"
+
+class MinHasher:
+    """
+    MinHash signatures over word-bigram shingles, computed for many texts at once.
+    """
+    def __init__(self, num_perm=64, seed=1, block_size=1 << 16):
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: (a * x + b) mod 2^64, keeping the high 32 bits
+        self.a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+        self.block_size = block_size
+
+    @staticmethod
+    def shingles(text):
+        words = str(text).split()
+        grams = [" ".join(words[i:i + 2]) for i in range(len(words) - 1)] or words
+        return {zlib.crc32(g.encode('utf-8')) for g in grams}
+
+    def signatures(self, texts):
+        hashed = [np.fromiter(self.shingles(t), dtype=np.uint64) for t in texts]
+        out = np.full((len(hashed), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        # Rows are processed in blocks of about block_size shingles to bound memory
+        start = 0
+        while start < len(hashed):
+            stop, total = start, 0
+            while stop < len(hashed) and (total == 0 or total + len(hashed[stop]) <= self.block_size):
+                total += len(hashed[stop])
+                stop += 1
+            lengths = np.array([len(h) for h in hashed[start:stop]])
+            nonempty = np.flatnonzero(lengths)
+            if len(nonempty):
+                flat = np.concatenate(hashed[start:stop])
+                values = ((flat[:, None] * self.a + self.b) >> np.uint64(32)).astype(np.uint32)
+                offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])[nonempty]
+                out[start + nonempty] = np.minimum.reduceat(values, offsets, axis=0)
+            start = stop
+        return out
+
+class Deduplicator:
+    """
+    Streaming dedup: exact duplicates are collapsed by a content hash of the
+    whole row, near-duplicates (same subject and topic, estimated Jaccard
+    similarity of the text >= threshold) by MinHash with LSH banding.
+
+    Chunks are fed to add(); frame() returns one representative per group
+    with a weight column holding how many input rows it stands for. Memory
+    grows with the number of distinct rows, not the input size.
+    """
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, text_column='text', group_columns=('subject', 'topic')):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.text_column = text_column
+        self.group_columns = list(group_columns)
+        self.hasher = MinHasher(num_perm)
+        self.rows_in = 0
+        self._exact = {}     # content hash -> representative id
+        self._buckets = {}   # (group, band, band bytes) -> representative id
+        self._groups = {}
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._weights = np.empty(0, dtype=np.int64)
+        self._count = 0
+        self._parts = []
+
+    def _reserve(self, n):
+        # Amortized doubling for the per-representative arrays
+        need = self._count + n
+        if need > len(self._weights):
+            size = max(need, 2 * len(self._weights), 1024)
+            self._weights = np.concatenate([self._weights, np.zeros(size - len(self._weights), dtype=np.int64)])
+            self._signatures = np.concatenate([
+                self._signatures,
+                np.zeros((size - len(self._signatures), self._signatures.shape[1]), dtype=np.uint32)])
+
+    def add(self, chunk):
+        chunk = chunk.reset_index(drop=True)
+        self.rows_in += len(chunk)
+        weights = chunk[WEIGHT_COLUMN].to_numpy(dtype=np.int64) if WEIGHT_COLUMN in chunk.columns \
+            else np.ones(len(chunk), dtype=np.int64)
+        content = chunk.drop(columns=[WEIGHT_COLUMN], errors='ignore')
+
+        # Exact duplicates within the chunk collapse in one vectorized pass
+        hashes = pd.util.hash_pandas_object(content, index=False).to_numpy()
+        codes, uniques = pd.factorize(hashes)
+        first = np.full(len(uniques), len(chunk))
+        np.minimum.at(first, codes, np.arange(len(chunk)))
+        unique_weights = np.bincount(codes, weights=weights).astype(np.int64)
+
+        reps = np.array([self._exact.get(h, -1) for h in uniques.tolist()], dtype=np.int64)
+        seen = reps >= 0
+        np.add.at(self._weights, reps[seen], unique_weights[seen])
+        fresh = np.flatnonzero(~seen)
+        if not len(fresh):
+            return
+
+        # Near duplicates: LSH candidates, confirmed by signature agreement
+        rows = first[fresh]
+        texts = [clean_text(t) for t in chunk[self.text_column].iloc[rows]]
+        signatures = self.hasher.signatures(texts)
+        present = [c for c in self.group_columns if c in chunk.columns]
+        group_keys = list(chunk[present].iloc[rows].astype(str).itertuples(index=False, name=None))
+        self._reserve(len(fresh))
+        kept = []
+        r = self.rows_per_band
+        for j, u in enumerate(fresh):
+            sig = signatures[j]
+            group = self._groups.setdefault(group_keys[j], len(self._groups))
+            keys = [(group, band, sig[band * r:(band + 1) * r].tobytes()) for band in range(self.bands)]
+            match = -1
+            for key in keys:
+                candidate = self._buckets.get(key)
+                if candidate is not None and np.mean(self._signatures[candidate] == sig) >= self.threshold:
+                    match = candidate
+                    break
+            if match < 0:
+                match = self._count
+                self._count += 1
+                self._signatures[match] = sig
+                for key in keys:
+                    self._buckets.setdefault(key, match)
+                kept.append(rows[j])
+            self._weights[match] += unique_weights[u]
+            self._exact[uniques[u]] = match
+        self._parts.append(content.iloc[kept])
+
+    def frame(self):
+        """
+        The collapsed corpus, in first-seen order, with its weight column.
+        """
+        if not self._parts:
+            return pd.DataFrame()
+        df = pd.concat(self._parts, ignore_index=True)
+        df[WEIGHT_COLUMN] = self._weights[:self._count]
+        return df
+
+    def stats(self):
+        return {"rows_in": self.rows_in, "rows_out": self._count,
+                "exact_keys": len(self._exact), "buckets": len(self._buckets)}
+
+def dedup_data(data, threshold=0.8, **options):
+    """
+    Collapses exact and near-duplicate rows into weighted representatives.
+    data is a DataFrame or an iterable of DataFrame chunks (see iter_data).
+    """
+    dedup = Deduplicator(threshold=threshold, **options)
+    for chunk in ([data] if isinstance(data, pd.DataFrame) else data):
+        dedup.add(chunk)
+    s = dedup.stats()
+    print(f"Dedup: {s['rows_in']} rows -> {s['rows_out']} weighted rows")
+    return dedup.frame()
+
+def sample_weights(df):
+    """
+    Row weights of a (possibly deduplicated) frame: its weight column, or ones.
+    """
+    if WEIGHT_COLUMN in df.columns:
+        return df[WEIGHT_COLUMN].fillna(1).to_numpy(dtype=np.float64)
+    return np.ones(len(df))
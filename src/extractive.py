@@ -0,0 +1,58 @@
+import re
+import time
+import numpy as np
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+
+def split_sentences(text):
+    """
+    Splits text into sentences on end punctuation and line breaks.
+    """
+    return [s.strip() for s in SENTENCE_SPLIT.split(text) if s and s.strip()]
+
+def textrank_scores(sentences, damping=0.85, max_iter=50, tol=1e-6, deadline=None):
+    """
+    Ranks sentences with TextRank over the TF-IDF cosine-similarity graph.
+
+    The similarity matrix S = X X^T (minus its diagonal) is never materialized:
+    each power-iteration step applies it as two sparse mat-vecs with X, so a
+    step costs O(nnz(X)) even for thousands of sentences. If a deadline
+    (perf_counter time) is given, iteration stops there with the current scores.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    n = len(sentences)
+    try:
+        X = TfidfVectorizer(stop_words='english').fit_transform(sentences) # rows are L2-normalized
+    except ValueError:
+        return np.full(n, 1.0 / n) # Only stopwords / empty vocabulary
+    self_sim = np.asarray(X.multiply(X).sum(axis=1)).ravel()
+
+    def similarity_dot(v):
+        return X @ (X.T @ v) - self_sim * v
+
+    degree = similarity_dot(np.ones(n))
+    inv_degree = np.divide(1.0, degree, out=np.zeros(n), where=degree > 1e-12)
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        updated = (1 - damping) / n + damping * similarity_dot(scores * inv_degree)
+        updated /= updated.sum()
+        converged = np.abs(updated - scores).sum() < tol
+        scores = updated
+        if converged or (deadline is not None and time.perf_counter() > deadline):
+            break
+    return scores
+
+def textrank_summary(text, num_sentences=3, budget_ms=None):
+    """
+    Returns the top-ranked sentences of text, in their original order.
+    Returns None when the text is too short to need extracting.
+    """
+    deadline = time.perf_counter() + budget_ms / 1000.0 if budget_ms else None
+    sentences = split_sentences(text)
+    if len(sentences) <= num_sentences:
+        return None
+    scores = textrank_scores(sentences, deadline=deadline)
+    top = np.sort(np.argpartition(-scores, num_sentences - 1)[:num_sentences])
+    return " ".join(sentences[i] for i in top)
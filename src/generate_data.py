@@ -1,7 +1,12 @@
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
+import collections
 import os
-from data_utils import save_data, clean_text
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from data_utils import save_data, clean_text, iter_data
 import random
 
 def generate_synthetic_data():
@@ -72,13 +77,141 @@ def generate_synthetic_data():
     
     return df
 
+def corpus_plan(num_subjects=8, topics_per_subject=10, topic_words=30, seed=42):
+    """
+    Subjects, topics and vocabularies for generate_corpus. The hand-written
+    entries above come first; extra subjects and topics are numbered.
+    """
+    rng = np.random.default_rng(seed)
+    base = generate_synthetic_data().drop_duplicates('text')
+    vocabulary = np.array(sorted({w for t in base['text'] for w in re.findall(r"[a-z]+", t.lower())}))
+
+    known = {}
+    for sub, topic in zip(base['subject'], base['topic']):
+        known.setdefault(sub, [])
+        if topic not in known[sub]:
+            known[sub].append(topic)
+    subjects = list(known)[:num_subjects]
+    subjects += [f"Subject {i + 1}" for i in range(num_subjects - len(subjects))]
+
+    topics = []
+    for sub in subjects:
+        names = known.get(sub, [])[:topics_per_subject]
+        names += [f"{sub} Topic {j + 1}" for j in range(len(names), topics_per_subject)]
+        for name in names:
+            # Each topic favours its own slice of the vocabulary so clustering has signal
+            words = np.concatenate([clean_text(name).split(), rng.choice(vocabulary, topic_words, replace=False)])
+            topics.append({"subject": sub, "topic": name, "words": words})
+    return {"vocabulary": vocabulary, "topics": topics}
+
+def generate_chunk(plan, chunk_index, num_rows, seed=42, length_mean=40, length_sigma=0.6,
+                   topic_share=0.5, duplicate_ratio=0.0):
+    """
+    Generates one chunk of the synthetic corpus. The random stream depends only on
+    (seed, chunk_index), so output is the same for any number of workers.
+    """
+    rng = np.random.default_rng([seed, chunk_index])
+    vocabulary, topics = plan["vocabulary"], plan["topics"]
+    # Log-normal lengths with the given mean (in words)
+    mu = np.log(length_mean) - length_sigma ** 2 / 2
+    lengths = np.maximum(1, rng.lognormal(mu, length_sigma, num_rows).round().astype(int))
+    choice = rng.integers(0, len(topics), num_rows)
+
+    texts = []
+    for n, t in zip(lengths, choice):
+        own = rng.random(n) < topic_share
+        words = np.where(own, rng.choice(topics[t]["words"], n), rng.choice(vocabulary, n))
+        texts.append(" ".join(words).capitalize() + ".")
+    df = pd.DataFrame({
+        "text": texts,
+        "summary": [f"Summary of {topics[t]['topic']} ({'Easy' if n < length_mean else 'Medium'})."
+                    for n, t in zip(lengths, choice)],
+        "subject": [topics[t]["subject"] for t in choice],
+        "topic": [topics[t]["topic"] for t in choice],
+    })
+
+    # Duplicates copy an earlier row of the same chunk
+    dup = np.flatnonzero(rng.random(num_rows) < duplicate_ratio)
+    dup = dup[dup > 0]
+    if len(dup):
+        df.iloc[dup] = df.iloc[rng.integers(0, dup)].to_numpy()
+
+    df['cleaned_text'] = df['text'].apply(clean_text)
+    df['cleaned_summary'] = df['summary'].apply(clean_text)
+    return df
+
+def _write_chunk(job):
+    # Runs in a worker: generates a chunk, writes its Parquet part, returns the CSV text
+    plan, index, rows, options, parquet_dir = job
+    df = generate_chunk(plan, index, rows, **options)
+    if parquet_dir:
+        df.to_parquet(os.path.join(parquet_dir, f"part-{index:05d}.parquet"), index=False)
+    return df.to_csv(index=False, header=index == 0)
+
+def generate_corpus(path, num_rows=10_000, num_subjects=8, topics_per_subject=10, chunk_size=100_000,
+                    workers=None, parquet=False, seed=42, **options):
+    """
+    Writes a synthetic corpus of num_rows rows to path (CSV), generated in chunks
+    by a process pool. Options go to generate_chunk (length_mean, length_sigma,
+    topic_share, duplicate_ratio). With parquet=True the same rows are also written
+    as a directory of Parquet parts next to the CSV (requires pyarrow).
+    """
+    plan = corpus_plan(num_subjects, topics_per_subject, seed=seed)
+    parquet_dir = None
+    if parquet:
+        import pyarrow # noqa: F401 - fail before starting workers
+        parquet_dir = os.path.splitext(path)[0] + ".parquet"
+        os.makedirs(parquet_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    options = dict(options, seed=seed)
+    jobs = [(plan, i, min(chunk_size, num_rows - start), options, parquet_dir)
+            for i, start in enumerate(range(0, num_rows, chunk_size))]
+    workers = workers or os.cpu_count()
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, 'w', newline='') as f, ProcessPoolExecutor(workers) as pool:
+        # At most 2 chunks per worker in flight, written in order as the oldest completes,
+        # so finished chunks never pile up in memory behind a slow one
+        pending = collections.deque()
+        for i in range(len(jobs)):
+            while len(pending) < 2 * workers and len(pending) + i < len(jobs):
+                pending.append(pool.submit(_write_chunk, jobs[len(pending) + i]))
+            f.write(pending.popleft().result())
+            print(f"Chunk {i + 1}/{len(jobs)} written")
+    os.replace(tmp, path)
+    print(f"Corpus of {num_rows} rows saved to {path}")
+    return path
+
+def corpus_stats(chunks):
+    """
+    Streamed aggregates for EDA: row count, subject counts and text lengths.
+    """
+    rows, subjects, lengths = 0, pd.Series(dtype='int64'), pd.Series(dtype='int64')
+    columns = None
+    for chunk in chunks:
+        rows += len(chunk)
+        columns = list(chunk.columns)
+        subjects = subjects.add(chunk['subject'].value_counts(), fill_value=0)
+        if 'text' in chunk.columns:
+            lengths = lengths.add(chunk['text'].astype(str).str.split().str.len().value_counts(), fill_value=0)
+    return {"rows": rows, "columns": columns or [],
+            "subject_counts": subjects.astype('int64').sort_values(ascending=False),
+            "length_counts": lengths.astype('int64').sort_index()}
+
 def perform_eda(df):
-    print("Dataset Shape:", df.shape)
-    print("Subject Counts:\n", df['subject'].value_counts())
+    # df may also be a CSV path; it is then read in chunks and only aggregates are kept
+    if isinstance(df, str):
+        stats = corpus_stats(iter_data(df, columns=['text', 'subject']))
+        stats["columns"] = list(pd.read_csv(df, nrows=0).columns)
+    else:
+        stats = corpus_stats([df])
+        stats["columns"] = list(df.columns)
+    print("Dataset Shape:", (stats["rows"], len(stats["columns"])))
+    print("Subject Counts:\n", stats["subject_counts"])
     
     # Visualization
     plt.figure(figsize=(10, 6))
-    df['subject'].value_counts().plot(kind='bar', color='#7000ff') # Updated color
+    stats["subject_counts"].plot(kind='bar', color='#7000ff') # Updated color
     plt.title('Distribution of Subjects')
     plt.ylabel('Count')
     plt.xticks(rotation=45)
@@ -89,6 +222,12 @@ def perform_eda(df):
     print("Visualization saved to static/subject_distribution.png")
 
 if __name__ == "__main__":
-    df = generate_synthetic_data()
-    perform_eda(df)
-    save_data(df, "data/dataset.csv")
+    if len(sys.argv) > 1:
+        # Scaling corpus: python src/generate_data.py ROWS [OUTPUT.csv]
+        output = sys.argv[2] if len(sys.argv) > 2 else "data/synthetic.csv"
+        generate_corpus(output, num_rows=int(sys.argv[1]))
+        perform_eda(output)
+    else:
+        df = generate_synthetic_data()
+        perform_eda(df)
+        save_data(df, "data/dataset.csv")
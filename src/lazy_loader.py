@@ -0,0 +1,137 @@
+import contextvars
+import threading
+import time
+
+_pins = contextvars.ContextVar("resource_pins", default=None)
+
+def pin_resources():
+    """
+    Starts pinning: until unpin_resources(), each resource keeps returning the
+    object (and version) it returned first, even if a newer one is swapped in.
+    Returns the {name: (object, version)} pins. Thread pools see the pins
+    through contextvars.copy_context().
+    """
+    pins = {}
+    _pins.set(pins)
+    return pins
+
+def unpin_resources():
+    _pins.set(None)
+
+def pinned_resources():
+    return _pins.get() or {}
+
+class LazyResource:
+    """
+    Loads a heavy object on first use (or in a warmup thread) and proxies
+    attribute access to it, so callers can use it like the object itself.
+
+    version (optional) is a callable returning the version of what the
+    factory would load now; swap() replaces the loaded object with a newer one.
+    """
+    def __init__(self, name, factory, version=None):
+        self.name = name
+        self._factory = factory
+        self._version = version
+        self._lock = threading.Lock()
+        self._slot = None # (object, version) once loaded, replaced as a whole
+        self.load_seconds = None
+        self.swap_seconds = None
+        self.loaded_at = None
+        self.error = None
+
+    @property
+    def loaded(self):
+        return self._slot is not None
+
+    @property
+    def version(self):
+        slot = self._slot
+        return slot[1] if slot is not None else None
+
+    def current_version(self):
+        return self._version() if self._version is not None else None
+
+    def load(self):
+        """
+        Returns (object, version) freshly built by the factory, without serving it.
+        """
+        version = self.current_version() # Before loading, so a change during the load is seen later
+        return self._factory(), version
+
+    def _current(self):
+        slot = self._slot
+        if slot is not None:
+            return slot
+        with self._lock:
+            if self._slot is None:
+                start = time.perf_counter()
+                try:
+                    value, version = self.load()
+                except Exception as e:
+                    self.error = repr(e)
+                    raise
+                self.load_seconds = time.perf_counter() - start
+                self.loaded_at = time.time()
+                self.error = None
+                self._slot = (value, version)
+            return self._slot
+
+    def get(self):
+        pins = _pins.get()
+        if pins is None:
+            return self._current()[0]
+        slot = pins.get(self.name)
+        if slot is None:
+            slot = pins.setdefault(self.name, self._current())
+        return slot[0]
+
+    def swap(self, value, version=None, load_seconds=None):
+        """
+        Serves value from now on; callers that pinned the old object keep it.
+        Returns the old (object, version).
+        """
+        start = time.perf_counter()
+        with self._lock:
+            old, self._slot = self._slot, (value, version)
+            self.load_seconds = load_seconds
+            self.loaded_at = time.time()
+            self.error = None
+        self.swap_seconds = time.perf_counter() - start
+        return old
+
+    def reset(self, factory=None):
+        """
+        Drops the loaded object so the next use loads it again.
+        """
+        with self._lock:
+            if factory is not None:
+                self._factory = factory
+            self._slot = None
+            self.load_seconds = None
+            self.swap_seconds = None
+            self.loaded_at = None
+            self.error = None
+
+    def status(self):
+        return {"loaded": self.loaded, "version": self.version, "load_seconds": self.load_seconds,
+                "swap_seconds": self.swap_seconds, "loaded_at": self.loaded_at, "error": self.error}
+
+    def __getattr__(self, attr):
+        # Only called for attributes not found on the proxy itself
+        return getattr(self.get(), attr)
+
+def start_warmup(resources):
+    """
+    Loads the given resources in a background daemon thread.
+    """
+    def run():
+        for resource in resources:
+            try:
+                resource.get()
+            except Exception as e:
+                print(f"Warmup failed for {resource.name}: {e}")
+
+    thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
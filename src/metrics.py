@@ -0,0 +1,209 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Latency buckets in seconds (Prometheus 'le' bounds) and payload buckets in bytes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+PREFIX = "study_assistant"
+
+class Histogram:
+    """
+    Cumulative-bucket histogram for one label set.
+    """
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Registry:
+    """
+    Histograms and counters keyed by metric name and label values, rendered in
+    the Prometheus text exposition format. One lock guards all updates.
+    """
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {} # name -> (help, label names, bounds, {labels: Histogram})
+        self._counters = {}   # name -> (help, label names, {labels: value})
+
+    def histogram(self, name, help_text, labelnames, bounds=LATENCY_BUCKETS):
+        self._histograms.setdefault(name, (help_text, tuple(labelnames), bounds, {}))
+
+    def counter(self, name, help_text, labelnames):
+        self._counters.setdefault(name, (help_text, tuple(labelnames), {}))
+
+    def observe(self, name, labels, value):
+        _, _, bounds, series = self._histograms[name]
+        with self._lock:
+            hist = series.get(labels)
+            if hist is None:
+                hist = series[labels] = Histogram(bounds)
+            hist.observe(value)
+
+    def inc(self, name, labels, amount=1):
+        series = self._counters[name][2]
+        with self._lock:
+            series[labels] = series.get(labels, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            for _, _, _, series in self._histograms.values():
+                series.clear()
+            for _, _, series in self._counters.values():
+                series.clear()
+
+    def render(self):
+        """
+        Prometheus text format (version 0.0.4).
+        """
+        lines = []
+        with self._lock:
+            for name, (help_text, labelnames, series) in sorted(self._counters.items()):
+                full = f"{self.prefix}_{name}"
+                lines += [f"# HELP {full} {help_text}", f"# TYPE {full} counter"]
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{full}{_labels(labelnames, labels)} {value}")
+            for name, (help_text, labelnames, bounds, series) in sorted(self._histograms.items()):
+                full = f"{self.prefix}_{name}"
+                lines += [f"# HELP {full} {help_text}", f"# TYPE {full} histogram"]
+                for labels, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(bounds + ("+Inf",), hist.counts):
+                        cumulative += n
+                        le = bound if bound == "+Inf" else repr(float(bound))
+                        lines.append(f"{full}_bucket{_labels(labelnames + ('le',), labels + (le,))} {cumulative}")
+                    lines.append(f"{full}_sum{_labels(labelnames, labels)} {hist.sum!r}")
+                    lines.append(f"{full}_count{_labels(labelnames, labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+registry = Registry()
+registry.histogram("stage_duration_seconds", "Time spent in an instrumented stage.", ["stage"])
+registry.counter("stage_errors_total", "Stages that raised an exception.", ["stage"])
+registry.histogram("request_duration_seconds", "Request latency by route.", ["route", "method"])
+registry.counter("requests_total", "Requests by route and status code.", ["route", "method", "status"])
+registry.counter("request_errors_total", "Requests that raised or returned a 5xx status.", ["route", "method"])
+registry.histogram("request_size_bytes", "Request body size by route.", ["route", "method"], SIZE_BUCKETS)
+registry.histogram("response_size_bytes", "Response body size by route.", ["route", "method"], SIZE_BUCKETS)
+registry.counter("cache_requests_total", "Cache lookups by cache and outcome.", ["cache", "result"])
+registry.counter("cache_evictions_total", "Cache entries evicted to stay under the size bound.", ["cache"])
+registry.counter("model_requests_total", "Requests by model and the model version that served them.", ["model", "version"])
+registry.counter("model_reloads_total", "Hot reloads by model and outcome.", ["model", "result"])
+registry.histogram("model_load_seconds", "Time to load a new model version in the background.", ["model"])
+registry.histogram("model_swap_seconds", "Time to swap a loaded model version in.", ["model"],
+                   (1e-6, 1e-5, 1e-4, 0.001, 0.01, 0.1))
+
+class Span:
+    """
+    Times a stage, as a context manager or a decorator:
+
+        with span("summarizer.summarize"): ...
+
+        @span("quiz.generate")
+        def generate(...): ...
+    """
+    __slots__ = ("labels", "start")
+
+    def __init__(self, stage):
+        self.labels = (stage,)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        registry.observe("stage_duration_seconds", self.labels, time.perf_counter() - self.start)
+        if exc_type is not None:
+            registry.inc("stage_errors_total", self.labels)
+        return False
+
+    def __call__(self, fn):
+        labels = self.labels
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                registry.inc("stage_errors_total", labels)
+                raise
+            finally:
+                registry.observe("stage_duration_seconds", labels, time.perf_counter() - start)
+        wrapper.__name__ = fn.__name__
+        wrapper.__qualname__ = fn.__qualname__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+def span(stage):
+    return Span(stage)
+
+def install(app):
+    """
+    Adds request hooks (latency, counts, errors and payload sizes per route),
+    times Jinja rendering as 'render.<template>' stages and serves /metrics.
+    """
+    from flask import Response, g, request
+    from flask.signals import before_render_template, template_rendered
+
+    def route_labels():
+        rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        return (rule, request.method)
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            labels = route_labels()
+            registry.observe("request_duration_seconds", labels, time.perf_counter() - start)
+            registry.inc("requests_total", labels + (str(response.status_code),))
+            if response.status_code >= 500:
+                registry.inc("request_errors_total", labels)
+            registry.observe("request_size_bytes", labels, request.content_length or 0)
+            if not response.is_streamed:
+                registry.observe("response_size_bytes", labels, response.calculate_content_length() or 0)
+        return response
+
+    @app.teardown_request
+    def _record_exception(exc):
+        # after_request is skipped when a view raises
+        start = g.pop('_metrics_start', None)
+        if exc is not None and start is not None:
+            labels = route_labels()
+            registry.observe("request_duration_seconds", labels, time.perf_counter() - start)
+            registry.inc("requests_total", labels + ("500",))
+            registry.inc("request_errors_total", labels)
+
+    def _render_started(sender, template, context, **extra):
+        g.setdefault('_render_starts', []).append(time.perf_counter())
+
+    def _render_finished(sender, template, context, **extra):
+        starts = g.get('_render_starts')
+        if starts:
+            registry.observe("stage_duration_seconds", (f"render.{template.name}",), time.perf_counter() - starts.pop())
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
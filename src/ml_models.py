@@ -1,13 +1,93 @@
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.cluster import KMeans
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import make_pipeline
 from sklearn.metrics import accuracy_score, f1_score
+from concurrent.futures import ProcessPoolExecutor
+import collections
 import pickle
 import os
+from quiz_index import QuizIndex
+from question_bank import QuestionBank
+from related_index import RelatedIndex
+from corpus_store import CorpusStore
+from model_store import save_quiz_artifact, load_quiz_artifact, convert_pickle
+from data_utils import clean_text, sample_weights, dedup_data, iter_data, WEIGHT_COLUMN
+from metrics import span
+
+# update() triggers a full retrain once any of these (cumulative since the last train) is crossed
+DRIFT_THRESHOLDS = {
+    "oov_rate": 0.35,             # share of new tokens outside the TF-IDF vocabulary
+    "label_disagreement": 0.30,   # share of new rows where the classifier contradicts the length heuristic
+    "cluster_distance_ratio": 1.5, # mean distance of new rows to their centroid vs. training
+    "growth": 1.0,                # rows added relative to the corpus size at training time
+}
+DRIFT_MIN_ROWS = 100 # Rows added since the last train before the rate metrics (all but growth) are compared
+
+HASH_FEATURES = 2**18       # Hashed feature space of the SGD difficulty classifier (fixed model size)
+OUT_OF_CORE_CHUNK = 50_000  # Rows per chunk when training/scoring out of core
+TEST_FRACTION = 0.2
+N_CLUSTERS = 5              # Default number of K-Means topics
+
+def weighted_median(values, weights):
+    # Same as np.median over the rows repeated weight times
+    order = np.argsort(values)
+    values = np.asarray(values)[order]
+    cumulative = np.cumsum(np.asarray(weights)[order])
+    total = cumulative[-1]
+    lo = np.searchsorted(cumulative, (total - 1) // 2, side='right')
+    hi = np.searchsorted(cumulative, total // 2, side='right')
+    return (values[lo] + values[hi]) / 2
+
+def _scores_from_confusion(confusion):
+    # Accuracy and support-weighted F1 (as f1_score(average='weighted')) from a weighted confusion matrix
+    total = confusion.sum()
+    if not total:
+        return 0.0, 0.0
+    tp = np.diag(confusion)
+    support, predicted = confusion.sum(axis=1), confusion.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f1 = np.nan_to_num(2 * tp / (support + predicted))
+    return float(tp.sum() / total), float(f1 @ support / total)
+
+def _class_codes(vectorizer, classifier, texts):
+    # Index into classifier.classes_ of each prediction (small to send between processes)
+    scores = classifier.decision_function(vectorizer.transform(texts))
+    if scores.ndim == 1:
+        return (scores > 0).astype(np.int8)
+    return scores.argmax(axis=1).astype(np.int8)
+
+_scorer = None # (vectorizer, classifier) in score_difficulty worker processes
+
+def _init_scorer(vectorizer, classifier):
+    global _scorer
+    _scorer = (vectorizer, classifier)
+
+def _score_chunk(texts):
+    return _class_codes(*_scorer, texts)
+
+class _CleanedTexts:
+    """
+    clean_text of a corpus store's texts as a re-iterable, sliceable
+    sequence, decoded chunksize rows at a time instead of held as a list.
+    """
+    def __init__(self, corpus, chunksize=OUT_OF_CORE_CHUNK):
+        self.corpus = corpus
+        self.chunksize = chunksize
+
+    def __len__(self):
+        return len(self.corpus)
+
+    def __getitem__(self, rows):
+        start, stop, _ = rows.indices(len(self))
+        return [clean_text(t) for t in self.corpus.texts(rows=np.arange(start, stop))]
+
+    def __iter__(self):
+        for start in range(0, len(self), self.chunksize):
+            yield from self[start:start + self.chunksize]
 
 class QuizGenerator:
     def __init__(self):
@@ -16,130 +96,507 @@ class QuizGenerator:
         self.vectorizer = None
         self.tfidf = None
         self.data_clustered = None
+        self.index = None
+        self.bank = None
+        self.related_index = None
+        self.length_threshold = None
+        self.out_of_core = False
+        self.n_clusters = N_CLUSTERS
+        self.classifier_params = {}
+        self.training_scores = None
+        self.cluster_counts = None
+        self.drift_baseline = None
+        self.drift_state = None
+        self.pending_rows = []
 
-    def _create_difficulty_labels(self, texts):
+    def _create_difficulty_labels(self, texts, threshold=None):
         # Heuristic: Shorter texts are 'Easy', Longer are 'Medium'
-        # Split by median length
+        # Split by median length (or a threshold fixed at training time)
         lengths = [len(t.split()) for t in texts]
-        median_len = np.median(lengths)
+        median_len = np.median(lengths) if threshold is None else threshold
         labels = ['Easy' if l < median_len else 'Medium' for l in lengths]
         return labels
 
-    def train(self, df):
+    @span("quiz.train")
+    def train(self, data, incremental=False, out_of_core=False, chunksize=OUT_OF_CORE_CHUNK, workers=None,
+              n_clusters=None, classifier_params=None):
+        """
+        Trains the difficulty classifier, the topic clusters and the serving
+        tables on data, a DataFrame. incremental=True uses hashed features and
+        SGD so update() can keep learning; out_of_core=True also streams the
+        classifier's training and scoring in chunks of chunksize rows (scored
+        by workers processes), so its memory does not grow with the corpus.
+        With out_of_core, data may also be a CSV path or an iterable of
+        DataFrame chunks: they are read once (data_utils.iter_data) into the
+        compact corpus store, and every later pass decodes and cleans
+        chunksize texts at a time, so neither the DataFrame nor a list of
+        all texts is ever built. The topic model is the limit: TF-IDF and
+        K-Means fit on the whole corpus at once, so its sparse TF-IDF matrix
+        must fit in memory.
+        n_clusters and classifier_params (e.g. {'C': 1.0}) override the
+        settings of the last train, which retrains after drift keep.
+        """
         print("Training Quiz Generator Models...")
-        texts = df['cleaned_text'].tolist()
+        self.out_of_core = out_of_core
+        if n_clusters is not None:
+            self.n_clusters = n_clusters
+        if classifier_params is not None:
+            self.classifier_params = dict(classifier_params)
+        if out_of_core and not isinstance(data, pd.DataFrame):
+            corpus = self._read_corpus(data, chunksize)
+            texts = _CleanedTexts(corpus, chunksize)
+        else:
+            corpus = data
+            texts = data['cleaned_text'].tolist()
+        # Deduplicated corpora (data_utils.dedup_data) carry a weight per row
+        weights = sample_weights(corpus)
+        
+        # 1. Train Difficulty Classifier (Logistic Regression, or SGD on hashed
+        # features when incremental=True so update() can keep learning)
+        if out_of_core:
+            accuracy, f1 = self._train_difficulty_out_of_core(texts, weights, chunksize)
+        else:
+            X, accuracy, f1 = self._train_difficulty(texts, weights, incremental)
+        self.training_scores = {"accuracy": accuracy, "f1": f1}
+
+        # 2. Train Topic Clusterer (K-Means)
+        # We use simple subject-based logic mainly, but K-Means helps find related questions
+        X_tfidf, clusters = self._train_topics(texts, weights)
+        
+        # Predict difficulty for all rows to use in generation
+        if out_of_core:
+            difficulty = self.score_difficulty(texts, chunksize, workers)
+        else:
+            difficulty = self.difficulty_model.predict(X)
+        
+        # Store clusters and difficulty with the corpus for retrieval, compacted for serving
+        if isinstance(corpus, CorpusStore):
+            self.data_clustered = corpus.with_columns(cluster=clusters, difficulty=difficulty)
+        else:
+            self.data_clustered = CorpusStore.from_frame(corpus, cluster=clusters, difficulty=difficulty)
+        
+        # Baselines for incremental updates and drift detection
+        self.cluster_counts = np.bincount(clusters, weights=weights, minlength=self.topic_model.n_clusters).astype(np.int64)
+        self._set_drift_baseline(X_tfidf, clusters, weights)
+        self.drift_state = None
+        self.pending_rows = []
         
-        # 1. Train Difficulty Classifier (Logistic Regression)
-        labels = self._create_difficulty_labels(texts)
+        # Subject/topic index and question bank so generate_quiz does no pandas work
+        self.index = None
+        self.bank = None
+        self._prepare_serving()
+        self.related_index = RelatedIndex(X_tfidf, clusters)
         
-        self.vectorizer = CountVectorizer()
-        X = self.vectorizer.fit_transform(texts)
+        print("Training complete.")
+
+    @staticmethod
+    def _read_corpus(source, chunksize):
+        # One pass over a CSV path or DataFrame chunks into a corpus store
+        chunks = iter_data(source, chunksize=chunksize) if isinstance(source, str) else source
+        corpus = None
+        for chunk in chunks:
+            corpus = CorpusStore.from_frame(chunk) if corpus is None else corpus.append(chunk)
+        if corpus is None or not len(corpus):
+            raise ValueError(f"No rows to train on in {source}")
+        return corpus
+
+    def _train_difficulty(self, texts, weights, incremental=False):
+        # Fits on 80% of the rows; returns the features of all rows and the held-out scores
+        self.length_threshold = float(weighted_median([len(t.split()) for t in texts], weights))
+        labels = self._create_difficulty_labels(texts, threshold=self.length_threshold)
+        
+        if incremental:
+            self.vectorizer = HashingVectorizer(n_features=HASH_FEATURES, alternate_sign=False)
+            X = self.vectorizer.transform(texts)
+        else:
+            self.vectorizer = CountVectorizer()
+            X = self.vectorizer.fit_transform(texts)
         y = labels
         
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        X_train, X_test, y_train, y_test, w_train, w_test = train_test_split(X, y, weights, test_size=TEST_FRACTION, random_state=42)
         
-        self.difficulty_model = LogisticRegression()
-        self.difficulty_model.fit(X_train, y_train)
+        params = getattr(self, 'classifier_params', None) or {}
+        if incremental:
+            self.difficulty_model = SGDClassifier(loss='log_loss', random_state=42, **params)
+        else:
+            self.difficulty_model = LogisticRegression(**params)
+        self.difficulty_model.fit(X_train, y_train, sample_weight=w_train)
         
         preds = self.difficulty_model.predict(X_test)
-        print(f"Difficulty Classifier Accuracy: {accuracy_score(y_test, preds):.2f}")
-        print(f"Difficulty Classifier F1 Score: {f1_score(y_test, preds, average='weighted'):.2f}")
+        accuracy = accuracy_score(y_test, preds, sample_weight=w_test)
+        f1 = f1_score(y_test, preds, average='weighted', sample_weight=w_test)
+        print(f"Difficulty Classifier Accuracy: {accuracy:.2f}")
+        print(f"Difficulty Classifier F1 Score: {f1:.2f}")
+        return X, float(accuracy), float(f1)
 
-        # 2. Train Topic Clusterer (K-Means)
-        # We use simple subject-based logic mainly, but K-Means helps find related questions
+    def _fit_tfidf(self, texts, weights):
+        # TF-IDF with document frequencies weighted by row weights
         self.tfidf = TfidfVectorizer(stop_words='english')
-        X_tfidf = self.tfidf.fit_transform(texts)
+        self.tfidf.fit(texts)
+        self._weight_idf(texts, weights)
+        return self.tfidf.transform(texts)
+
+    def _train_topics(self, texts, weights):
+        X_tfidf = self._fit_tfidf(texts, weights)
+        self.topic_model = KMeans(n_clusters=getattr(self, 'n_clusters', N_CLUSTERS), random_state=42)
+        clusters = self.topic_model.fit_predict(X_tfidf, sample_weight=weights)
+        return X_tfidf, clusters
+
+    def _train_difficulty_out_of_core(self, texts, weights, chunksize, epochs=1):
+        # Chunks of (texts, weights); only one chunk's features exist at a time
+        def chunks():
+            for start in range(0, len(texts), chunksize):
+                yield start, texts[start:start + chunksize], weights[start:start + chunksize]
+
+        # Pass 1: median length from a histogram of word counts
+        histogram = np.zeros(1, dtype=float)
+        for _, chunk, w in chunks():
+            counts = np.bincount([len(t.split()) for t in chunk], weights=w)
+            if len(counts) > len(histogram):
+                histogram = np.pad(histogram, (0, len(counts) - len(histogram)))
+            histogram[:len(counts)] += counts
+        self.length_threshold = float(weighted_median(np.arange(len(histogram)), histogram))
+
+        # Pass 2: partial_fit on each chunk's training rows, the same rows held out every epoch
+        self.vectorizer = HashingVectorizer(n_features=HASH_FEATURES, alternate_sign=False)
+        self.difficulty_model = SGDClassifier(loss='log_loss', random_state=42,
+                                              **(getattr(self, 'classifier_params', None) or {}))
+        classes = np.array(['Easy', 'Medium'])
+        def split(start, n):
+            rng = np.random.default_rng([42, start])
+            return rng.random(n) < TEST_FRACTION, rng.permutation(n)
+        for _ in range(epochs):
+            for start, chunk, w in chunks():
+                test, order = split(start, len(chunk))
+                train_rows = order[~test[order]]
+                if not len(train_rows):
+                    continue
+                X = self.vectorizer.transform([chunk[i] for i in train_rows])
+                y = np.array(self._create_difficulty_labels(chunk, threshold=self.length_threshold))[train_rows]
+                self.difficulty_model.partial_fit(X, y, classes=classes, sample_weight=w[train_rows])
+
+        # Pass 3: weighted confusion matrix on the held-out rows
+        confusion = np.zeros((2, 2))
+        for start, chunk, w in chunks():
+            test = np.flatnonzero(split(start, len(chunk))[0])
+            if not len(test):
+                continue
+            held_out = [chunk[i] for i in test]
+            y = np.searchsorted(classes, self._create_difficulty_labels(held_out, threshold=self.length_threshold))
+            preds = np.searchsorted(classes, self.difficulty_model.predict(self.vectorizer.transform(held_out)))
+            np.add.at(confusion, (y, preds), w[test])
+        accuracy, f1 = _scores_from_confusion(confusion)
+        print(f"Difficulty Classifier Accuracy: {accuracy:.2f}")
+        print(f"Difficulty Classifier F1 Score: {f1:.2f}")
+        return accuracy, f1
+
+    def score_difficulty(self, texts, chunksize=OUT_OF_CORE_CHUNK, workers=None):
+        """
+        Predicts the difficulty of many texts in chunks, in parallel worker
+        processes when there is more than one chunk.
+        """
+        classes = np.asarray(self.difficulty_model.classes_)
+        starts = range(0, len(texts), chunksize)
+        if len(starts) <= 1 or workers == 1:
+            codes = [_class_codes(self.vectorizer, self.difficulty_model, texts[start:start + chunksize])
+                     for start in starts]
+        else:
+            # Chunks are sliced as workers free up, so at most 2 per worker are in flight
+            workers = workers or os.cpu_count()
+            codes, pending = [], collections.deque()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_scorer,
+                                     initargs=(self.vectorizer, self.difficulty_model)) as pool:
+                for start in starts:
+                    if len(pending) >= 2 * workers:
+                        codes.append(pending.popleft().result())
+                    pending.append(pool.submit(_score_chunk, texts[start:start + chunksize]))
+                codes.extend(future.result() for future in pending)
+        return classes[np.concatenate(codes)] if codes else np.empty(0, dtype=classes.dtype)
+
+    @span("quiz.update")
+    def update(self, new_rows, thresholds=None, min_rows=DRIFT_MIN_ROWS):
+        """
+        Folds newly appended dataset rows into the trained models without a full retrain:
+        scores only the new rows, moves the K-Means centroids with mini-batch updates,
+        updates an SGD difficulty classifier with partial_fit, and appends the rows to
+        the quiz index. A full retrain runs when drift metrics cross the thresholds;
+        the rate metrics count only once min_rows rows were added since the last train.
+        Returns the current drift metrics, with classifier_updated telling whether
+        the classifier learned from the rows (only one trained with incremental=True does).
+        """
+        if self.data_clustered is None:
+            raise ValueError("update() needs a trained model; call train() first")
+        self._prepare_serving()
+        self._ensure_update_baselines()
         
-        # Determine K based on unique topics or just set to 5
-        k = 5
-        self.topic_model = KMeans(n_clusters=k, random_state=42)
-        clusters = self.topic_model.fit_predict(X_tfidf)
+        new = new_rows.reset_index(drop=True).copy()
+        if 'cleaned_text' not in new.columns:
+            new['cleaned_text'] = new['text'].apply(clean_text)
+        if 'cleaned_summary' not in new.columns and 'summary' in new.columns:
+            new['cleaned_summary'] = new['summary'].apply(clean_text)
+        texts = new['cleaned_text'].astype(str).tolist()
+        if not texts:
+            return dict(self.drift_metrics(), classifier_updated=False)
         
-        # Store clusters in dataframe for retrieval
-        self.data_clustered = df.copy()
-        self.data_clustered['cluster'] = clusters
+        # 1. Difficulty: score the new rows, and keep learning if the classifier supports it
+        X = self.vectorizer.transform(texts)
+        heuristic = self._create_difficulty_labels(texts, threshold=self.length_threshold)
+        predicted = self.difficulty_model.predict(X)
+        weights = sample_weights(new)
+        learns = hasattr(self.difficulty_model, 'partial_fit')
+        if learns:
+            self.difficulty_model.partial_fit(X, heuristic, sample_weight=weights)
+        else:
+            print(f"update(): {type(self.difficulty_model).__name__} cannot learn incrementally; the new rows "
+                  f"are scored but only learned by the next full retrain (train with incremental=True)")
+        new['difficulty'] = predicted
         
-        # Predict difficulty for all rows to use in generation
-        all_X = self.vectorizer.transform(texts)
-        self.data_clustered['difficulty'] = self.difficulty_model.predict(all_X)
+        # 2. Clusters: assign to the nearest centroid, then move each centroid to the
+        # running mean of its members (the mini-batch k-means update)
+        X_tfidf = self.tfidf.transform(texts)
+        clusters = self.topic_model.predict(X_tfidf)
+        distances = self._centroid_distances(X_tfidf, clusters)
+        self._fold_into_clusters(X_tfidf, clusters, weights)
+        new['cluster'] = clusters.astype(self.data_clustered['cluster'].dtype)
         
-        print("Training complete.")
+        # 3. Serving tables (bank first so index rows always resolve)
+        if WEIGHT_COLUMN in self.data_clustered.columns:
+            new[WEIGHT_COLUMN] = weights.astype(np.int64)
+        new = new.reindex(columns=self.data_clustered.columns)
+        start = len(self.data_clustered) + sum(len(p) for p in self.pending_rows)
+        self.index.append(new, start, self.bank.append(new))
+        self.pending_rows.append(new)
+        if getattr(self, 'related_index', None) is not None: # Otherwise built from the full corpus on first use
+            self.related_index.append(X_tfidf, np.arange(start, start + len(new)))
+        
+        # 4. Drift bookkeeping
+        analyzer = self.tfidf.build_analyzer()
+        tokens = [tok for t in texts for tok in analyzer(t)]
+        n_tokens = len(tokens)
+        n_known = sum(1 for tok in tokens if tok in self.tfidf.vocabulary_)
+        state = self.drift_state
+        state["rows"] += int(weights.sum())
+        state["tokens"] += n_tokens
+        state["oov_tokens"] += n_tokens - n_known
+        state["disagreements"] += int(weights[np.asarray(predicted) != np.asarray(heuristic)].sum())
+        state["distance_sum"] += float(distances @ weights)
+        
+        metrics = self.drift_metrics()
+        limits = dict(DRIFT_THRESHOLDS, **(thresholds or {}))
+        sampled = state["rows"] >= min_rows
+        crossed = [name for name, limit in limits.items() if metrics[name] > limit and (sampled or name == "growth")]
+        if crossed:
+            print(f"Drift thresholds crossed ({', '.join(crossed)}); running a full retrain...")
+            corpus = self._corpus().to_frame().drop(columns=['cluster', 'difficulty'])
+            corpus['cleaned_text'] = self._cleaned_texts(corpus)
+            self.train(corpus, incremental=learns, out_of_core=getattr(self, 'out_of_core', False))
+            metrics = self.drift_metrics()
+        return dict(metrics, classifier_updated=learns)
 
-    def generate_quiz(self, subject, difficulty="Easy", num_questions=5):
+    def _centroid_distances(self, X_tfidf, clusters):
+        # Euclidean distance of each sparse row to its assigned centroid
+        centers = self.topic_model.cluster_centers_[clusters]
+        sq = (np.asarray(X_tfidf.multiply(X_tfidf).sum(axis=1)).ravel()
+              - 2 * np.asarray(X_tfidf.multiply(centers).sum(axis=1)).ravel()
+              + (centers ** 2).sum(axis=1))
+        return np.sqrt(np.maximum(sq, 0))
+
+    def _weight_idf(self, texts, weights):
+        # Document frequencies counted with row weights, as if duplicates were still present
+        present = self.tfidf.transform(texts) > 0
+        df_weighted = np.asarray(present.T @ weights).ravel()
+        n = weights.sum()
+        self.tfidf.idf_ = np.log((1 + n) / (1 + df_weighted)) + 1
+
+    def _fold_into_clusters(self, X_tfidf, clusters, weights):
+        from scipy.sparse import csr_matrix
+        k = len(self.cluster_counts)
+        n = len(clusters)
+        members = np.bincount(clusters, weights=weights, minlength=k).astype(np.int64)
+        onehot = csr_matrix((weights, (clusters, np.arange(n))), shape=(k, n))
+        sums = (onehot @ X_tfidf).toarray()
+        centers = np.array(self.topic_model.cluster_centers_, dtype=float) # Writable copy (may be memory-mapped)
+        totals = self.cluster_counts + members
+        moved = members > 0
+        centers[moved] = (centers[moved] * self.cluster_counts[moved, None] + sums[moved]) / totals[moved, None]
+        self.topic_model.cluster_centers_ = centers
+        self.cluster_counts = totals
+
+    def _ensure_update_baselines(self):
+        # Models trained before update() existed get their baselines from the stored corpus
+        if getattr(self, 'pending_rows', None) is None:
+            self.pending_rows = []
+        if getattr(self, 'length_threshold', None) is None:
+            lengths = [len(t.split()) for t in self._cleaned_texts(self.data_clustered)]
+            self.length_threshold = float(weighted_median(lengths, sample_weights(self.data_clustered)))
+        if getattr(self, 'cluster_counts', None) is None:
+            k = self.topic_model.cluster_centers_.shape[0]
+            self.cluster_counts = np.bincount(self.data_clustered['cluster'], weights=sample_weights(self.data_clustered),
+                                              minlength=k).astype(np.int64)
+        if getattr(self, 'drift_baseline', None) is None:
+            X = self.tfidf.transform(self._cleaned_texts(self.data_clustered))
+            self._set_drift_baseline(X, self.data_clustered['cluster'].to_numpy(), sample_weights(self.data_clustered))
+        if getattr(self, 'drift_state', None) is None:
+            self.drift_state = {"rows": 0, "tokens": 0, "oov_tokens": 0, "disagreements": 0, "distance_sum": 0.0}
+
+    def _set_drift_baseline(self, X_tfidf, clusters, weights):
+        total = weights.sum()
+        self.drift_baseline = {
+            "rows": int(total),
+            "mean_centroid_distance": float(self._centroid_distances(X_tfidf, clusters) @ weights / total) if total else 0.0,
+        }
+
+    def drift_metrics(self):
+        """
+        Drift of the rows added by update() since the last full train.
+        """
+        self._ensure_update_baselines()
+        state, base = self.drift_state, self.drift_baseline
+        rows = state["rows"]
+        mean_distance = state["distance_sum"] / rows if rows else 0.0
+        return {
+            "rows_added": rows,
+            "oov_rate": state["oov_tokens"] / state["tokens"] if state["tokens"] else 0.0,
+            "label_disagreement": state["disagreements"] / rows if rows else 0.0,
+            "cluster_distance_ratio": mean_distance / base["mean_centroid_distance"] if base["mean_centroid_distance"] else 0.0,
+            "growth": rows / base["rows"] if base["rows"] else 0.0,
+        }
+
+    def _compact(self):
+        # Legacy pickles (and callers that assign a DataFrame) hold the corpus as a full DataFrame
+        if isinstance(self.data_clustered, pd.DataFrame):
+            self.data_clustered = CorpusStore.from_frame(self.data_clustered)
+
+    def _corpus(self):
+        # data_clustered plus rows appended by update(), merged lazily
+        self._compact()
+        pending = getattr(self, 'pending_rows', None)
+        if pending:
+            self.data_clustered = self.data_clustered.append(pd.concat(pending, ignore_index=True))
+            self.pending_rows = []
+            if getattr(self, 'bank', None) is not None:
+                self.bank.corpus = self.data_clustered # Same rows first, so the bank's text rows still hold
+        return self.data_clustered
+
+    @staticmethod
+    def _cleaned_texts(corpus):
+        # The corpus keeps the raw texts only; cleaned_text is clean_text of them
+        return [clean_text(t) for t in corpus['text']]
+
+    def _prepare_serving(self):
+        # Builds whatever serving tables are missing (models pickled before they existed)
+        self._compact()
+        if getattr(self, 'bank', None) is not None and not hasattr(self.bank, 'text_rows'):
+            self.index = self.bank = None # Pickled with their own copies of every text
+        if getattr(self, 'index', None) is None or getattr(self, 'bank', None) is None:
+            corpus = self._corpus()
+            self.bank = QuestionBank(corpus)
+            self.index = QuizIndex(corpus, self.bank.text_codes)
+
+    def _prepare_related(self):
+        # Models saved before related() existed build the index from the stored corpus
+        if getattr(self, 'related_index', None) is None:
+            corpus = self._corpus()
+            X_tfidf = self.tfidf.transform(self._cleaned_texts(corpus))
+            self.related_index = RelatedIndex(X_tfidf, corpus['cluster'].to_numpy())
+        return self.related_index
+
+    def subjects(self):
+        """
+        Sorted subjects of the corpus, read from its category table.
+        """
         if self.data_clustered is None:
             return []
-        
-        # Filter by subject OR topic (broad search)
-        # Search in both 'subject' and 'topic' columns
-        mask = (
-            self.data_clustered['subject'].str.contains(subject, case=False, na=False) |
-            self.data_clustered['topic'].str.contains(subject, case=False, na=False)
-        )
-        subset = self.data_clustered[mask]
-        
-        if subset.empty:
-            subset = self.data_clustered # Fallback
-            
-        # Filter by difficulty
-        filtered = subset[subset['difficulty'] == difficulty]
-        
-        if filtered.empty:
-            filtered = subset # Fallback if no specific difficulty matches
+        corpus = self._corpus()
+        if 'subject' not in corpus.columns:
+            return []
+        return sorted(corpus.categories('subject').tolist())
 
-        # Ensure unique questions by text content logic
-        filtered = filtered.drop_duplicates(subset=['text'])
-            
-        # Sample questions
-        n = min(len(filtered), num_questions)
-        if n == 0:
+    def reseed(self, seed=None):
+        # Fresh random streams, e.g. in forked workers that would otherwise repeat each other
+        self._prepare_serving()
+        self.index._rng = np.random.default_rng(seed)
+        self.bank._rng = np.random.default_rng(seed)
+
+    def generate_quiz(self, subject, difficulty="Easy", num_questions=5, fuzzy=False):
+        return self.generate_quiz_batch([(subject, difficulty, num_questions)], fuzzy=fuzzy)[0]
+
+    @span("quiz.generate_quiz_batch")
+    def generate_quiz_batch(self, requests, fuzzy=False):
+        """
+        Generates one quiz per (subject, difficulty, num_questions) request,
+        rendering all selected questions in a single question bank call.
+        """
+        if self.data_clustered is None:
+            return [[] for _ in requests]
+        self._prepare_serving()
+        
+        # Filter by subject OR topic (broad search), then by difficulty, with the
+        # same fallbacks as before. Duplicate texts are already collapsed in the index.
+        picks = []
+        for subject, difficulty, num_questions in requests:
+            rows = self.index.lookup(subject, difficulty, fuzzy=fuzzy)
+            picks.append(self.index.sample(rows, min(len(rows), num_questions)))
+        if not picks:
             return []
             
-        selected = filtered.sample(n)
-        
-        # Get all unique topics for distractors
-        all_topics = self.data_clustered['topic'].unique()
-        
-        quiz = []
-        for _, row in selected.iterrows():
-            # Create a more natural question snippet
-            snippet = row['text']
-            if len(snippet) > 60:
-                snippet = snippet[:60] + "..."
-                
-            question = f"What is the main concept discussed in: '{snippet}'?"
-            
-            correct_topic = row['topic']
-            
-            # Smart Distractors: Try to pick from same subject first
-            # Filter data for potential distractors from the same subject
-            distractor_pool = self.data_clustered[self.data_clustered['subject'] == row['subject']]['topic'].unique()
-            
-            # Remove correct answer from pool
-            distractor_pool = [t for t in distractor_pool if t != correct_topic]
-            
-            # If not enough, expand to all topics
-            if len(distractor_pool) < 3:
-                distractor_pool = [t for t in all_topics if t != correct_topic]
-                
-            # Sample 3 distractors
-            if len(distractor_pool) >= 3:
-                distractors = list(np.random.choice(distractor_pool, 3, replace=False))
-            else:
-                 # Fallback if somehow still not enough (very small dataset)
-                 distractors = ["Topic A", "Topic B", "Topic C"]
-            
-            options = distractors + [correct_topic]
-            np.random.shuffle(options)
-            
-            quiz.append({
-                "question": question,
-                "options": options,
-                "correct": correct_topic,
-                "context": row['text']
-            })
-            
-        return quiz
+        # Stems, answers and same-subject distractors come from the question bank
+        questions = self.bank.questions(np.concatenate(picks))
+        bounds = np.cumsum([len(p) for p in picks])
+        return [questions[end - len(p):end] for p, end in zip(picks, bounds)]
     
+    @span("quiz.related")
+    def related(self, query, k=5, nprobe=16, exclude=()):
+        """
+        The k corpus rows closest to a text, or to a corpus row given by its
+        position, by cosine similarity of their TF-IDF vectors. Only the nprobe
+        inverted lists (sub-clusters of the topic clusters) nearest to the query
+        are searched. Rows with the same text as the query (the query text, or
+        the query row's text), as each other or as one of the exclude texts are
+        skipped. A row position outside 0 to len - 1 raises IndexError.
+        Returns dicts with row, score, subject, topic and text.
+        """
+        if self.data_clustered is None:
+            return []
+        self._prepare_serving()
+        index = self._prepare_related()
+        bank = self.bank
+        if isinstance(query, (int, np.integer)):
+            if not 0 <= query < len(bank.text_codes):
+                raise IndexError(f"Row {query} is outside the corpus (0-{len(bank.text_codes) - 1})")
+            text = bank.row_texts([query])[0]
+        else:
+            text = query
+        skip = set(exclude) | {text}
+        rows, scores = index.search(self.tfidf.transform([clean_text(text)]), limit=4 * k + len(skip), nprobe=nprobe)
+
+        results = []
+        for row, score, row_text in zip(rows, scores, bank.row_texts(rows)):
+            if row_text in skip:
+                continue
+            skip.add(row_text)
+            subject_code = bank.subject_codes[row]
+            topic = bank.topics[bank.topic_codes[row]]
+            results.append({"row": int(row), "score": float(score),
+                            "subject": bank.subjects[subject_code] if subject_code >= 0 else None,
+                            "topic": None if pd.isna(topic) else topic, "text": row_text})
+            if len(results) == k:
+                break
+        return results
+
+    def render_questions(self, rows):
+        """
+        Quiz questions (with fresh distractors) for corpus rows.
+        """
+        self._prepare_serving()
+        return self.bank.questions(np.asarray(rows, dtype=np.int64))
+
+    def related_questions(self, query, k=3, exclude=()):
+        """
+        Practice questions on the passages most related to query (see related()).
+        """
+        return self.render_questions([r["row"] for r in self.related(query, k, exclude=exclude)])
+
     def suggest_resources(self, subject):
         # Resource Suggestion System
         # Simple mapping or based on clusters
@@ -151,16 +608,33 @@ class QuizGenerator:
         }
         return resources.get(subject, ["https://www.google.com/search?q=" + subject])
 
-    def save_model(self, path="models/quiz_generator.pkl"):
+    def save_model(self, path="models/quiz_generator"):
+        # Versioned artifact directory by default; a '.pkl' path keeps the legacy pickle
+        self._corpus()
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, 'wb') as f:
-            pickle.dump(self, f)
+        if path.endswith('.pkl'):
+            with open(path, 'wb') as f:
+                pickle.dump(self, f)
+        else:
+            save_quiz_artifact(self, path)
             
     @staticmethod
-    def load_model(path="models/quiz_generator.pkl"):
-        if os.path.exists(path):
+    def load_model(path="models/quiz_generator"):
+        if os.path.isdir(path):
+            return load_quiz_artifact(path)
+        
+        # Legacy pickles load directly, or are converted when the artifact path is asked for
+        legacy_path = path if path.endswith('.pkl') else path + '.pkl'
+        if os.path.isfile(legacy_path):
+            if legacy_path != path:
+                print(f"Converting {legacy_path} to artifact directory {path}...")
+                convert_pickle(legacy_path, path)
+                return load_quiz_artifact(path)
             with open(path, 'rb') as f:
-                return pickle.load(f)
+                model = pickle.load(f)
+            if model.data_clustered is not None:
+                model._prepare_serving()
+            return model
         return QuizGenerator()
 
 if __name__ == "__main__":
@@ -169,6 +643,6 @@ if __name__ == "__main__":
     df = load_data("data/dataset.csv")
     if df is not None:
         qg = QuizGenerator()
-        qg.train(df)
+        qg.train(dedup_data(df))
         qg.save_model()
         print(qg.generate_quiz("Science", "Easy"))
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import threading
+import time
+from metrics import registry as metrics
+
+def file_version(*paths):
+    """
+    Version of the artifacts at paths: the newest modification time plus a
+    short hash of their (mtime, size, inode), which changes when a file is
+    rewritten or a directory is renamed into place. None when none exist.
+    """
+    stats = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stats.append((path, st.st_mtime_ns, st.st_size, st.st_ino))
+    if not stats:
+        return None
+    newest = time.strftime("%Y%m%dT%H%M%S", time.localtime(max(s[1] for s in stats) / 1e9))
+    return f"{newest}-{hashlib.blake2b(repr(stats).encode(), digest_size=4).hexdigest()}"
+
+class ModelRegistry:
+    """
+    Hot reload for LazyResource models.
+
+    reload() builds the new version next to the one being served, warms it
+    with the resource's canned requests, then swaps it in; requests that
+    already pinned the old object finish on it (see lazy_loader.pin_resources).
+    A version that fails to load or warm up is dropped and the old one kept.
+    watch() polls the versions in a background thread and reloads a changed
+    resource once its version has been the same for two polls, so files still
+    being written are not picked up.
+    """
+    def __init__(self):
+        self.entries = {} # name -> (resource, warmup)
+        self.history = {} # name -> reload stats
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._seen = {}
+
+    def register(self, resource, warmup=None):
+        """
+        warmup(obj) runs canned requests against a newly loaded obj before it is served.
+        """
+        self.entries[resource.name] = (resource, warmup)
+        self.history[resource.name] = {"reloads": 0, "failures": 0, "warmup_seconds": None, "last_error": None}
+        return resource
+
+    def changed(self):
+        """
+        {name: version on disk} of loaded resources whose version differs from the served one.
+        """
+        changed = {}
+        for name, (resource, _) in self.entries.items():
+            if resource.loaded:
+                version = resource.current_version()
+                if version is not None and version != resource.version:
+                    changed[name] = version
+        return changed
+
+    def settled(self):
+        """
+        Names of the changed resources whose version is the same as at the
+        previous call (polled every few seconds: their files are complete).
+        """
+        changed = self.changed()
+        settled = [name for name, version in changed.items() if self._seen.get(name) == version]
+        self._seen = changed
+        return settled
+
+    def reload(self, names=None, force=False):
+        """
+        Reloads the named resources (default: all that changed), one reload at
+        a time. Returns {name: status} of the resources it reloaded.
+        """
+        with self._reload_lock:
+            names = list(self.entries) if names is None else names
+            targets = names if force else [n for n in names if n in self.changed()]
+            results = {}
+            for name in targets:
+                results[name] = self._reload_one(name)
+            return results
+
+    def _reload_one(self, name):
+        resource, warmup = self.entries[name]
+        stats = self.history[name]
+        old_version = resource.version
+        try:
+            start = time.perf_counter()
+            value, version = resource.load()
+            load_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            if warmup is not None:
+                warmup(value)
+            stats["warmup_seconds"] = time.perf_counter() - start
+        except Exception as e:
+            stats["failures"] += 1
+            stats["last_error"] = repr(e)
+            metrics.inc("model_reloads_total", (name, "failed"))
+            print(f"Reload of {name} failed, still serving {old_version}: {e}")
+            return dict(resource.status(), reloaded=False, error=repr(e))
+        resource.swap(value, version, load_seconds)
+        stats["reloads"] += 1
+        stats["last_error"] = None
+        metrics.inc("model_reloads_total", (name, "swapped"))
+        metrics.observe("model_load_seconds", (name,), load_seconds)
+        metrics.observe("model_swap_seconds", (name,), resource.swap_seconds)
+        print(f"Reloaded {name}: {old_version} -> {version} (load {load_seconds:.2f}s, "
+              f"warmup {stats['warmup_seconds']:.2f}s, swap {resource.swap_seconds * 1e6:.0f}us)")
+        return dict(resource.status(), reloaded=True)
+
+    def reload_async(self, names=None, force=False):
+        """
+        reload() in a background thread; returns False if a reload is already running.
+        """
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, args=(names, force), name="model-reload", daemon=True).start()
+        return True
+
+    def watch(self, poll_seconds=2.0):
+        """
+        Starts polling the model versions in a daemon thread.
+        """
+        if self._watcher is not None:
+            return self._watcher
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(poll_seconds):
+                try:
+                    settled = self.settled()
+                    if settled:
+                        self.reload(settled)
+                except Exception as e:
+                    print(f"Model watcher error: {e}")
+
+        self._watcher = threading.Thread(target=run, name="model-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop(self):
+        self._stop.set()
+        self._watcher = None
+
+    def status(self):
+        changed = self.changed()
+        return {name: dict(resource.status(), **self.history[name], pending_version=changed.get(name))
+                for name, (resource, _) in self.entries.items()}
@@ -0,0 +1,404 @@
+import json
+import os
+import shutil
+import time
+import pickle
+import numpy as np
+import pandas as pd
+import corpus_store # Module import: corpus_store imports this module too
+
+FORMAT_NAME = "quiz-generator"
+FORMAT_VERSION = 3 # v2: hashed/SGD estimators and incremental-update state; v3: compact corpus columns
+MANIFEST = "manifest.json"
+VERSIONS_DIR = ".versions" # Published artifact versions, next to the paths that point to them
+CURRENT = "current"        # Symlink to the version train.py published last
+KEEP_VERSIONS = 2
+
+def encode_strings(values):
+    """
+    (data, offsets, missing) of a sequence of strings: one contiguous UTF-8
+    buffer, the byte offsets of each value in it, and a mask of missing
+    values (None when nothing is missing).
+    """
+    values = pd.Series(values, dtype=object)
+    missing = values.isna().to_numpy()
+    encoded = [b"" if m else str(v).encode('utf-8') for v, m in zip(values, missing)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets, missing if missing.any() else None
+
+def decode_strings(data, offsets, missing=None):
+    """
+    The strings encode_strings encoded, as an object array (NaN where missing).
+    """
+    buffer = bytes(data)
+    values = np.array([buffer[a:b].decode('utf-8') for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+                      + [None], dtype=object)[:-1]
+    if missing is not None:
+        values[missing] = np.nan
+    return values
+
+def _json_params(estimator):
+    # Keeps the constructor params that survive a JSON round trip
+    params = {}
+    for key, value in estimator.get_params().items():
+        if isinstance(value, tuple):
+            value = list(value)
+        if value is None or isinstance(value, (str, int, float, bool, list)):
+            params[key] = value
+    return params
+
+def _restore_params(params):
+    params = dict(params)
+    if 'ngram_range' in params:
+        params['ngram_range'] = tuple(params['ngram_range'])
+    return params
+
+class ArtifactWriter:
+    """
+    Writes numpy arrays into an artifact directory and records them for the manifest.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+
+    def array(self, name, arr):
+        arr = np.ascontiguousarray(arr)
+        np.save(os.path.join(self.path, name + ".npy"), arr, allow_pickle=False)
+        self.files[name] = {"dtype": str(arr.dtype), "shape": list(arr.shape)}
+
+    def strings(self, name, values):
+        # One UTF-8 buffer plus offsets (encode_strings); missing values are flagged in a mask
+        data, offsets, missing = encode_strings(values)
+        self.array(name + ".data", data)
+        self.array(name + ".offsets", offsets)
+        if missing is not None:
+            self.array(name + ".na", missing)
+
+    def sparse(self, name, matrix):
+        matrix = matrix.tocsr()
+        self.array(name + ".indptr", matrix.indptr)
+        self.array(name + ".indices", matrix.indices)
+        self.array(name + ".values", matrix.data)
+        self.files[name + ".indptr"]["matrix_shape"] = list(matrix.shape)
+
+class ArtifactReader:
+    """
+    Reads arrays from an artifact directory, memory-mapped when mmap=True.
+    """
+    def __init__(self, path, manifest, mmap=True):
+        self.path = path
+        self.manifest = manifest
+        self.mmap_mode = 'r' if mmap else None
+
+    def has(self, name):
+        return name in self.manifest["files"]
+
+    def array(self, name):
+        return np.load(os.path.join(self.path, name + ".npy"), mmap_mode=self.mmap_mode, allow_pickle=False)
+
+    def strings(self, name):
+        missing = self.array(name + ".na") if self.has(name + ".na") else None
+        return decode_strings(self.array(name + ".data"), self.array(name + ".offsets"), missing)
+
+    def categorical(self, name):
+        uniques = np.append(self.strings(name + ".values"), np.nan).astype(object)
+        return uniques[self.array(name + ".codes")] # Code -1 picks the trailing NaN
+
+    def sparse(self, name):
+        from scipy.sparse import csr_matrix
+        shape = tuple(self.manifest["files"][name + ".indptr"]["matrix_shape"])
+        return csr_matrix((self.array(name + ".values"), self.array(name + ".indices"), self.array(name + ".indptr")), shape=shape)
+
+def _vocabulary_terms(vocabulary):
+    terms = np.empty(len(vocabulary), dtype=object)
+    for term, i in vocabulary.items():
+        terms[i] = term
+    return terms
+
+def save_quiz_artifact(model, path):
+    """
+    Saves a trained QuizGenerator as a versioned artifact directory.
+
+    The directory is written next to path and published as a new version
+    (see publish), so readers never see a half-written artifact.
+    """
+    import sklearn
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    w = ArtifactWriter(tmp)
+    estimators = {}
+    classes = {}
+
+    if model.vectorizer is not None:
+        if hasattr(model.vectorizer, 'vocabulary_'): # HashingVectorizer is stateless
+            w.strings("vectorizer.vocab", _vocabulary_terms(model.vectorizer.vocabulary_))
+        estimators["vectorizer"] = _json_params(model.vectorizer)
+        classes["vectorizer"] = type(model.vectorizer).__name__
+    if model.difficulty_model is not None:
+        w.array("difficulty.coef", model.difficulty_model.coef_)
+        w.array("difficulty.intercept", model.difficulty_model.intercept_)
+        w.strings("difficulty.classes", model.difficulty_model.classes_)
+        estimators["difficulty_model"] = _json_params(model.difficulty_model)
+        classes["difficulty_model"] = type(model.difficulty_model).__name__
+    if model.tfidf is not None:
+        w.strings("tfidf.vocab", _vocabulary_terms(model.tfidf.vocabulary_))
+        w.array("tfidf.idf", model.tfidf.idf_)
+        estimators["tfidf"] = _json_params(model.tfidf)
+    if model.topic_model is not None:
+        w.array("topic.centroids", model.topic_model.cluster_centers_)
+        estimators["topic_model"] = _json_params(model.topic_model)
+
+    # State used by QuizGenerator.update()
+    update_state = {}
+    for attr in ("length_threshold", "out_of_core", "n_clusters", "classifier_params", "drift_baseline", "drift_state"):
+        if getattr(model, attr, None) is not None:
+            update_state[attr] = getattr(model, attr)
+    if getattr(model, 'cluster_counts', None) is not None:
+        w.array("topic.cluster_counts", model.cluster_counts)
+    if hasattr(model.difficulty_model, 't_'):
+        update_state["difficulty_t"] = float(model.difficulty_model.t_)
+
+    # Term-major TF-IDF rows behind related(), so loading needs no re-vectorizing
+    related = getattr(model, 'related_index', None)
+    if related is not None:
+        for name, arr in related.arrays().items():
+            w.array(f"related.{name}", arr)
+
+    # Corpus stored column by column, as the CorpusStore holds it
+    columns = []
+    corpus = model.data_clustered
+    if isinstance(corpus, pd.DataFrame):
+        corpus = corpus_store.CorpusStore.from_frame(corpus)
+    if corpus is not None:
+        for col in corpus.columns:
+            kind, payload = corpus.kind(col), corpus.payload(col)
+            if kind == "text":
+                data, offsets, missing = payload
+                w.array(f"corpus.{col}.data", data)
+                w.array(f"corpus.{col}.offsets", offsets)
+                if missing is not None:
+                    w.array(f"corpus.{col}.na", missing)
+                # Distinct-text codes, so loading builds the question bank without decoding every text
+                codes, first_rows = corpus.text_codes(col)
+                w.array(f"corpus.{col}.codes", codes)
+                w.array(f"corpus.{col}.first_rows", first_rows)
+            elif kind == "categorical":
+                w.strings(f"corpus.{col}.values", payload[1])
+                w.array(f"corpus.{col}.codes", payload[0])
+            else:
+                w.array(f"corpus.{col}", payload)
+            columns.append({"name": col, "kind": kind})
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sklearn_version": sklearn.__version__,
+        "estimators": estimators,
+        "estimator_classes": classes,
+        "update_state": update_state,
+        "columns": columns,
+        "files": w.files,
+    }
+    with open(os.path.join(tmp, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    publish(tmp, path)
+
+def _version_name():
+    # Sorts by publish time (to the nanosecond); the pid keeps concurrent publishers apart
+    now = time.time_ns()
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(now // 10**9))}.{now % 10**9:09d}-{os.getpid()}"
+
+def _point(link, target):
+    """
+    Makes link a symlink to target (relative to link's directory), swapped
+    in with one rename so readers see the old or the new target.
+    """
+    tmp = f"{link}.link-{os.getpid()}"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.symlink(target, tmp)
+    if os.path.isdir(link) and not os.path.islink(link):
+        # A directory published before versioning: moved aside once, the only non-atomic step
+        old = f"{link}.old-{os.getpid()}"
+        os.rename(link, old)
+        os.replace(tmp, link)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.replace(tmp, link)
+
+def _prune(versions_dir, prefix, keep):
+    # Drops all but the newest keep versions (readers may still be loading the previous one)
+    names = sorted(n for n in os.listdir(versions_dir) if n.startswith(prefix))
+    for name in names[:-keep]:
+        shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+
+def publish(staged, path, keep=KEEP_VERSIONS):
+    """
+    Moves a staged file or artifact directory to path (same filesystem).
+    Files replace path atomically. A directory is moved into a versioned
+    sibling (.versions/<name>-<time>) and path becomes a symlink to it,
+    swapped with one rename, so path is never missing or half-replaced.
+    """
+    if not os.path.isdir(staged):
+        os.replace(staged, path)
+        return
+    name, parent = os.path.basename(path), os.path.dirname(path) or "."
+    versions = os.path.join(parent, VERSIONS_DIR)
+    os.makedirs(versions, exist_ok=True)
+    version = os.path.join(versions, f"{name}-{_version_name()}")
+    os.rename(staged, version)
+    _point(path, os.path.relpath(version, parent))
+    _prune(versions, f"{name}-", keep)
+
+def publish_version(staged_dir, models_dir, names, keep=KEEP_VERSIONS):
+    """
+    Publishes the artifacts in staged_dir (a directory on the models_dir
+    filesystem) together. The directory becomes a version under
+    models_dir/.versions, models_dir/current is swapped to it with one
+    rename, and each models_dir/<name> is a symlink through current, so
+    loaders never see artifacts of two versions. Artifacts of the previous
+    version missing from staged_dir are carried over (hard links).
+    """
+    versions = os.path.join(models_dir, VERSIONS_DIR)
+    current = os.path.join(models_dir, CURRENT)
+    os.makedirs(versions, exist_ok=True)
+    if os.path.isdir(current):
+        for entry in os.listdir(current):
+            src, dst = os.path.join(current, entry), os.path.join(staged_dir, entry)
+            if os.path.lexists(dst):
+                continue
+            if os.path.isdir(src):
+                shutil.copytree(src, dst, copy_function=os.link)
+            else:
+                os.link(src, dst)
+    os.chmod(staged_dir, 0o755) # Staged with mkdtemp's 0700
+    version = os.path.join(versions, f"release-{_version_name()}")
+    os.rename(staged_dir, version)
+    _point(current, os.path.relpath(version, models_dir))
+    for name in names:
+        link, target = os.path.join(models_dir, name), os.path.join(CURRENT, name)
+        if not (os.path.islink(link) and os.readlink(link) == target):
+            _point(link, target) # First publish after an unversioned one
+    _prune(versions, "release-", keep)
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME:
+        raise ValueError(f"{path} is not a {FORMAT_NAME} artifact")
+    if manifest.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(f"Artifact version {manifest['version']} is newer than supported ({FORMAT_VERSION})")
+    return manifest
+
+def load_quiz_artifact(path, mmap=True):
+    """
+    Loads a QuizGenerator from an artifact directory. Numeric arrays are
+    memory-mapped so worker processes share their pages.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+    from sklearn.cluster import KMeans
+    from ml_models import QuizGenerator
+
+    path = os.path.realpath(path) # Resolved once: every file comes from the same published version
+    manifest = read_manifest(path)
+    r = ArtifactReader(path, manifest, mmap=mmap)
+    estimators = manifest["estimators"]
+    classes = manifest.get("estimator_classes", {}) # v1 artifacts: CountVectorizer + LogisticRegression
+    update_state = manifest.get("update_state", {})
+    model = QuizGenerator()
+
+    if "vectorizer" in estimators:
+        params = _restore_params(estimators["vectorizer"])
+        if classes.get("vectorizer") == "HashingVectorizer":
+            model.vectorizer = HashingVectorizer(**params)
+        else:
+            model.vectorizer = CountVectorizer(**params)
+            model.vectorizer.vocabulary_ = {t: i for i, t in enumerate(r.strings("vectorizer.vocab"))}
+    if "difficulty_model" in estimators:
+        params = _restore_params(estimators["difficulty_model"])
+        if classes.get("difficulty_model") == "SGDClassifier":
+            clf = SGDClassifier(**params)
+            clf.t_ = update_state.get("difficulty_t", 1.0)
+            # partial_fit updates the weights in place, so they must not be read-only maps
+            clf.coef_ = np.array(r.array("difficulty.coef"))
+            clf.intercept_ = np.array(r.array("difficulty.intercept"))
+            clf._expanded_class_weight = np.ones(len(r.strings("difficulty.classes")))
+        else:
+            clf = LogisticRegression(**params)
+            clf.coef_ = r.array("difficulty.coef")
+            clf.intercept_ = r.array("difficulty.intercept")
+        clf.classes_ = r.strings("difficulty.classes")
+        clf.n_features_in_ = clf.coef_.shape[1]
+        model.difficulty_model = clf
+    if "tfidf" in estimators:
+        model.tfidf = TfidfVectorizer(**_restore_params(estimators["tfidf"]))
+        model.tfidf.vocabulary_ = {t: i for i, t in enumerate(r.strings("tfidf.vocab"))}
+        model.tfidf.idf_ = r.array("tfidf.idf")
+    if "topic_model" in estimators:
+        km = KMeans(**_restore_params(estimators["topic_model"]))
+        km.cluster_centers_ = r.array("topic.centroids")
+        km.n_features_in_ = km.cluster_centers_.shape[1]
+        km._n_threads = 1
+        model.topic_model = km
+    if r.has("topic.cluster_counts"):
+        model.cluster_counts = np.array(r.array("topic.cluster_counts"))
+    for attr in ("length_threshold", "out_of_core", "n_clusters", "classifier_params", "drift_baseline", "drift_state"):
+        if attr in update_state:
+            setattr(model, attr, update_state[attr])
+    if r.has("related.indptr"):
+        from related_index import RelatedIndex
+        model.related_index = RelatedIndex.from_arrays(**{
+            name: r.array(f"related.{name}") for name in
+            ("indptr", "indices", "data", "rows", "bounds", "c_indptr", "c_indices", "c_data", "num_features")})
+
+    if manifest["columns"]:
+        model.data_clustered = _load_corpus(r, manifest["columns"])
+        model._prepare_serving()
+    return model
+
+def _load_corpus(r, columns):
+    # Texts and codes stay memory-mapped; v2 artifacts stored every string column dictionary-encoded
+    data = {}
+    text_codes = {}
+    n_rows = 0
+    for col in columns:
+        name, kind = col["name"], col["kind"]
+        if name in corpus_store.DROPPED_COLUMNS:
+            continue
+        if kind == "text":
+            missing = r.array(f"corpus.{name}.na") if r.has(f"corpus.{name}.na") else None
+            data[name] = (kind, (r.array(f"corpus.{name}.data"), r.array(f"corpus.{name}.offsets"), missing))
+            n_rows = len(data[name][1][1]) - 1
+            if r.has(f"corpus.{name}.codes"):
+                text_codes[name] = (r.array(f"corpus.{name}.codes"), r.array(f"corpus.{name}.first_rows"))
+        elif kind == "numeric":
+            data[name] = (kind, r.array(f"corpus.{name}"))
+            n_rows = len(data[name][1])
+        elif name in corpus_store.TEXT_COLUMNS:
+            data[name] = ("text", encode_strings(r.categorical(f"corpus.{name}")))
+            n_rows = len(data[name][1][1]) - 1
+        else:
+            data[name] = ("categorical", (r.array(f"corpus.{name}.codes"), r.strings(f"corpus.{name}.values")))
+            n_rows = len(data[name][1][0])
+    return corpus_store.CorpusStore(data, n_rows, text_codes)
+
+def convert_pickle(pickle_path, path):
+    """
+    Converts a legacy pickled QuizGenerator into an artifact directory.
+    """
+    with open(pickle_path, 'rb') as f:
+        model = pickle.load(f)
+    save_quiz_artifact(model, path)
+    return path
+
+if __name__ == "__main__":
+    import sys
+    src = sys.argv[1] if len(sys.argv) > 1 else "models/quiz_generator.pkl"
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(src)[0]
+    convert_pickle(src, dst)
+    print(f"Converted {src} -> {dst}")
@@ -1,38 +1,158 @@
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize, sent_tokenize
 import collections
+import hashlib
+import os
+import re
+import threading
+import numpy as np
+from lazy_loader import LazyResource
+from metrics import span
 
-# Ensure nltk data is downloaded
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('punkt_tab')
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'dataset.csv')
+
+# Runs of letters/digits; the same tokens word_tokenize + isalnum kept, without punkt
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+MAX_KEYWORDS = 20 # Keywords ranked and cached per text: the most any caller gets
+
+def _load_stopwords():
+    """
+    Imports NLTK and returns the English stopwords (downloaded on first use only).
+    """
+    import nltk
+    from nltk.corpus import stopwords
+    try:
+        return stopwords.words('english')
+    except LookupError:
+        nltk.download('stopwords')
+        return stopwords.words('english')
+
+class KeywordEngine:
+    """
+    Keyword extractor built once: frozen stopwords, a regex tokenizer, a corpus
+    IDF table and a cache of ranked keywords keyed by a hash of the text.
+    Only the top max_keywords of each text are ranked and cached.
+    """
+    def __init__(self, stop_words, corpus=None, max_keywords=MAX_KEYWORDS, cache_size=4096):
+        self.stop_words = frozenset(stop_words)
+        self.max_keywords = max_keywords
+        self.cache_size = cache_size
+        self.vocab = {}
+        self.idf = np.ones(0)
+        self.default_idf = 1.0
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        if corpus is not None:
+            self.fit(corpus)
+
+    def tokenize(self, text):
+        return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in self.stop_words]
+
+    def fit(self, texts):
+        """
+        Builds the IDF table from a corpus (smoothed like scikit-learn's TfidfTransformer).
+        """
+        doc_freq = collections.Counter()
+        for text in texts:
+            doc_freq.update(set(self.tokenize(str(text))))
+        n = len(texts)
+        self.vocab = {word: i for i, word in enumerate(doc_freq)}
+        self.idf = np.log((1 + n) / (1 + np.fromiter(doc_freq.values(), dtype=float, count=len(doc_freq)))) + 1
+        self.default_idf = np.log(1 + n) + 1 # Words never seen in the corpus
+        with self._lock:
+            self._cache.clear()
+
+    @staticmethod
+    def _key(text):
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    @span("nlp.extract_keywords")
+    def extract_keywords_many(self, texts, num=5):
+        """
+        Returns the top num keywords of each text, ranked by TF-IDF; num is
+        capped at max_keywords.
+        """
+        keys = [self._key(t) if t else None for t in texts]
+        results = [[] for _ in texts]
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key is None:
+                    continue
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[i] = self._cache[key]
+                else:
+                    missing.append(i)
+
+        if missing:
+            ranked = self._rank([texts[i] for i in missing])
+            with self._lock:
+                for i, words in zip(missing, ranked):
+                    results[i] = words
+                    self._cache[keys[i]] = words
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return [words[:num] for words in results]
+
+    def _rank(self, texts):
+        # Sparse (text, word) counts over a batch-local vocabulary
+        local = {}
+        cols, rows = [], []
+        for row, text in enumerate(texts):
+            tokens = self.tokenize(text)
+            cols.extend(local.setdefault(w, len(local)) for w in tokens)
+            rows.extend([row] * len(tokens))
+        if not cols:
+            return [[] for _ in texts]
+        words = np.array(list(local), dtype=object)
+        idf = np.array([self.idf[self.vocab[w]] if w in self.vocab else self.default_idf for w in words])
+
+        rows, cols = np.asarray(rows), np.asarray(cols)
+        pair, first, counts = np.unique(rows * len(words) + cols, return_index=True, return_counts=True)
+        pair_rows, pair_cols = pair // len(words), pair % len(words)
+        scores = counts * idf[pair_cols]
+
+        # Highest score first; ties go to the word that appears first in the text
+        order = np.lexsort((first, -scores, pair_rows))
+        pair_rows, pair_cols = pair_rows[order], pair_cols[order]
+        starts = np.searchsorted(pair_rows, np.arange(len(texts) + 1))
+        return [words[pair_cols[starts[r]:min(starts[r + 1], starts[r] + self.max_keywords)]].tolist()
+                for r in range(len(texts))]
+
+def _load_keyword_engine():
+    corpus = None
+    if os.path.exists(CORPUS_PATH):
+        import pandas as pd
+        corpus = pd.read_csv(CORPUS_PATH, usecols=['text'])['text'].dropna().astype(str).tolist()
+    return KeywordEngine(_load_stopwords(), corpus)
+
+# Built on first keyword extraction (or by the app warmup thread)
+keyword_engine = LazyResource("keyword_engine", _load_keyword_engine)
 
 def extract_keywords(text, num=5):
     """
-    Extracts top keywords from text excluding stopwords.
+    Extracts top keywords from text excluding stopwords (at most MAX_KEYWORDS).
     """
     if not text:
         return []
-        
-    text = text.lower()
-    tokens = word_tokenize(text)
-    stop_words = set(stopwords.words('english'))
-    
-    keywords = [word for word in tokens if word.isalnum() and word not in stop_words]
-    
-    counter = collections.Counter(keywords)
-    return [word for word, count in counter.most_common(num)]
+    return keyword_engine.extract_keywords_many([text], num)[0]
+
+def extract_keywords_many(texts, num=5):
+    """
+    Extracts top keywords for each text in a batch (at most MAX_KEYWORDS each).
+    """
+    return keyword_engine.extract_keywords_many(texts, num)
 
 def generate_study_tips(text):
     """
     Generates study tips based on text content.
     """
-    keywords = extract_keywords(text)
-    
+    return tips_from_keywords(extract_keywords(text))
+
+@span("nlp.study_tips")
+def tips_from_keywords(keywords):
+    """
+    Generates study tips from already extracted keywords.
+    """
     if not keywords:
         return ["Review the material again.", "Make sure to take notes."]
     
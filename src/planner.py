@@ -0,0 +1,227 @@
+import csv
+import datetime as dt
+import io
+import numpy as np
+
+# High = 3 pts, Medium = 2 pts, Low = 1 pt
+PRIORITY_POINTS = {'High': 3, 'Medium': 2, 'Low': 1}
+STUDY_MINUTES = 50 # Each hour: 50 minutes of study, then a 10 minute break
+CSV_COLUMNS = ["Day", "Date", "Start", "End", "Subject", "Priority", "Activity"]
+MAX_PLAN_DAYS = 366 # Longest plan the web form and the JSON API accept
+
+def priority_weights(priorities):
+    return np.array([PRIORITY_POINTS.get(p, 2) for p in priorities], dtype=float)
+
+def largest_remainder(weights, total):
+    """
+    Splits the integer total in proportion to weights (Hamilton's method):
+    each share is its quota rounded down and the units left over go to the
+    largest remainders, so the shares always add up to total.
+    """
+    weights = np.asarray(weights, dtype=float)
+    weight_sum = weights.sum()
+    if total <= 0 or weight_sum <= 0:
+        return np.zeros(len(weights), dtype=np.int64)
+    quotas = weights * (total / weight_sum)
+    shares = np.floor(quotas).astype(np.int64)
+    leftover = int(total - shares.sum())
+    if leftover > 0:
+        # Stable sort: ties go to the earlier subject
+        shares[np.argsort(shares - quotas, kind='stable')[:leftover]] += 1
+    return shares
+
+def capped_allocation(weights, total, caps):
+    """
+    largest_remainder with an upper bound per share; what a capped share
+    cannot take is split among the others.
+    """
+    weights = np.asarray(weights, dtype=float)
+    caps = np.asarray(caps, dtype=np.int64)
+    shares = np.zeros(len(weights), dtype=np.int64)
+    open_ = (weights > 0) & (caps > 0)
+    remaining = min(int(total), int(caps[open_].sum()))
+    while remaining > 0 and open_.any():
+        add = np.minimum(largest_remainder(np.where(open_, weights, 0), remaining), caps - shares)
+        shares += add
+        remaining -= int(add.sum())
+        open_ &= shares < caps
+    return shares
+
+def allocate_hours(subjects, total_hours):
+    """
+    Splits total_hours between subjects ({'name', 'priority'} dicts) in
+    proportion to their priority points, in tenths of an hour that add up
+    to total_hours.
+    """
+    tenths = largest_remainder(priority_weights([s['priority'] for s in subjects]), round(total_hours * 10))
+    return [{"subject": s['name'], "priority": s['priority'], "hours": int(t) / 10,
+             "activity": f"Study {s['name']} - Focus on key concepts."}
+            for s, t in zip(subjects, tenths) if t > 0]
+
+def _deadline_days(deadline, start_date, days):
+    # Days available before the deadline: a day count, or the (exam) date itself
+    if deadline in (None, ""):
+        return days
+    if isinstance(deadline, str):
+        deadline = dt.date.fromisoformat(deadline)
+    if isinstance(deadline, dt.date):
+        deadline = (deadline - start_date).days
+    return max(0, min(int(deadline), days))
+
+def _fill(amounts, capacity):
+    # Takes amounts in order until capacity runs out
+    before = np.cumsum(amounts) - amounts
+    return np.clip(capacity - before, 0, amounts)
+
+def build_schedule(subjects, days=1, hours_per_day=4, start_date=None, day_start="09:00"):
+    """
+    Plans days of study for subjects: {'name', 'priority'} dicts with an
+    optional 'deadline' (number of days, or a date to finish before) and an
+    optional 'max_hours_per_day'. hours_per_day is one number or one per day.
+
+    Hours are split by priority points with largest_remainder, limited by
+    what each subject can still fit before its deadline, then laid out day by
+    day, earliest deadline first, pacing each subject evenly over its days.
+    """
+    start_date = start_date or dt.date.today()
+    if isinstance(start_date, str):
+        start_date = dt.date.fromisoformat(start_date)
+    capacity = np.broadcast_to(np.asarray(hours_per_day, dtype=np.int64), (days,)).copy()
+    deadline = np.array([_deadline_days(s.get('deadline'), start_date, days) for s in subjects], dtype=np.int64)
+    cap = np.array([s.get('max_hours_per_day') or capacity.max(initial=0) for s in subjects], dtype=np.int64)
+
+    # Hours each subject can get: open days before its deadline, and its daily cap
+    cumulative = np.concatenate([[0], np.cumsum(capacity)])
+    targets = capped_allocation(priority_weights([s['priority'] for s in subjects]),
+                                capacity.sum(), np.minimum(cumulative[deadline], cap * deadline))
+
+    order = np.lexsort((np.arange(len(subjects)), deadline)) # Earliest deadline first
+    hours = np.zeros((days, len(subjects)), dtype=np.int64)
+    remaining = targets.copy()
+    for day in range(days):
+        active = (remaining > 0) & (deadline > day)
+        room = np.minimum(remaining, cap) * active
+        # Hours that no longer fit in the subject's later days, then an even pace, then spare hours
+        later = np.minimum(cumulative[deadline] - cumulative[day + 1], cap * (deadline - day - 1))
+        must = np.minimum(np.maximum(remaining - np.maximum(later, 0), 0), room)
+        pace = np.maximum(np.minimum(-(-remaining // np.maximum(deadline - day, 1)), room), must)
+        take = _fill(must[order], capacity[day])
+        for wanted in (pace, room):
+            take += _fill(wanted[order] - take, capacity[day] - take.sum())
+        hours[day, order] = take
+        remaining -= hours[day]
+
+    names = [str(s['name']) for s in subjects]
+    priorities = [s['priority'] for s in subjects]
+    return Schedule(names, priorities, hours, order, start_date, day_start, unscheduled=remaining)
+
+class Schedule:
+    """
+    Study hours per (day, subject), expanded into sessions and exported
+    lazily as CSV or iCalendar.
+    """
+    def __init__(self, names, priorities, hours, order, start_date, day_start="09:00", unscheduled=None):
+        self.names = names
+        self.priorities = priorities
+        self.hours = hours
+        self.order = order
+        self.start_date = start_date
+        self.day_start = dt.time.fromisoformat(day_start) if isinstance(day_start, str) else day_start
+        self.unscheduled = unscheduled if unscheduled is not None else np.zeros(len(names), dtype=np.int64)
+
+    @property
+    def days(self):
+        return self.hours.shape[0]
+
+    def allocation(self):
+        totals = self.hours.sum(axis=0)
+        return [{"subject": self.names[i], "priority": self.priorities[i], "hours": int(totals[i]),
+                 "unscheduled": int(self.unscheduled[i]),
+                 "activity": f"Study {self.names[i]} - Focus on key concepts."}
+                for i in range(len(self.names)) if totals[i] or self.unscheduled[i]]
+
+    def _slots(self):
+        # (day, hour of the day, subject index, start) for every study hour
+        for day in range(self.days):
+            per_subject = self.hours[day, self.order]
+            if not per_subject.any():
+                continue
+            first = dt.datetime.combine(self.start_date + dt.timedelta(days=day), self.day_start)
+            for hour, i in enumerate(np.repeat(self.order, per_subject)):
+                yield day, hour, int(i), first + dt.timedelta(hours=hour)
+
+    def sessions(self, breaks=True):
+        """
+        Yields a study session (and its break) for every hour of the plan.
+        """
+        for day, hour, i, start in self._slots():
+            prefix = f"Day {day + 1}, " if self.days > 1 else ""
+            study_end = start + dt.timedelta(minutes=STUDY_MINUTES)
+            yield {"day": day + 1, "date": start.date().isoformat(), "hour": hour + 1,
+                   "label": f"{prefix}Hour {hour + 1} (00-50m)",
+                   "start": start.strftime("%H:%M"), "end": study_end.strftime("%H:%M"),
+                   "subject": self.names[i], "priority": self.priorities[i],
+                   "activity": f"Study {self.names[i]} - Focus on key concepts.", "is_break": False}
+            if breaks:
+                yield {"day": day + 1, "date": start.date().isoformat(), "hour": hour + 1,
+                       "label": f"{prefix}Hour {hour + 1} (50-60m)",
+                       "start": study_end.strftime("%H:%M"),
+                       "end": (start + dt.timedelta(hours=1)).strftime("%H:%M"),
+                       "subject": None, "priority": None, "activity": "Break Time", "is_break": True}
+
+    def to_csv(self):
+        """
+        Yields the schedule as CSV text, one chunk per day.
+        """
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(CSV_COLUMNS)
+        day = None
+        for s in self.sessions():
+            if s['day'] != day and day is not None:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            day = s['day']
+            writer.writerow([s['day'], s['date'], s['start'], s['end'], s['subject'] or "",
+                             s['priority'] or "", s['activity']])
+        yield buf.getvalue()
+
+    def to_ics(self, calendar_name="Study Plan"):
+        """
+        Yields the study sessions as an iCalendar (RFC 5545) calendar, one
+        event per session in floating local time.
+        """
+        stamp = dt.datetime.now(dt.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        yield _ics_lines(["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//AI Study Pal//Study Planner//EN",
+                          "CALSCALE:GREGORIAN", f"X-WR-CALNAME:{_ics_text(calendar_name)}"])
+        for day, hour, i, start in self._slots():
+            end = start + dt.timedelta(minutes=STUDY_MINUTES)
+            yield _ics_lines([
+                "BEGIN:VEVENT",
+                f"UID:{start:%Y%m%dT%H%M}-{i}@study-planner",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART:{start:%Y%m%dT%H%M%S}",
+                f"DTEND:{end:%Y%m%dT%H%M%S}",
+                f"SUMMARY:{_ics_text(f'Study {self.names[i]}')}",
+                f"DESCRIPTION:{_ics_text(f'{self.priorities[i]} priority. Focus on key concepts, then take a 10 minute break.')}",
+                "END:VEVENT",
+            ])
+        yield "END:VCALENDAR\r\n"
+
+def _ics_text(value):
+    return str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def _ics_lines(lines):
+    # Content lines end in CRLF and are folded at 75 octets
+    out = []
+    for line in lines:
+        data = line.encode('utf-8')
+        while len(data) > 75:
+            cut = 75
+            while cut and (data[cut] & 0xC0) == 0x80: # Don't split a UTF-8 character
+                cut -= 1
+            out.append(data[:cut].decode('utf-8'))
+            data = b" " + data[cut:]
+        out.append(data.decode('utf-8'))
+    return "\r\n".join(out) + "\r\n"
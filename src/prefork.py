@@ -0,0 +1,267 @@
+import gc
+import os
+import signal
+import socket
+import threading
+import time
+
+FAST_EXIT_SECONDS = 5.0 # A worker failing sooner than this after its fork failed to start
+RESPAWN_DELAY = 0.5     # First respawn delay after a failed start, doubled per consecutive failure
+MAX_RESPAWN_DELAY = 30.0
+
+class RequestCounter:
+    """
+    WSGI middleware that counts requests (total and in flight) and calls
+    on_limit once max_requests have started (0 disables the limit).
+    """
+    def __init__(self, app, max_requests, on_limit):
+        self.app = app
+        self.max_requests = max_requests
+        self.on_limit = on_limit
+        self.count = 0
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.count += 1
+            self.active += 1
+            hit_limit = self.max_requests and self.count == self.max_requests
+        if hit_limit:
+            self.on_limit()
+        try:
+            return self.app(environ, start_response)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+class PreforkServer:
+    """
+    Pre-fork WSGI server: the master binds the socket and runs preload() once,
+    so loaded models are shared copy-on-write by every worker it forks.
+
+    Each worker serves the inherited socket with a threaded werkzeug server.
+    Workers are recycled after max_requests (plus up to max_requests_jitter),
+    respawned if they die, and replaced one at a time on SIGHUP (after preload
+    runs again in the master), or when watch() returns True (polled every
+    watch_seconds). SIGTERM/SIGINT stop the workers gracefully.
+
+    Workers that fail within FAST_EXIT_SECONDS of starting are respawned with
+    exponential backoff; after max_startup_failures such failures in a row
+    the master stops and run() returns 1.
+    """
+    def __init__(self, app, bind=("127.0.0.1", 8000), workers=None, preload=None, post_fork=None,
+                 warmup=None, max_requests=0, max_requests_jitter=0, graceful_timeout=30, backlog=2048,
+                 watch=None, watch_seconds=2.0, max_startup_failures=5):
+        self.app = app
+        self.bind = bind
+        self.num_workers = workers or os.cpu_count() or 1
+        self.preload = preload
+        self.post_fork = post_fork
+        self.warmup = warmup
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.backlog = backlog
+        self.watch = watch
+        self.watch_seconds = watch_seconds
+        self.max_startup_failures = max_startup_failures
+        self.workers = {} # pid -> generation
+        self._started = {} # pid -> fork time
+        self._failures = 0 # Consecutive failed starts
+        self._last_failure = 0.0
+        self._respawn_at = 0.0
+        self.exit_code = 0
+        self._retiring = set()
+        self.generation = 0
+        self._reload = False
+        self._stopping = False
+
+    def log(self, message):
+        print(f"[prefork {os.getpid()}] {message}", flush=True)
+
+    # --- Master ---
+
+    def _listen(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(self.bind)
+        sock.listen(self.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def _load(self):
+        start = time.perf_counter()
+        if self.preload is not None:
+            self.preload()
+        # Keep the loaded objects out of the collector's reach, so GC passes in the
+        # workers don't write to (and un-share) their pages
+        gc.collect()
+        gc.freeze()
+        self.log(f"Preloaded in {time.perf_counter() - start:.2f}s")
+
+    def run(self):
+        self.sock = self._listen()
+        self.log(f"Listening on http://{self.bind[0]}:{self.bind[1]} with {self.num_workers} workers")
+        self._load()
+
+        signal.signal(signal.SIGHUP, self._on_hup)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        for _ in range(self.num_workers):
+            self._spawn()
+
+        next_watch = time.monotonic() + self.watch_seconds
+        while not self._stopping:
+            if self.watch is not None and time.monotonic() >= next_watch:
+                next_watch = time.monotonic() + self.watch_seconds
+                try:
+                    if self.watch():
+                        self.log("Change detected")
+                        self._reload = True
+                except Exception as e:
+                    self.log(f"Watch failed: {e}")
+            if self._reload:
+                self._reload = False
+                self._rolling_restart()
+            self._reap()
+            self._check_started()
+            while not self._stopping and len(self.workers) < self.num_workers and time.monotonic() >= self._respawn_at:
+                self._spawn()
+            time.sleep(0.2)
+        self._shutdown()
+        return self.exit_code
+
+    def _on_hup(self, signum, frame):
+        self._reload = True
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._worker()
+            except BaseException as e:
+                print(f"[worker {os.getpid()}] exiting on error: {e!r}", flush=True)
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = self.generation
+        self._started[pid] = time.monotonic()
+        return pid
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            retired = pid in self._retiring
+            self._retiring.discard(pid)
+            started = self._started.pop(pid, None)
+            if self.workers.pop(pid, None) is not None and not (self._stopping or retired):
+                code = os.waitstatus_to_exitcode(status)
+                if code != 0 and started is not None and time.monotonic() - started < FAST_EXIT_SECONDS:
+                    self._startup_failed(pid, code)
+                else:
+                    self.log(f"Worker {pid} exited ({code}); respawning")
+
+    def _startup_failed(self, pid, code):
+        # Backs off respawning, and gives up when workers keep dying on startup
+        self._failures += 1
+        self._last_failure = time.monotonic()
+        if self._failures >= self.max_startup_failures:
+            self.log(f"Worker {pid} exited ({code}) on startup, {self._failures} times in a row; stopping")
+            self._stopping = True
+            self.exit_code = 1
+            return
+        delay = min(RESPAWN_DELAY * 2 ** (self._failures - 1), MAX_RESPAWN_DELAY)
+        self._respawn_at = self._last_failure + delay
+        self.log(f"Worker {pid} exited ({code}) on startup; respawning in {delay:.1f}s")
+
+    def _check_started(self):
+        # A worker forked after the last failure that stays up ends the failure streak
+        if not self._failures:
+            return
+        now = time.monotonic()
+        if any(self._last_failure < t <= now - FAST_EXIT_SECONDS for t in self._started.values()):
+            self.log("Workers are starting again")
+            self._failures = 0
+            self._respawn_at = 0.0
+
+    def _wait_for(self, pids, timeout):
+        deadline = time.monotonic() + timeout
+        while pids and time.monotonic() < deadline:
+            self._reap()
+            pids = [p for p in pids if p in self.workers]
+            time.sleep(0.05)
+        for pid in pids:
+            self.log(f"Worker {pid} did not stop in {timeout}s; killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._reap()
+
+    def _rolling_restart(self):
+        self.log("Reloading: preloading again, then replacing workers one at a time")
+        gc.unfreeze()
+        self._load()
+        self.generation += 1
+        for pid in [p for p, gen in self.workers.items() if gen < self.generation]:
+            self._spawn()
+            self._retiring.add(pid)
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            self._wait_for([pid], self.graceful_timeout)
+
+    def _shutdown(self):
+        self.log("Stopping workers")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        self._wait_for(list(self.workers), self.graceful_timeout)
+        self.sock.close()
+
+    # --- Worker ---
+
+    def _worker(self):
+        from werkzeug.serving import make_server
+        import random
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        for sig in (signal.SIGHUP, signal.SIGINT):
+            signal.signal(sig, signal.SIG_IGN)
+        if self.post_fork is not None:
+            self.post_fork()
+        if self.warmup is not None:
+            self.warmup(self.app)
+
+        limit = self.max_requests
+        if limit and self.max_requests_jitter:
+            limit += random.randint(0, self.max_requests_jitter)
+        app = RequestCounter(self.app, limit, stop.set)
+        server = make_server(self.bind[0], self.bind[1], app, threaded=True, fd=self.sock.fileno())
+
+        # shutdown() has to come from another thread than serve_forever()
+        def watch():
+            stop.wait()
+            server.shutdown()
+        threading.Thread(target=watch, name="prefork-stop", daemon=True).start()
+
+        server.serve_forever()
+        # Let in-flight requests finish before exiting
+        deadline = time.monotonic() + self.graceful_timeout
+        while app.active and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.1) # Responses still being written after the app returned
@@ -0,0 +1,196 @@
+import pandas as pd
+import numpy as np
+from corpus_store import CorpusStore
+from quiz_index import grow
+
+FALLBACK_DISTRACTORS = ["Topic A", "Topic B", "Topic C"]
+
+def render_stem(text, max_len=60):
+    """
+    Builds the question stem shown for a passage.
+    """
+    snippet = text
+    if len(snippet) > max_len:
+        snippet = snippet[:max_len] + "..."
+    return f"What is the main concept discussed in: '{snippet}'?"
+
+class QuestionBank:
+    """
+    Integer-coded question and distractor tables for the clustered data.
+
+    Everything is row-aligned with data_clustered (or keyed by unique text), so
+    serving a quiz is array indexing plus one vectorized distractor draw. Texts
+    are not copied: each unique text is read back from the corpus store at its
+    first row, and stems are rendered for the questions being served.
+    """
+    def __init__(self, corpus, num_distractors=3):
+        self.num_distractors = num_distractors
+        self._rng = np.random.default_rng()
+        self._reset_append_state()
+        if isinstance(corpus, pd.DataFrame):
+            corpus = CorpusStore.from_frame(corpus)
+
+        self.corpus = corpus
+        self.text_codes, self.text_rows = corpus.text_codes()
+        self.added_texts = np.empty(0, dtype=object) # Unique texts of rows added by append()
+
+        # Topics keep NaN as a value, like Series.unique() did
+        self.topic_codes, topics = corpus.factorize('topic')
+        if (self.topic_codes < 0).any():
+            self.topic_codes = np.where(self.topic_codes < 0, len(topics), self.topic_codes).astype(np.int32)
+            topics = np.append(topics, np.nan)
+        self.topics = np.asarray(topics, dtype=object)
+        self.subject_codes, subjects = corpus.factorize('subject')
+
+        # Per-subject topic pools (integer codes, order of first appearance)
+        pairs = pd.DataFrame({'s': self.subject_codes, 't': self.topic_codes})
+        pairs = pairs[pairs['s'] >= 0].drop_duplicates()
+        self.subject_pools = [np.empty(0, dtype=np.int64)] * len(subjects)
+        for s, group in pairs.groupby('s', sort=False)['t']:
+            self.subject_pools[s] = group.to_numpy()
+        self.all_pool = np.arange(len(self.topics))
+        self.subjects = np.asarray(subjects, dtype=object)
+
+    def _reset_append_state(self):
+        # Lookup tables and spare capacity used by append(), built on first use
+        self._buffers = {}
+        self._lookups = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_buffers', None)
+        state.pop('_lookups', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_append_state()
+
+    def _code(self, table, value, on_new=None):
+        # Integer code of value in a lookup table, adding it when unseen (NaN shares one key)
+        key = "__nan__" if pd.isna(value) else value
+        if key not in table:
+            table[key] = len(table)
+            if on_new is not None:
+                on_new(value)
+        return table[key]
+
+    def texts(self, codes):
+        """
+        Unique texts by text code: read from the corpus store, or from the
+        texts added since it was built.
+        """
+        codes = np.asarray(codes)
+        values = np.empty(len(codes), dtype=object)
+        stored = codes < len(self.text_rows)
+        if stored.any():
+            values[stored] = self.corpus.texts(rows=self.text_rows[codes[stored]])
+        if not stored.all():
+            values[~stored] = self.added_texts[codes[~stored] - len(self.text_rows)]
+        return values
+
+    def row_texts(self, rows):
+        """
+        Texts of data_clustered row positions.
+        """
+        return self.texts(self.text_codes[np.asarray(rows, dtype=np.int64)])
+
+    def append(self, df):
+        """
+        Adds rows to the end of the bank and returns their text codes. Cost is
+        proportional to len(df), except that the first call decodes each unique
+        text once to build its lookup.
+        """
+        if self._lookups is None:
+            self._lookups = {
+                'text': {("__nan__" if pd.isna(t) else t): i
+                         for i, t in enumerate(self.texts(np.arange(len(self.text_rows) + len(self.added_texts))))},
+                'topic': {("__nan__" if pd.isna(t) else t): i for i, t in enumerate(self.topics)},
+                'subject': {s: i for i, s in enumerate(self.subjects)},
+                'pools': [set(p.tolist()) for p in self.subject_pools],
+            }
+        lk = self._lookups
+        new_texts, new_topics, new_subjects = [], [], []
+
+        text_codes = [self._code(lk['text'], t, new_texts.append) for t in df['text']]
+        topic_codes = [self._code(lk['topic'], t, new_topics.append) for t in df['topic']]
+        subject_codes = [-1 if pd.isna(s) else self._code(lk['subject'], s, new_subjects.append) for s in df['subject']]
+
+        self.added_texts = grow(self.added_texts, np.array(new_texts, dtype=object), self._buffers, 'added_texts')
+        self.topics = grow(self.topics, np.array(new_topics, dtype=object), self._buffers, 'topics')
+        self.subjects = grow(self.subjects, np.array(new_subjects, dtype=object), self._buffers, 'subjects')
+        self.all_pool = np.arange(len(self.topics))
+
+        # New subjects get empty pools; new (subject, topic) pairs extend them
+        for _ in new_subjects:
+            self.subject_pools.append(np.empty(0, dtype=np.int64))
+            lk['pools'].append(set())
+        for s, t in zip(subject_codes, topic_codes):
+            if s >= 0 and t not in lk['pools'][s]:
+                lk['pools'][s].add(t)
+                self.subject_pools[s] = np.append(self.subject_pools[s], t)
+
+        # Row-aligned arrays last, so readers never see rows without their tables
+        self.topic_codes = grow(self.topic_codes, topic_codes, self._buffers, 'topic_codes')
+        self.subject_codes = grow(self.subject_codes, subject_codes, self._buffers, 'subject_codes')
+        self.text_codes = grow(self.text_codes, text_codes, self._buffers, 'text_codes')
+        return np.asarray(text_codes, dtype=self.text_codes.dtype)
+
+    def _pool_for(self, subject_code):
+        # Same subject first; expand to all topics if it can't supply enough distractors
+        if subject_code >= 0:
+            pool = self.subject_pools[subject_code]
+            if len(pool) - 1 >= self.num_distractors:
+                return subject_code, pool
+        return -1, self.all_pool
+
+    def _draw_distractors(self, rows):
+        k = self.num_distractors
+        correct = self.topic_codes[rows]
+        out = np.empty((len(rows), k), dtype=np.int64)
+        valid = np.ones(len(rows), dtype=bool)
+
+        keys = np.array([self._pool_for(s)[0] for s in self.subject_codes[rows]])
+        for key in np.unique(keys):
+            members = np.flatnonzero(keys == key)
+            pool = self._pool_for(key)[1]
+            if len(pool) - 1 < k:
+                valid[members] = False # Very small dataset
+                continue
+            # Random priority per (question, pool entry); the correct topic never wins
+            priority = self._rng.random((len(members), len(pool)))
+            priority[pool[None, :] == correct[members, None]] = np.inf
+            out[members] = pool[np.argpartition(priority, k - 1, axis=1)[:, :k]]
+        return out, valid
+
+    def questions(self, rows):
+        """
+        Renders quiz questions for the given data_clustered row positions.
+        """
+        rows = np.asarray(rows)
+        if not len(rows):
+            return []
+        distractors, valid = self._draw_distractors(rows)
+        correct = self.topic_codes[rows]
+
+        options = np.concatenate([distractors, correct[:, None]], axis=1)
+        order = np.argsort(self._rng.random(options.shape), axis=1)
+        options = np.take_along_axis(options, order, axis=1)
+
+        texts = self.row_texts(rows)
+        quiz = []
+        for i in range(len(rows)):
+            correct_topic = self.topics[correct[i]]
+            if valid[i]:
+                labels = self.topics[options[i]].tolist()
+            else:
+                labels = FALLBACK_DISTRACTORS + [correct_topic]
+                self._rng.shuffle(labels)
+            text = str(texts[i])
+            quiz.append({
+                "question": render_stem(text),
+                "options": labels,
+                "correct": correct_topic,
+                "context": text
+            })
+        return quiz
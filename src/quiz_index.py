@@ -0,0 +1,265 @@
+import pandas as pd
+import numpy as np
+import collections
+import threading
+from corpus_store import CorpusStore
+from metrics import registry
+
+def _normalize(value):
+    """
+    Normalizes a subject/topic value for case-insensitive matching.
+    """
+    return " ".join(str(value).lower().split())
+
+def _ngrams(value, n=3):
+    """
+    Returns the set of character n-grams of a normalized string.
+    """
+    return {value[i:i + n] for i in range(len(value) - n + 1)}
+
+def _factorize(df, col):
+    # (codes, uniques) of a column; a CorpusStore answers from its category codes
+    if isinstance(df, CorpusStore):
+        return df.factorize(col)
+    codes, uniques = pd.factorize(df[col])
+    return codes, np.asarray(uniques, dtype=object)
+
+def grow(current, values, buffers, key):
+    """
+    Appends values to a 1-D array kept as a view into an over-allocated buffer,
+    so repeated appends cost amortized O(len(values)).
+    """
+    values = np.asarray(values, dtype=current.dtype)
+    n, m = len(current), len(values)
+    buf = buffers.get(key)
+    if buf is None or current.base is not buf or len(buf) < n + m:
+        buf = np.empty(max(2 * (n + m), 16), dtype=current.dtype)
+        buf[:n] = current
+        buffers[key] = buf
+    buf[n:n + m] = values
+    return buf[:n + m]
+
+class QuizIndex:
+    """
+    Inverted index over the 'subject' and 'topic' columns of the clustered data.
+
+    Rows are bucketed per (value, difficulty) with duplicate texts already
+    collapsed, so generate_quiz only touches the rows it actually samples.
+    Texts are compared by integer code (text_codes, one per row, as the
+    question bank numbers them), so the index keeps no strings of its own.
+    """
+    def __init__(self, df, text_codes=None, ngram=3, cache_size=256):
+        self.ngram = ngram
+        self.cache_size = cache_size
+        self.values = []
+        self.grams = collections.defaultdict(set)
+        self.buckets = {}
+        self._cache = collections.OrderedDict()
+        self._cache_lock = threading.Lock() # Threaded servers and the API pool share one index
+        self._rng = np.random.default_rng()
+        self._reset_append_state()
+        if text_codes is None:
+            text_codes, _ = pd.factorize(df['text'])
+        self._build(df, np.asarray(text_codes))
+
+    def _reset_append_state(self):
+        # Lookup tables and spare capacity used by append(), built on first use
+        self._buffers = {}
+        self._seen = None
+        self._value_lookup = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ('_buffers', '_seen', '_value_lookup', '_cache_lock'):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache_lock = threading.Lock()
+        self._reset_append_state()
+
+    def _build(self, df, text_codes):
+        n_rows = len(df)
+
+        # Shared vocabulary of normalized subject/topic values
+        normalized = {}
+        value_ids, row_ids = [], []
+        rows = np.arange(n_rows)
+        for col in ('subject', 'topic'):
+            codes, uniques = _factorize(df, col)
+            present = codes >= 0
+            remap = np.array([normalized.setdefault(_normalize(v), len(normalized)) for v in uniques], dtype=np.int64)
+            value_ids.append(remap[codes[present]] if present.any() else np.empty(0, dtype=np.int64))
+            row_ids.append(rows[present])
+
+        self.values = [None] * len(normalized)
+        for value, vid in normalized.items():
+            self.values[vid] = value
+            for gram in _ngrams(value, self.ngram):
+                self.grams[gram].add(vid)
+
+        # (value, row) postings, deduplicated when subject and topic share a value
+        value_ids = np.concatenate(value_ids)
+        row_ids = np.concatenate(row_ids)
+        keys = np.unique(value_ids * max(n_rows, 1) + row_ids)
+        value_ids = keys // max(n_rows, 1)
+        row_ids = keys % max(n_rows, 1)
+
+        if 'difficulty' in df.columns:
+            diff_codes, diff_labels = _factorize(df, 'difficulty')
+        else:
+            diff_codes, diff_labels = np.full(n_rows, -1), np.empty(0, dtype=object)
+        for vid, label, rows_ in self._group(value_ids, row_ids, diff_codes, diff_labels, text_codes):
+            self.buckets[(vid, label)] = rows_
+
+        # Whole-corpus buckets used when nothing matches
+        all_values = np.full(n_rows, -1, dtype=np.int64)
+        for _, label, rows_ in self._group(all_values, rows, diff_codes, diff_labels, text_codes):
+            self.buckets[(None, label)] = rows_
+
+        self.text_codes = text_codes
+
+    def _group(self, value_ids, row_ids, diff_codes, diff_labels, text_codes):
+        # Yields (value, difficulty, rows) buckets with duplicate texts dropped (first row wins).
+        # A difficulty of None is the bucket covering every difficulty.
+        n_texts = int(text_codes.max()) + 2 if len(text_codes) else 1
+        n_diffs = len(diff_labels) + 1
+        for per_difficulty in (True, False):
+            if per_difficulty:
+                d = diff_codes[row_ids] + 1 # 0 = missing difficulty
+            else:
+                d = np.zeros(len(row_ids), dtype=np.int64)
+            key = ((value_ids + 1) * n_diffs + d) * n_texts + (text_codes[row_ids] + 1)
+            order = np.lexsort((row_ids, key))
+            _, first = np.unique(key[order], return_index=True)
+            keep = order[first]
+            if per_difficulty:
+                keep = keep[d[keep] > 0]
+            if not len(keep):
+                continue
+            keep = keep[np.lexsort((row_ids[keep], d[keep], value_ids[keep]))]
+
+            group = (value_ids[keep] + 1) * n_diffs + d[keep]
+            bounds = np.flatnonzero(group[1:] != group[:-1]) + 1
+            for chunk in np.split(keep, bounds):
+                vid = int(value_ids[chunk[0]])
+                label = diff_labels[d[chunk[0]] - 1] if per_difficulty else None
+                yield (vid if vid >= 0 else None), label, row_ids[chunk]
+
+    def match(self, query, fuzzy=False, threshold=0.5):
+        """
+        Returns the ids of values containing the query as a substring.
+        With fuzzy=True, falls back to n-gram similarity when nothing contains it.
+        """
+        q = _normalize(query) if query is not None else ""
+        grams = _ngrams(q, self.ngram)
+        if len(q) < self.ngram:
+            candidates = range(len(self.values))
+        else:
+            candidates = set.intersection(*(self.grams.get(g, set()) for g in grams))
+        matched = sorted(vid for vid in candidates if q in self.values[vid])
+        if matched or not fuzzy or not grams:
+            return matched
+
+        # Dice coefficient over shared n-grams
+        overlap = collections.Counter()
+        for g in grams:
+            overlap.update(self.grams.get(g, ()))
+        scored = []
+        for vid, shared in overlap.items():
+            size = max(len(self.values[vid]) - self.ngram + 1, 0)
+            if 2.0 * shared / (len(grams) + size) >= threshold:
+                scored.append(vid)
+        return sorted(scored)
+
+    def lookup(self, query, difficulty="Easy", fuzzy=False):
+        """
+        Returns row positions for a subject/topic query, mirroring the old
+        subject -> difficulty -> drop_duplicates fallbacks of generate_quiz.
+        Only these candidate rows are cached; sample() draws from them per request.
+        """
+        key = (query, difficulty, fuzzy)
+        with self._cache_lock:
+            rows = self._cache.get(key)
+            if rows is not None:
+                self._cache.move_to_end(key)
+        if rows is not None:
+            registry.inc("cache_requests_total", ("quiz.lookup", "hit"))
+            return rows
+        registry.inc("cache_requests_total", ("quiz.lookup", "miss"))
+
+        matched = self.match(query, fuzzy=fuzzy)
+        if not matched:
+            matched = [None] # Fallback to the whole corpus
+
+        rows = self._union(matched, difficulty)
+        if not len(rows):
+            rows = self._union(matched, None) # Fallback if no specific difficulty matches
+
+        with self._cache_lock:
+            self._cache[key] = rows
+            evicted = len(self._cache) > self.cache_size
+            if evicted:
+                self._cache.popitem(last=False)
+        if evicted:
+            registry.inc("cache_evictions_total", ("quiz.lookup",))
+        return rows
+
+    def _union(self, value_ids, difficulty):
+        parts = [self.buckets[(vid, difficulty)] for vid in value_ids if (vid, difficulty) in self.buckets]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        if len(parts) == 1:
+            return parts[0]
+        rows = np.unique(np.concatenate(parts))
+        _, first = np.unique(self.text_codes[rows], return_index=True)
+        return rows[np.sort(first)]
+
+    def append(self, df, start, text_codes):
+        """
+        Adds rows (data_clustered positions start, start + 1, ...) with their
+        text codes to the existing buckets without rebuilding them. Cost is
+        proportional to len(df).
+        """
+        if self._value_lookup is None:
+            self._value_lookup = {v: i for i, v in enumerate(self.values)}
+            self._seen = set()
+            for (vid, label), rows in self.buckets.items():
+                self._seen.update((vid, label, code) for code in self.text_codes[rows].tolist())
+
+        codes = np.asarray(text_codes).tolist()
+        self.text_codes = grow(self.text_codes, codes, self._buffers, 'text_codes')
+
+        difficulty = df['difficulty'] if 'difficulty' in df.columns else [None] * len(df)
+        added = collections.defaultdict(list)
+        for i, (subject, topic, label, code) in enumerate(zip(df['subject'], df['topic'], difficulty, codes)):
+            value_ids = {self._value_id(v) for v in (subject, topic) if not pd.isna(v)}
+            labels = [None] if pd.isna(label) else [label, None]
+            for vid in list(value_ids) + [None]:
+                for lab in labels:
+                    if (vid, lab, code) not in self._seen:
+                        self._seen.add((vid, lab, code))
+                        added[(vid, lab)].append(start + i)
+
+        for key, rows in added.items():
+            current = self.buckets.get(key, np.empty(0, dtype=np.int64))
+            self.buckets[key] = grow(current, rows, self._buffers, key)
+        with self._cache_lock:
+            self._cache.clear()
+
+    def _value_id(self, value):
+        value = _normalize(value)
+        if value not in self._value_lookup:
+            vid = len(self.values)
+            self._value_lookup[value] = vid
+            self.values.append(value)
+            for gram in _ngrams(value, self.ngram):
+                self.grams[gram].add(vid)
+        return self._value_lookup[value]
+
+    def sample(self, rows, n):
+        """
+        Draws n distinct rows without permuting the whole bucket.
+        """
+        return rows[self._rng.choice(len(rows), n, replace=False)]
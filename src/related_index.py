@@ -0,0 +1,167 @@
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+
+CENTROID_TERMS = 64 # Terms kept per list centroid; enough to route queries
+DELTA_MIN_ROWS = 10_000 # append() compacts once the delta exceeds this many rows
+DELTA_FRACTION = 0.05   # ... or this share of the base rows, whichever is larger
+
+def _sparse_centroids(centers, terms=CENTROID_TERMS):
+    # Top terms of each centroid, renormalized, so routing costs O(lists * terms)
+    centers = np.asarray(centers, dtype=np.float32)
+    keep = min(terms, centers.shape[1])
+    cols = np.argpartition(-centers, keep - 1, axis=1)[:, :keep]
+    vals = np.take_along_axis(centers, cols, axis=1)
+    vals /= np.maximum(np.linalg.norm(vals, axis=1, keepdims=True), 1e-12)
+    indptr = np.arange(0, centers.shape[0] * keep + 1, keep)
+    return csr_matrix((vals.ravel(), cols.ravel(), indptr), shape=centers.shape)
+
+class RelatedIndex:
+    """
+    Inverted-file (IVF) nearest-neighbour search over L2-normalized TF-IDF rows.
+
+    Each K-Means topic cluster is split into about sqrt(size) / 2 inverted
+    lists (mini-batch k-means on its rows), and rows are stored row-major,
+    ordered by list. A query is routed to the nprobe lists with the closest
+    centroids, then scored by exact cosine against every row in them.
+    Rows added by append() are kept in one delta matrix, scored in full by
+    every query, and merged into the lists once it grows past a threshold.
+    """
+    def __init__(self, X, clusters, seed=42):
+        from sklearn.cluster import MiniBatchKMeans
+        X = csr_matrix(X, dtype=np.float32)
+        clusters = np.asarray(clusters, dtype=np.int64)
+        list_ids = np.zeros(X.shape[0], dtype=np.int64)
+        centers = []
+        offset = 0
+        for cluster in np.unique(clusters):
+            members = np.flatnonzero(clusters == cluster)
+            nlist = max(1, int(np.sqrt(len(members)) / 2))
+            if nlist == 1:
+                labels = np.zeros(len(members), dtype=np.int64)
+                center = np.asarray(X[members].mean(axis=0))
+            else:
+                km = MiniBatchKMeans(n_clusters=nlist, n_init=1, max_iter=20, batch_size=4096,
+                                     random_state=seed).fit(X[members])
+                labels, center = km.labels_, km.cluster_centers_
+            list_ids[members] = labels + offset
+            offset += len(center)
+            centers.append(center)
+        self.centroids = _sparse_centroids(np.concatenate(centers))
+        self._set_base(X, np.arange(X.shape[0]), list_ids)
+        self._reset_delta()
+
+    def _set_base(self, X, rows, list_ids):
+        order = np.argsort(list_ids, kind='stable')
+        X = X[order]
+        self.indptr = X.indptr.astype(np.int64)
+        self.indices = X.indices.astype(np.int32)
+        self.data = X.data.astype(np.float32)
+        self.rows = np.asarray(rows, dtype=np.int64)[order] # Position in list order -> corpus row
+        self.bounds = np.searchsorted(list_ids[order], np.arange(self.centroids.shape[0] + 1))
+        self.num_features = X.shape[1]
+
+    def _reset_delta(self):
+        self._delta = None   # CSR matrix of appended rows
+        self._delta_rows = np.empty(0, dtype=np.int64)
+        self._delta_lists = np.empty(0, dtype=np.int64)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if isinstance(self._delta, list): # Pickled when the delta was a list of blocks
+            blocks, rows, lists = self._delta, self._delta_rows, self._delta_lists
+            self._reset_delta()
+            if blocks:
+                self._delta = vstack(blocks, format='csr')
+                self._delta_rows, self._delta_lists = np.concatenate(rows), np.concatenate(lists)
+
+    @classmethod
+    def from_arrays(cls, indptr, indices, data, rows, bounds, c_indptr, c_indices, c_data, num_features):
+        index = cls.__new__(cls)
+        index.indptr, index.indices, index.data = indptr, indices, data
+        index.rows, index.bounds = rows, bounds
+        index.num_features = int(np.asarray(num_features).ravel()[0])
+        index.centroids = csr_matrix((c_data, c_indices, c_indptr), shape=(len(bounds) - 1, index.num_features))
+        index._reset_delta()
+        return index
+
+    def arrays(self):
+        """
+        Named arrays for from_arrays (after compact()).
+        """
+        self.compact()
+        return {"indptr": self.indptr, "indices": self.indices, "data": self.data, "rows": self.rows,
+                "bounds": self.bounds, "c_indptr": self.centroids.indptr, "c_indices": self.centroids.indices,
+                "c_data": self.centroids.data, "num_features": np.array([self.num_features])}
+
+    def __len__(self):
+        return len(self.rows) + len(self._delta_rows)
+
+    def _route(self, X):
+        return np.asarray((X @ self.centroids.T).argmax(axis=1)).ravel()
+
+    def append(self, X, rows):
+        """
+        Adds rows (corpus positions rows), each to the list with the closest
+        centroid. Compacts when the delta passes DELTA_MIN_ROWS / DELTA_FRACTION,
+        so queries never score an unbounded delta.
+        """
+        X = csr_matrix(X, dtype=np.float32)
+        self._delta = X if self._delta is None else vstack([self._delta, X], format='csr')
+        self._delta_rows = np.concatenate([self._delta_rows, np.asarray(rows, dtype=np.int64)])
+        self._delta_lists = np.concatenate([self._delta_lists, self._route(X)])
+        if len(self._delta_rows) > max(DELTA_MIN_ROWS, DELTA_FRACTION * len(self.rows)):
+            self.compact()
+
+    def compact(self):
+        """
+        Merges the appended rows into the base lists.
+        """
+        if self._delta is None:
+            return
+        base = csr_matrix((self.data, self.indices, self.indptr), shape=(len(self.rows), self.num_features))
+        list_ids = np.repeat(np.arange(len(self.bounds) - 1), np.diff(self.bounds))
+        self._set_base(vstack([base, self._delta], format='csr'),
+                       np.concatenate([self.rows, self._delta_rows]),
+                       np.concatenate([list_ids, self._delta_lists]))
+        self._reset_delta()
+
+    def search(self, q, limit=10, nprobe=16):
+        """
+        Returns (corpus rows, cosine scores) of the best limit matches for the
+        1 x num_features query q, best first.
+        """
+        q = csr_matrix(q, dtype=np.float32)
+        if q.nnz == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        sims = np.asarray((self.centroids @ q.T).todense()).ravel()
+        probe = np.argpartition(-sims, nprobe - 1)[:nprobe] if len(sims) > nprobe else np.arange(len(sims))
+
+        dense_q = np.zeros(self.num_features, dtype=np.float32)
+        dense_q[q.indices] = q.data
+        rows, scores = [], []
+        for p in probe:
+            lo, hi = self.bounds[p], self.bounds[p + 1]
+            if lo == hi:
+                continue
+            start, end = self.indptr[lo], self.indptr[hi]
+            block = csr_matrix((self.data[start:end], self.indices[start:end], self.indptr[lo:hi + 1] - start),
+                               shape=(hi - lo, self.num_features))
+            scores.append(block @ dense_q)
+            rows.append(self.rows[lo:hi])
+
+        if self._delta is not None:
+            in_probe = np.isin(self._delta_lists, probe)
+            if in_probe.any():
+                scores.append(self._delta[in_probe] @ dense_q)
+                rows.append(self._delta_rows[in_probe])
+
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        hit = scores > 0
+        rows, scores = rows[hit], scores[hit]
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[top], scores[top]
+        best = np.lexsort((rows, -scores))
+        return rows[best], scores[best]
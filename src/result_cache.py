@@ -0,0 +1,285 @@
+import collections
+import hashlib
+import hmac
+import os
+import pickle
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from metrics import registry
+
+try:
+    import fcntl
+except ImportError: # Windows: no cross-process single-flight
+    fcntl = None
+
+_MISSING = object()
+
+def normalize_text(text):
+    # Cache key form of a text: whitespace runs collapse so pasted variants share an
+    # entry, but line breaks stay distinct from spaces (they separate sentences)
+    lines = (" ".join(line.split()) for line in text.splitlines()) if text else ()
+    return "\n".join(line for line in lines if line)
+
+def cache_key(*parts):
+    return hashlib.blake2b(pickle.dumps(parts, protocol=4), digest_size=16).hexdigest()
+
+def _check_private(directory):
+    # Only this user may plant or read entries: a pickle from anyone else would run code here
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode):
+        raise ValueError(f"Cache directory {directory} is not a directory")
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise ValueError(f"Cache directory {directory} is owned by another user")
+    if st.st_mode & 0o077:
+        raise ValueError(f"Cache directory {directory} is accessible to other users (mode {st.st_mode & 0o777:o})")
+
+class FileBackend:
+    """
+    Result store shared by processes through a directory, one pickle per key.
+
+    By default the directory is a new private (0700) one under /dev/shm
+    (shared memory) where available; a given directory must be owned by this
+    user and closed to others. Every entry is signed with HMAC-SHA256 under a
+    random per-run secret, inherited by forked workers, and is only unpickled
+    if its signature matches. Files are replaced atomically and the oldest are
+    removed once the directory exceeds max_bytes.
+    """
+    def __init__(self, directory=None, max_bytes=256 * 2**20, prune_every=256, secret=None):
+        self.owned = directory is None
+        if directory is None:
+            base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            directory = tempfile.mkdtemp(prefix="study_assistant_cache-", dir=base) # Mode 0700
+        else:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_private(directory)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self._secret = secret if secret is not None else os.urandom(32)
+        self._writes = 0
+
+    def _sign(self, payload):
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()
+
+    def _path(self, key, suffix=".pkl"):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key):
+        """
+        Returns (expires, size, value) or None when missing or expired.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                signed = f.read()
+        except OSError:
+            return None
+        signature, payload = signed[:32], signed[32:]
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None # Not written by this run
+        try:
+            expires, value = pickle.loads(payload)
+        except (pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if expires is not None and expires < time.time():
+            return None
+        return expires, len(payload), value
+
+    def set(self, key, expires, value):
+        payload = pickle.dumps((expires, value), protocol=4)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self._sign(payload) + payload)
+        os.replace(tmp, self._path(key))
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    @contextmanager
+    def lock(self, key):
+        """
+        Exclusive per-key lock across processes, held while one of them computes.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(key, ".lock"), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def prune(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".pkl"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                os.remove(path[:-4] + ".lock")
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith((".pkl", ".lock")):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+    def remove(self):
+        """
+        Deletes the directory if this backend created it.
+        """
+        if self.owned:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+class ResultCache:
+    """
+    Bounded LRU result cache keyed on (version, *parts).
+
+    Entries expire after ttl seconds and the least recently used ones are
+    evicted once their pickled size exceeds max_bytes. Concurrent callers with
+    the same key share one computation (single-flight); with a shared backend,
+    other processes see the result too and wait for each other's computation.
+    Cached values are shared between callers and must not be mutated.
+    """
+    def __init__(self, name, max_bytes=32 * 2**20, ttl=3600, version=None, backend=None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = version # Callable returning the current model version, part of every key
+        self.backend = backend
+        self._entries = collections.OrderedDict() # key -> (expires, size, value)
+        self._inflight = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+
+    def key(self, *parts):
+        version = self.version() if self.version is not None else None
+        return cache_key(self.name, version, *parts)
+
+    def get_or_compute(self, parts, compute, ttl=None):
+        """
+        Returns the cached result for parts (a tuple of picklable values),
+        calling compute() on a miss.
+        """
+        key = self.key(*parts)
+        with self._lock:
+            value = self._get_local(key)
+            if value is _MISSING:
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = self._inflight[key] = Future()
+        if value is not _MISSING:
+            self._count("hit")
+            return value
+        if not owner:
+            self._count("coalesced")
+            return future.result()
+
+        try:
+            value = self._load_or_compute(key, compute, self.ttl if ttl is None else ttl)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return value
+
+    def _load_or_compute(self, key, compute, ttl):
+        if self.backend is None:
+            self._count("miss")
+            value = compute()
+            self._store(key, value, time.time() + ttl if ttl else None)
+            return value
+
+        with self.backend.lock(key):
+            found = self.backend.get(key)
+            if found is not None:
+                self._count("shared_hit")
+                expires, size, value = found
+                self._store(key, value, expires, size)
+                return value
+            self._count("miss")
+            value = compute()
+            expires = time.time() + ttl if ttl else None
+            self._store(key, value, expires)
+            self.backend.set(key, expires, value)
+        return value
+
+    def _get_local(self, key):
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING
+        expires, size, value = entry
+        if expires is not None and expires < time.time():
+            del self._entries[key]
+            self._bytes -= size
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value, expires, size=None):
+        if size is None:
+            size = len(pickle.dumps(value, protocol=4))
+        if size > self.max_bytes:
+            return size
+        evicted = 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (expires, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, old_size, _) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                evicted += 1
+            self._stats["evictions"] += evicted
+        if evicted:
+            registry.inc("cache_evictions_total", (self.name,), evicted)
+        return size
+
+    def _count(self, result):
+        with self._lock:
+            self._stats[result] += 1
+        registry.inc("cache_requests_total", (self.name, result))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+        lookups = sum(stats.get(k, 0) for k in ("hit", "shared_hit", "coalesced", "miss"))
+        stats["hit_rate"] = (lookups - stats.get("miss", 0)) / lookups if lookups else 0.0
+        stats["shared"] = self.backend is not None
+        return stats
@@ -0,0 +1,216 @@
+import os
+import struct
+import sys
+import threading
+import zipfile
+import numpy as np
+from model_store import encode_strings, decode_strings
+
+FORMAT_VERSION = 1
+CHECK_TOLERANCE = 1e-4 # Max abs difference from Keras accepted by export_summarizer
+
+def _sigmoid(x):
+    # In place: 1 / (1 + exp(-x))
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1.0
+    np.reciprocal(x, out=x)
+
+def load_npz(path, mmap=True):
+    """
+    {name: array} of an uncompressed .npz file. With mmap, each array is a
+    read-only memory map of its bytes inside the zip, so processes that load
+    the same file share its pages (np.load cannot map .npz members).
+    """
+    if not mmap:
+        with np.load(path, allow_pickle=False) as f:
+            return {name: f[name] for name in f.files}
+    arrays = {}
+    with zipfile.ZipFile(path) as z, open(path, 'rb') as f:
+        for info in z.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: {info.filename} is compressed and cannot be memory-mapped")
+            # Local file header: 30 bytes, then the name and extra field, then the .npy file
+            f.seek(info.header_offset)
+            name_len, extra_len = struct.unpack('<HH', f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len(".npy")]
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                         order='F' if fortran else 'C')
+    return arrays
+
+def export_summarizer(summarizer, path, check=True):
+    """
+    Writes the weights of a trained Summarizer (embeddings, LSTMs and output
+    layer) and its two vocabularies to an uncompressed .npz at path, for
+    Seq2SeqRuntime. With check, the exported runtime is run against the Keras
+    model on random inputs and a ValueError is raised if they disagree.
+    """
+    enc_emb, dec_emb, enc_lstm, dec_lstm, dense = summarizer._layers()
+    text_tokenizer, summary_tokenizer = summarizer.text_tokenizer, summarizer.summary_tokenizer
+    arrays = {
+        "format": np.array([FORMAT_VERSION]),
+        "lengths": np.array([summarizer.max_text_len, summarizer.max_summary_len]),
+        "mask_padding": np.array([bool(getattr(enc_emb, 'mask_zero', False))]),
+        "enc_embedding": enc_emb.get_weights()[0],
+        "dec_embedding": dec_emb.get_weights()[0],
+        "dense_kernel": dense.get_weights()[0],
+        "dense_bias": dense.get_weights()[1],
+    }
+    for prefix, lstm in (("enc", enc_lstm), ("dec", dec_lstm)):
+        kernel, recurrent, bias = lstm.get_weights()
+        arrays[f"{prefix}_kernel"], arrays[f"{prefix}_recurrent"], arrays[f"{prefix}_bias"] = kernel, recurrent, bias
+    for prefix, tokenizer in (("text", text_tokenizer), ("summary", summary_tokenizer)):
+        terms, oov = _vocabulary(tokenizer)
+        # As model_store stores strings; vocabulary terms are never missing
+        arrays[f"{prefix}_vocab.data"], arrays[f"{prefix}_vocab.offsets"], _ = encode_strings(terms)
+        arrays[f"{prefix}_oov"] = np.array([oov])
+    arrays = {name: np.ascontiguousarray(a, dtype=np.float32 if a.dtype.kind == 'f' else a.dtype)
+              for name, a in arrays.items()}
+
+    tmp = f"{path}.tmp-{os.getpid()}.npz"
+    np.savez(tmp, **arrays)
+    try:
+        if check:
+            _check_export(summarizer, Seq2SeqRuntime.load(tmp, mmap=False))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+def _vocabulary(tokenizer):
+    # Terms by token id (0 is padding), and the id of unknown words (-1: dropped, as the Keras Tokenizer does)
+    if hasattr(tokenizer, 'terms'):
+        return tokenizer.terms, 1
+    terms = [""] * (max(tokenizer.index_word, default=0) + 1)
+    for i, word in tokenizer.index_word.items():
+        terms[i] = word
+    oov = tokenizer.word_index.get(tokenizer.oov_token, -1) if tokenizer.oov_token else -1
+    return terms, oov
+
+def _check_export(summarizer, runtime, batch=8, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.integers(1, runtime.enc_embedding.shape[0], size=(batch, summarizer.max_text_len))
+    x[batch // 2:, summarizer.max_text_len // 2:] = 0 # Padded rows too
+    tokens = rng.integers(1, runtime.dec_embedding.shape[0], size=batch)
+    h, c = summarizer._keras_encode(x)
+    probs, _, _ = summarizer._keras_decoder_step(tokens, h, c)
+    rh, rc = runtime.encode(x)
+    rprobs, _, _ = runtime.step(tokens, rh.copy(), rc.copy())
+    error = max(np.abs(h - rh).max(), np.abs(c - rc).max(), np.abs(probs - rprobs).max())
+    if error > CHECK_TOLERANCE:
+        raise ValueError(f"NumPy runtime differs from the Keras model by {error:.2e}")
+    print(f"Exported summarizer matches Keras (max abs difference {error:.1e})")
+
+class Seq2SeqRuntime:
+    """
+    Forward pass of the Summarizer's LSTM encoder-decoder in NumPy, so serving
+    needs no TensorFlow. encode() and step() have the same inputs and outputs
+    as the Keras encoder and one-step decoder models. Each thread reuses its
+    own gate and state buffers, grown to the largest batch it has seen.
+    """
+    def __init__(self, arrays):
+        if int(arrays["format"][0]) > FORMAT_VERSION:
+            raise ValueError(f"Summarizer runtime version {int(arrays['format'][0])} is newer than supported")
+        for name in ("enc_embedding", "enc_kernel", "enc_recurrent", "enc_bias", "dec_embedding", "dec_kernel",
+                     "dec_recurrent", "dec_bias", "dense_kernel", "dense_bias"):
+            setattr(self, name, arrays[name])
+        self.max_text_len, self.max_summary_len = (int(n) for n in arrays["lengths"])
+        self.mask_padding = bool(arrays["mask_padding"][0])
+        self.units = self.enc_recurrent.shape[0]
+        self.vocabularies = {}
+        for prefix in ("text", "summary"):
+            terms = decode_strings(arrays[f"{prefix}_vocab.data"], arrays[f"{prefix}_vocab.offsets"]).tolist()
+            oov = int(arrays[f"{prefix}_oov"][0])
+            self.vocabularies[prefix] = (terms, oov if oov >= 0 else None)
+        self._local = threading.local()
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        return cls(load_npz(path, mmap=mmap))
+
+    def _buffers(self, n):
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None or buffers["gates"].shape[0] < n:
+            buffers = self._local.buffers = {
+                "enc_inputs": np.empty((n, self.enc_embedding.shape[1]), dtype=np.float32),
+                "dec_inputs": np.empty((n, self.dec_embedding.shape[1]), dtype=np.float32),
+                "gates": np.empty((n, 4 * self.units), dtype=np.float32),
+                "recurrent": np.empty((n, 4 * self.units), dtype=np.float32),
+                "h": np.empty((n, self.units), dtype=np.float32),
+                "c": np.empty((n, self.units), dtype=np.float32),
+                "probs": np.empty((n, self.dense_kernel.shape[1]), dtype=np.float32),
+            }
+        return {name: b[:n] for name, b in buffers.items()}
+
+    def _cell(self, buf, inputs, embedding, kernel, recurrent, bias, tokens, h, c, mask=None):
+        # One LSTM step (Keras gate order i, f, c, o) that updates h and c in place
+        u = self.units
+        gates = buf["gates"]
+        np.take(embedding, tokens, axis=0, out=inputs)
+        np.dot(inputs, kernel, out=gates)
+        gates += np.dot(h, recurrent, out=buf["recurrent"])
+        gates += bias
+        _sigmoid(gates[:, :2 * u])
+        _sigmoid(gates[:, 3 * u:])
+        i, f, g, o = gates[:, :u], gates[:, u:2 * u], gates[:, 2 * u:3 * u], gates[:, 3 * u:]
+        np.tanh(g, out=g)
+        new_c, new_h = buf["c"], buf["h"]
+        np.multiply(f, c, out=new_c)
+        new_c += np.multiply(i, g, out=i)
+        np.tanh(new_c, out=new_h)
+        new_h *= o
+        if mask is None:
+            h[...], c[...] = new_h, new_c
+        else: # Padded steps keep the previous state
+            np.copyto(h, new_h, where=mask[:, None])
+            np.copyto(c, new_c, where=mask[:, None])
+
+    def encode(self, x):
+        """
+        Final encoder states (h, c) of the padded token rows x.
+        """
+        x = np.asarray(x)
+        buf = self._buffers(len(x))
+        h = np.zeros((len(x), self.units), dtype=np.float32)
+        c = np.zeros((len(x), self.units), dtype=np.float32)
+        for t in range(x.shape[1]):
+            tokens = x[:, t]
+            mask = tokens != 0 if self.mask_padding else None
+            self._cell(buf, buf["enc_inputs"], self.enc_embedding, self.enc_kernel, self.enc_recurrent,
+                       self.enc_bias, tokens, h, c, mask)
+        return h, c
+
+    def step(self, tokens, h, c):
+        """
+        One decoder step: next-token probabilities and the new states. h and c
+        are updated in place; probs is a buffer overwritten by the next step.
+        """
+        buf = self._buffers(len(tokens))
+        self._cell(buf, buf["dec_inputs"], self.dec_embedding, self.dec_kernel, self.dec_recurrent, self.dec_bias,
+                   np.asarray(tokens), h, c)
+        probs = buf["probs"]
+        np.dot(h, self.dense_kernel, out=probs)
+        probs += self.dense_bias
+        probs -= probs.max(axis=1, keepdims=True)
+        np.exp(probs, out=probs)
+        probs /= probs.sum(axis=1, keepdims=True)
+        return probs, h, c
+
+if __name__ == "__main__":
+    # python src/summarizer_runtime.py [models/summarizer.h5]: exports a trained model next to it
+    from dl_models import Summarizer
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "models/summarizer.h5"
+    summ = Summarizer.load_model(model_path, numpy_runtime=False)
+    if not summ.can_decode():
+        sys.exit(f"{model_path} has no tokenizers; retrain it with python train.py")
+    print(f"Wrote {export_summarizer(summ, Summarizer.runtime_path(model_path))}")
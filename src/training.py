@@ -0,0 +1,172 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from data_utils import load_data, dedup_data, sample_weights, save_data, WEIGHT_COLUMN
+from model_store import publish_version
+
+DEFAULT_KS = (3, 4, 5, 6, 8, 10)
+DEFAULT_C = (0.1, 1.0, 10.0)              # LogisticRegression settings swept
+DEFAULT_ALPHA = (1e-5, 1e-4, 1e-3)        # SGDClassifier settings (incremental / out-of-core)
+SILHOUETTE_SAMPLE = 10_000                # Rows scored per silhouette (it is quadratic in rows)
+REPORT_NAME = "training_report.json"
+CHECKPOINT_DIR = ".summarizer-checkpoint" # Under models_dir; kept until the summarizer is published
+SUMMARIZER_CORPUS = "summarizer_corpus.csv" # In the checkpoint: the deduplicated rows the summarizer streams
+SUMMARIZER_COLUMNS = ("text", "summary", "cleaned_text", "cleaned_summary", WEIGHT_COLUMN)
+
+# Corpus of the sweep worker processes, set by _init_worker
+_texts = None
+_weights = None
+_tfidf = None
+
+def _init_worker(texts, weights):
+    global _texts, _weights
+    _texts, _weights = texts, weights
+
+def _score_topics(k):
+    """
+    Silhouette of K-Means with k topics on the (weighted-IDF) TF-IDF rows.
+    """
+    global _tfidf
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+    from ml_models import QuizGenerator
+    if _tfidf is None: # Vectorized once per worker, shared by its k values
+        _tfidf = QuizGenerator()._fit_tfidf(_texts, _weights)
+    clusters = KMeans(n_clusters=k, random_state=42).fit_predict(_tfidf, sample_weight=_weights)
+    return float(silhouette_score(_tfidf, clusters, sample_size=min(SILHOUETTE_SAMPLE, _tfidf.shape[0]),
+                                  random_state=42))
+
+def _score_classifier(params, incremental=False, out_of_core=False):
+    """
+    Held-out (accuracy, F1) of the difficulty classifier with params.
+    """
+    from ml_models import QuizGenerator, OUT_OF_CORE_CHUNK
+    model = QuizGenerator()
+    model.classifier_params = params
+    if out_of_core:
+        return model._train_difficulty_out_of_core(_texts, _weights, OUT_OF_CORE_CHUNK)
+    _, accuracy, f1 = model._train_difficulty(_texts, _weights, incremental)
+    return accuracy, f1
+
+def _train_summarizer(data_path, path, epochs, checkpoint_dir=None):
+    # Runs in its own process, so TensorFlow never loads in the parent
+    from dl_models import Summarizer
+    summarizer = Summarizer()
+    summarizer.train_stream(data_path, epochs=epochs, checkpoint_dir=checkpoint_dir)
+    summarizer.save_model(path)
+    # Weights for the NumPy runtime the web workers decode with
+    from summarizer_runtime import export_summarizer
+    export_summarizer(summarizer, Summarizer.runtime_path(path))
+    return path
+
+def _summarizer_corpus(df, data_path, checkpoint_dir):
+    # The deduplicated rows (with their weights) as a file for train_stream. It is kept with
+    # the checkpoint and rewritten only when data_path changes, so an interrupted run resumes
+    path = os.path.join(checkpoint_dir, SUMMARIZER_CORPUS)
+    source_path = os.path.join(checkpoint_dir, "corpus_source.json")
+    st = os.stat(data_path)
+    source = [os.path.abspath(data_path), st.st_size, st.st_mtime_ns]
+    try:
+        with open(source_path) as f:
+            if json.load(f) == source and os.path.exists(path):
+                return path
+    except (OSError, ValueError):
+        pass
+    save_data(df[[c for c in SUMMARIZER_COLUMNS if c in df.columns]], path)
+    with open(source_path, 'w') as f:
+        json.dump(source, f)
+    return path
+
+def train_all(data_path="data/dataset.csv", models_dir="models", ks=DEFAULT_KS, settings=None,
+              epochs=5, workers=None, incremental=False, out_of_core=False, summarizer=True):
+    """
+    Trains the quiz models and the summarizer in parallel processes and
+    publishes them to models_dir.
+
+    The number of topics is picked from ks by silhouette and the classifier
+    setting from settings (LogisticRegression C, or SGD alpha when
+    incremental/out_of_core) by held-out F1, each candidate scored in a
+    process pool. Everything is written to a staging directory inside
+    models_dir and published as one version once all models are trained.
+    Returns the training report.
+    """
+    start = time.perf_counter()
+    df = load_data(data_path)
+    if df is None:
+        raise FileNotFoundError(data_path)
+    df = dedup_data(df)
+    texts = df['cleaned_text'].astype(str).tolist()
+    weights = sample_weights(df)
+    incremental = incremental or out_of_core
+    param = "alpha" if incremental else "C"
+    if settings is None:
+        settings = DEFAULT_ALPHA if incremental else DEFAULT_C
+    candidates = [{param: value} for value in settings]
+
+    os.makedirs(models_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=models_dir)
+    summarizer_pool = ProcessPoolExecutor(max_workers=1) if summarizer else None
+    try:
+        summarizer_path = os.path.join(staging, "summarizer.h5")
+        checkpoint_dir = os.path.join(models_dir, CHECKPOINT_DIR)
+        summarizer_job = None
+        if summarizer:
+            # The summarizer streams the deduplicated rows too, weighted like the quiz models
+            corpus_path = _summarizer_corpus(df, data_path, checkpoint_dir)
+            summarizer_job = summarizer_pool.submit(_train_summarizer, corpus_path, summarizer_path, epochs,
+                                                    checkpoint_dir)
+
+        print(f"Sweeping k in {list(ks)} and {param} in {list(settings)}...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(texts, weights)) as pool:
+            topic_jobs = {k: pool.submit(_score_topics, k) for k in ks}
+            classifier_jobs = [pool.submit(_score_classifier, params, incremental, out_of_core) for params in candidates]
+            silhouettes = {k: job.result() for k, job in topic_jobs.items()}
+            scores = [job.result() for job in classifier_jobs]
+        for k, score in silhouettes.items():
+            print(f"  k={k}: silhouette {score:.4f}")
+        for params, (accuracy, f1) in zip(candidates, scores):
+            print(f"  {param}={params[param]}: accuracy {accuracy:.4f}, F1 {f1:.4f}")
+        best_k = max(ks, key=lambda k: silhouettes[k])
+        best = candidates[int(np.argmax([f1 for _, f1 in scores]))]
+        print(f"Best: k={best_k}, {param}={best[param]}")
+
+        from ml_models import QuizGenerator
+        quiz = QuizGenerator()
+        quiz.train(df, incremental=incremental, out_of_core=out_of_core, workers=workers,
+                   n_clusters=best_k, classifier_params=best)
+        quiz.save_model(os.path.join(staging, "quiz_generator"))
+        if summarizer_job is not None:
+            summarizer_job.result()
+
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "data_path": data_path,
+            "rows": int(len(df)),
+            "n_clusters": best_k,
+            "classifier_params": best,
+            "silhouette": {str(k): v for k, v in silhouettes.items()},
+            "classifier_scores": [dict(params, accuracy=a, f1=f) for params, (a, f) in zip(candidates, scores)],
+            "training_scores": quiz.training_scores,
+            "summarizer_epochs": epochs if summarizer else None,
+            "seconds": round(time.perf_counter() - start, 1),
+        }
+        with open(os.path.join(staging, REPORT_NAME), 'w') as f:
+            json.dump(report, f, indent=2)
+
+        # One pointer swap publishes every artifact (an old summarizer is carried over when not retrained)
+        published = ["quiz_generator"]
+        if summarizer:
+            published += ["summarizer_tokenizers.json", "summarizer.h5", "summarizer.npz"]
+        publish_version(staging, models_dir, published + [REPORT_NAME])
+        if summarizer:
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        print(f"Published {', '.join(published)} to {models_dir} in {report['seconds']}s")
+        return report
+    finally:
+        if summarizer_pool is not None:
+            summarizer_pool.shutdown(cancel_futures=True)
+        shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,49 @@
+"""
+Offline training: trains the quiz models and the summarizer in parallel
+processes, sweeping the number of topics and the difficulty classifier's
+regularization, and publishes the winning artifacts to models/.
+
+    python train.py --workers 8 --k 4,5,6,8 --epochs 5
+
+The web app (app.py, serve.py) only loads these artifacts; run this before
+starting it, and again to publish retrained models (then SIGHUP serve.py).
+"""
+import argparse
+import os
+import sys
+
+# One BLAS/OpenMP thread per process; the sweep runs its candidates in parallel
+for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, "1")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from training import train_all, DEFAULT_KS
+
+def number_list(cast):
+    def parse(value):
+        return [cast(v) for v in value.split(",") if v.strip()]
+    return parse
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and publish the study assistant models")
+    parser.add_argument("--data", default="data/dataset.csv")
+    parser.add_argument("--models", default="models", help="directory the artifacts are published to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--k", type=number_list(int), default=list(DEFAULT_KS), help="topic counts to sweep, e.g. 4,5,6")
+    parser.add_argument("--settings", type=number_list(float), default=None,
+                        help="classifier regularization to sweep (LogisticRegression C, or SGD alpha)")
+    parser.add_argument("--epochs", type=int, default=5, help="summarizer training epochs")
+    parser.add_argument("--incremental", action="store_true", help="hashed features + SGD, so update() can learn")
+    parser.add_argument("--out-of-core", action="store_true", help="stream the classifier's training in chunks")
+    parser.add_argument("--no-summarizer", action="store_true", help="train the quiz models only")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        parser.error(f"{args.data} not found; run src/generate_data.py first")
+    train_all(args.data, args.models, ks=args.k, settings=args.settings, epochs=args.epochs,
+              workers=args.workers, incremental=args.incremental, out_of_core=args.out_of_core,
+              summarizer=not args.no_summarizer)
+
+if __name__ == "__main__":
+    main()